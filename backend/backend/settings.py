@@ -146,6 +146,71 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Availability settings
+# Compute free appointment slots on read from Availability rules instead of
+# pre-materializing AppointmentSlot rows; rows are only written when a slot
+# is booked, blocked or cancelled
+AVAILABILITY_VIRTUAL_SLOTS = False
+
+# Queue slot generation for new availabilities to the background worker
+# (manage.py run_slot_generation_worker) instead of generating inline; can
+# also be requested per call with ?async=true
+AVAILABILITY_ASYNC_SLOT_GENERATION = False
+
+# Only materialize slots this many days ahead (None materializes the whole
+# recurrence at creation); manage.py materialize_slot_horizon extends the
+# horizon and trims expired slots
+AVAILABILITY_SLOT_HORIZON_DAYS = None
+
+# Serve public availability search from the denormalized search index, kept
+# in sync on slot writes; run manage.py rebuild_availability_search_index
+# after enabling it on existing data
+AVAILABILITY_SEARCH_INDEX = True
+
+# Answer provider and patient dropdown searches from the prefix token index,
+# kept in sync on saves; run manage.py rebuild_dropdown_search_index after
+# enabling it on existing data
+DROPDOWN_SEARCH_INDEX = True
+
+# Cache public availability search results for this many seconds (0 disables);
+# slot, availability and provider writes expire the affected entries early.
+# The alias must be shared by every worker process, or writes handled by one
+# worker leave stale results in the others; per-process caches are ignored
+AVAILABILITY_SEARCH_CACHE_TIMEOUT = 300
+AVAILABILITY_SEARCH_CACHE_ALIAS = 'availability_search'
+
+# Appointment settings
+# Appointment numbers each process leases from the per-day counter at a time;
+# larger blocks take the counter row lock less often but leave bigger gaps
+# when a process exits
+APPOINTMENT_NUMBER_BLOCK_SIZE = 20
+
+# Default minutes a slot hold reserves a slot; expired holds are released by
+# manage.py expire_slot_holds, which should run every minute
+APPOINTMENT_SLOT_HOLD_MINUTES = 10
+
+# Hours the response of an appointment write sent with an Idempotency-Key is
+# replayed to retries; manage.py purge_idempotency_keys deletes older keys
+APPOINTMENT_IDEMPOTENCY_KEY_HOURS = 24
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'backend-default',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Shared by all workers; the table is created by the providers migrations
+    'availability_search': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'availability_search_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -3,7 +3,7 @@ from .models import Provider, RefreshToken
 from .patient_models import Patient, VerificationToken
 from .patient_session_models import PatientSession
 from .appointment_models import Appointment, AppointmentHistory
-from .availability_models import Availability, AppointmentSlot
+from .availability_models import Availability, AppointmentSlot, AvailabilityTemplate, SlotGenerationJob
 
 
 @admin.register(Provider)
@@ -168,7 +168,7 @@ class AvailabilityAdmin(admin.ModelAdmin):
             'fields': ('slot_duration', 'break_duration', 'max_appointments_per_slot', 'appointment_type')
         }),
         ('Recurrence', {
-            'fields': ('is_recurring', 'recurrence_pattern', 'recurrence_end_date')
+            'fields': ('is_recurring', 'recurrence_pattern', 'recurrence_end_date', 'materialized_until')
         }),
         ('Status & Settings', {
             'fields': ('status', 'location', 'pricing', 'special_requirements')
@@ -190,3 +190,19 @@ class AppointmentSlotAdmin(admin.ModelAdmin):
     search_fields = ('provider__first_name', 'provider__last_name', 'booking_reference')
     readonly_fields = ('id', 'booking_reference', 'created_at', 'updated_at')
     ordering = ('-slot_start_time',)
+
+
+@admin.register(AvailabilityTemplate)
+class AvailabilityTemplateAdmin(admin.ModelAdmin):
+    list_display = ('template_name', 'provider', 'created_at', 'updated_at')
+    search_fields = ('template_name', 'provider__first_name', 'provider__last_name')
+    readonly_fields = ('id', 'created_at', 'updated_at')
+    ordering = ('template_name',)
+
+
+@admin.register(SlotGenerationJob)
+class SlotGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('availability', 'status', 'attempts', 'dates_processed', 'dates_total', 'slots_created', 'created_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('id', 'locked_at', 'started_at', 'completed_at', 'created_at', 'updated_at')
+    ordering = ('-created_at',)
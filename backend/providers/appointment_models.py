@@ -2,7 +2,8 @@
 Appointment models for booking management
 """
 import uuid
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone as django_timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -63,13 +64,13 @@ class Appointment(models.Model):
         on_delete=models.CASCADE, 
         related_name='appointments'
     )
-    appointment_slot = models.OneToOneField(
+    appointment_slot = models.ForeignKey(
         AppointmentSlot,
         on_delete=models.CASCADE,
-        related_name='appointment',
+        related_name='appointments',
         null=True,
         blank=True
-    )
+    )  # Slots with capacity above 1 take several appointments
     
     # Appointment Details
     appointment_mode = models.CharField(
@@ -213,9 +214,17 @@ class Appointment(models.Model):
             models.Index(fields=['payment_status']),
         ]
         constraints = [
+            # Appointments in a slot are limited by its capacity instead
             models.UniqueConstraint(
                 fields=['provider', 'appointment_date', 'appointment_time'],
                 name='unique_provider_appointment_time',
+                condition=models.Q(
+                    appointment_slot__isnull=True, status__in=['scheduled', 'confirmed', 'in_progress']
+                )
+            ),
+            models.UniqueConstraint(
+                fields=['appointment_slot', 'patient'],
+                name='unique_slot_patient',
                 condition=models.Q(status__in=['scheduled', 'confirmed', 'in_progress'])
             )
         ]
@@ -227,7 +236,7 @@ class Appointment(models.Model):
             if self.appointment_slot.provider != self.provider:
                 raise ValidationError("Appointment slot provider must match appointment provider")
             
-            if self.appointment_slot.status != 'available':
+            if self._state.adding and not self.appointment_slot.remaining_capacity:
                 raise ValidationError("Cannot book an unavailable appointment slot")
         
         # Validate video call requirements
@@ -246,27 +255,21 @@ class Appointment(models.Model):
         # Validate before making any changes
         self.full_clean()
         
-        # Update appointment slot status if linked
-        if self.appointment_slot and self.status in ['scheduled', 'confirmed']:
-            self.appointment_slot.status = 'booked'
-            self.appointment_slot.patient_id = self.patient.id
-            self.appointment_slot.save()
+        # Take a place in the linked slot with the same conditional update as BookingService
+        if self._state.adding and self.appointment_slot and self.status in ['scheduled', 'confirmed']:
+            from .services.booking_service import BookingService
+            with transaction.atomic():
+                BookingService.claim(self.appointment_slot, self.patient)
+                super().save(*args, **kwargs)
+            return
         
         super().save(*args, **kwargs)
     
     def generate_appointment_number(self):
         """Generate unique appointment number"""
-        import random
-        import string
-        
-        while True:
-            # Format: APT-YYYYMMDD-XXXX (e.g., APT-20250807-A1B2)
-            date_str = django_timezone.now().strftime('%Y%m%d')
-            random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-            appointment_number = f"APT-{date_str}-{random_str}"
-            
-            if not Appointment.objects.filter(appointment_number=appointment_number).exists():
-                return appointment_number
+        # Format: APT-YYYYMMDD-XXXX (e.g., APT-20250807-A1B2), from the per-day counter
+        from .services.appointment_number_service import appointment_number_allocator
+        return appointment_number_allocator.allocate()
     
     def __str__(self):
         return f"Appointment {self.appointment_number} - {self.patient.first_name} {self.patient.last_name} with {self.provider.first_name} {self.provider.last_name}"
@@ -285,7 +288,7 @@ class Appointment(models.Model):
     def is_upcoming(self):
         """Check if appointment is upcoming"""
         from datetime import datetime, date
-        appointment_datetime = datetime.combine(self.appointment_date, self.appointment_time)
+        appointment_datetime = django_timezone.make_aware(datetime.combine(self.appointment_date, self.appointment_time))
         return appointment_datetime > django_timezone.now() and self.status in ['scheduled', 'confirmed']
     
     @property
@@ -336,3 +339,60 @@ class AppointmentHistory(models.Model):
     
     def __str__(self):
         return f"{self.appointment.appointment_number} - {self.action} at {self.performed_at}"
+
+
+class AppointmentNumberCounter(models.Model):
+    """Last appointment number sequence value handed out for a day"""
+    
+    date = models.DateField(primary_key=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.date}: {self.last_value}"
+
+
+class SlotHold(models.Model):
+    """Short-lived reservation of a slot while a patient completes the booking form"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # Token to confirm or release
+    slot = models.OneToOneField(
+        AppointmentSlot,
+        on_delete=models.CASCADE,
+        related_name='hold'
+    )
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='slot_holds'
+    )
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=django_timezone.now)
+    
+    class Meta:
+        ordering = ['expires_at']
+    
+    def __str__(self):
+        return f"Hold on slot {self.slot_id} until {self.expires_at}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= django_timezone.now()
+
+
+class IdempotencyKey(models.Model):
+    """Response of an appointment write, replayed to retries sent with the same Idempotency-Key"""
+    
+    # SHA-256 of the request method, path and client key, so keys are scoped per endpoint
+    key_hash = models.CharField(max_length=64, primary_key=True)
+    request_hash = models.CharField(max_length=64)  # SHA-256 of the request body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # None while the first request runs
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Idempotency key {self.key_hash[:12]} until {self.expires_at}"
+    
+    @property
+    def is_completed(self):
+        return self.status_code is not None
+
@@ -3,11 +3,15 @@ Serializers for appointment booking and management
 """
 from rest_framework import serializers
 from django.utils import timezone
+from django.core.exceptions import ValidationError as DjangoValidationError
 from datetime import datetime, date
 from .appointment_models import Appointment, AppointmentHistory
 from .availability_models import AppointmentSlot,Availability
+from .availability_virtual import VirtualSlotResolver, virtual_slots_enabled
 from .patient_models import Patient
 from .models import Provider
+from .services.booking_service import BookingService
+from .services.slot_hold_service import MAX_HOLD_MINUTES
 
 
 class AppointmentCreateSerializer(serializers.ModelSerializer):
@@ -18,6 +22,10 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
     provider_id = serializers.UUIDField(write_only=True)
     appointment_slot_id = serializers.UUIDField(write_only=True, required=False, allow_null=True)
     
+    # Identify a computed slot that has no row yet (virtual slot mode)
+    availability_id = serializers.UUIDField(write_only=True, required=False, allow_null=True)
+    slot_start_time = serializers.DateTimeField(write_only=True, required=False, allow_null=True)
+    
     # Display fields
     patient_name = serializers.CharField(read_only=True, source='patient_full_name')
     provider_name = serializers.CharField(read_only=True, source='provider_full_name')
@@ -30,6 +38,8 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             'patient_id',
             'provider_id',
             'appointment_slot_id',
+            'availability_id',
+            'slot_start_time',
             'patient_name',
             'provider_name',
             'appointment_mode',
@@ -64,7 +74,8 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
     def validate_patient_id(self, value):
         """Validate patient exists and is active"""
         try:
-            patient = Patient.objects.get(id=value, is_active=True)
+            # Kept for create() so that booking does not load it again
+            self._patient = Patient.objects.get(id=value, is_active=True)
             return value
         except Patient.DoesNotExist:
             raise serializers.ValidationError("Patient not found or inactive")
@@ -72,7 +83,7 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
     def validate_provider_id(self, value):
         """Validate provider exists and is active"""
         try:
-            provider = Provider.objects.get(id=value, is_active=True)
+            self._provider = Provider.objects.get(id=value, is_active=True)
             return value
         except Provider.DoesNotExist:
             raise serializers.ValidationError("Provider not found or inactive")
@@ -81,11 +92,18 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         """Validate appointment slot if provided"""
         if value:
             try:
-                slot = AppointmentSlot.objects.get(id=value)
-                if slot.status != 'available':
+                slot = AppointmentSlot.objects.select_related('availability').get(id=value)
+                # A slot held for this booking is booked through its hold
+                hold = self.context.get('hold')
+                expected_status = 'held' if hold is not None and hold.slot_id == slot.id else 'available'
+                if slot.status != expected_status:
                     raise serializers.ValidationError("Selected appointment slot is not available")
+                self._slot = slot
                 return value
             except AppointmentSlot.DoesNotExist:
+                if virtual_slots_enabled():
+                    # May be a computed slot; resolved in validate()
+                    return value
                 raise serializers.ValidationError("Appointment slot not found")
         return value
     
@@ -103,24 +121,26 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Cross-field validation"""
+        # Resolve computed slots that have no row yet
+        if virtual_slots_enabled() and data.get('availability_id') and data.get('slot_start_time'):
+            self._resolve_virtual_slot(data)
+        
         # Validate appointment slot matches provider if provided
         if data.get('appointment_slot_id'):
-            try:
-                slot = AppointmentSlot.objects.get(id=data['appointment_slot_id'])
-                if str(slot.provider.id) != str(data['provider_id']):
-                    raise serializers.ValidationError({
-                        'appointment_slot_id': 'Appointment slot provider must match selected provider'
-                    })
-                
-                # Auto-fill appointment details from slot
-                data['appointment_date'] = slot.slot_start_time.date()
-                data['appointment_time'] = slot.slot_start_time.time()
-                data['duration_minutes'] = int((slot.slot_end_time - slot.slot_start_time).total_seconds() / 60)
-                
-            except AppointmentSlot.DoesNotExist:
+            slot = getattr(self, '_slot', None)
+            if slot is None or slot.id != data['appointment_slot_id']:
                 raise serializers.ValidationError({
                     'appointment_slot_id': 'Appointment slot not found'
                 })
+            if str(slot.provider_id) != str(data['provider_id']):
+                raise serializers.ValidationError({
+                    'appointment_slot_id': 'Appointment slot provider must match selected provider'
+                })
+            
+            # Auto-fill appointment details from slot
+            data['appointment_date'] = slot.slot_start_time.date()
+            data['appointment_time'] = slot.slot_start_time.time()
+            data['duration_minutes'] = int((slot.slot_end_time - slot.slot_start_time).total_seconds() / 60)
         
         # Validate video call requirements
         if data.get('appointment_mode') == 'video_call' and not data.get('video_call_link'):
@@ -136,45 +156,52 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         
         return data
     
-    def create(self, validated_data):
-        """Create new appointment"""
-        # Extract foreign key IDs
-        patient_id = validated_data.pop('patient_id')
-        provider_id = validated_data.pop('provider_id')
-        appointment_slot_id = validated_data.pop('appointment_slot_id', None)
-        
-        # Get related objects
-        patient = Patient.objects.get(id=patient_id)
-        provider = Provider.objects.get(id=provider_id)
-        appointment_slot = None
+    def _resolve_virtual_slot(self, data):
+        """Resolve availability_id and slot_start_time to a slot, without writing it"""
+        try:
+            availability = Availability.objects.select_related('provider').get(id=data['availability_id'])
+            slot = VirtualSlotResolver.resolve(availability, data['slot_start_time'])
+        except Availability.DoesNotExist:
+            raise serializers.ValidationError({'availability_id': 'Availability not found'})
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'slot_start_time': e.messages})
         
-        if appointment_slot_id:
-            appointment_slot = AppointmentSlot.objects.get(id=appointment_slot_id)
+        if data.get('appointment_slot_id') and data['appointment_slot_id'] != slot.id:
+            raise serializers.ValidationError({
+                'appointment_slot_id': 'Appointment slot does not match availability_id and slot_start_time'
+            })
+        if slot.status != 'available':
+            raise serializers.ValidationError({
+                'appointment_slot_id': 'Selected appointment slot is not available'
+            })
         
-        # Create appointment
-        appointment = Appointment.objects.create(
-            patient=patient,
-            provider=provider,
-            appointment_slot=appointment_slot,
-            **validated_data
-        )
+        data['appointment_slot_id'] = slot.id
+        self._slot = slot
+    
+    def create(self, validated_data):
+        """Book the appointment with the patient, provider and slot loaded during validation"""
+        validated_data.pop('patient_id')
+        validated_data.pop('provider_id')
+        appointment_slot_id = validated_data.pop('appointment_slot_id', None)
+        validated_data.pop('availability_id', None)
+        validated_data.pop('slot_start_time', None)
         
-        # Create history entry
-        AppointmentHistory.objects.create(
-            appointment=appointment,
-            action='created',
-            description=f'Appointment created for {patient.first_name} {patient.last_name}',
+        return BookingService.book(
+            self._patient,
+            self._provider,
+            self._slot if appointment_slot_id else None,
+            hold=self.context.get('hold'),
             performed_by=self.context.get('created_by', 'system'),
-            new_values={
-                'appointment_mode': appointment.appointment_mode,
-                'appointment_type': appointment.appointment_type,
-                'appointment_date': str(appointment.appointment_date),
-                'appointment_time': str(appointment.appointment_time),
-                'reason_for_visit': appointment.reason_for_visit,
-            }
+            **validated_data
         )
-        
-        return appointment
+
+
+class SlotHoldCreateSerializer(serializers.Serializer):
+    """Serializer for holding an appointment slot"""
+    
+    patient_id = serializers.UUIDField()
+    appointment_slot_id = serializers.UUIDField()
+    hold_minutes = serializers.IntegerField(required=False, min_value=1, max_value=MAX_HOLD_MINUTES)
 
 
 class AppointmentListSerializer(serializers.ModelSerializer):
@@ -364,7 +391,9 @@ class AppointmentListResponseSerializer(serializers.Serializer):
     """Response serializer for appointment listing"""
     success = serializers.BooleanField()
     message = serializers.CharField()
-    count = serializers.IntegerField()
+    count = serializers.IntegerField(allow_null=True)
+    next_cursor = serializers.CharField(required=False, allow_null=True)
+    has_next = serializers.BooleanField(required=False)
     data = AppointmentListSerializer(many=True)
 
 
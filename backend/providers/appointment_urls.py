@@ -10,6 +10,9 @@ from .appointment_views import (
     AppointmentCancelView,
     AppointmentHistoryView,
     AvailableSlotSearchView,
+    SlotHoldCreateView,
+    SlotHoldDetailView,
+    SlotHoldConfirmView,
 )
 
 urlpatterns = [
@@ -21,6 +24,11 @@ urlpatterns = [
     path('appointments/<uuid:appointment_id>/cancel/', AppointmentCancelView.as_view(), name='appointment-cancel'),
     path('appointments/<uuid:appointment_id>/history/', AppointmentHistoryView.as_view(), name='appointment-history'),
     
+    # Slot holds
+    path('appointments/holds/', SlotHoldCreateView.as_view(), name='slot-hold-create'),
+    path('appointments/holds/<uuid:hold_id>/', SlotHoldDetailView.as_view(), name='slot-hold-detail'),
+    path('appointments/holds/<uuid:hold_id>/confirm/', SlotHoldConfirmView.as_view(), name='slot-hold-confirm'),
+    
     # Available slot search
     path('appointments/slots/search/', AvailableSlotSearchView.as_view(), name='available-slots-search'),
 ]
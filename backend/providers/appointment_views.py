@@ -10,9 +10,9 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 
-from .appointment_models import Appointment, AppointmentHistory
+from .appointment_models import Appointment, AppointmentHistory, SlotHold
 from .appointment_serializers import (
     AppointmentCreateSerializer,
     AppointmentListSerializer,
@@ -22,62 +22,94 @@ from .appointment_serializers import (
     AppointmentCreateResponseSerializer,
     AppointmentListResponseSerializer,
     AppointmentErrorResponseSerializer,
+    SlotHoldCreateSerializer,
 )
-from .availability_models import AppointmentSlot
+from .availability_models import AppointmentSlot, Availability
+from .availability_virtual import VirtualSlotResolver, virtual_slots_enabled
 from .patient_models import Patient
+from .services.booking_service import BookingService, SlotUnavailable
+from .services.slot_hold_service import SlotHoldService
+from .utils.idempotency import idempotent
+from .utils.pagination import InvalidCursor, KeysetPaginator
 from .models import Provider
 
 logger = logging.getLogger(__name__)
 
 
+def create_appointment(data, context):
+    """Book an appointment from request data; returns the API response"""
+    try:
+        with transaction.atomic():
+            serializer = AppointmentCreateSerializer(
+                data=data,
+                context=context
+            )
+            
+            if serializer.is_valid():
+                appointment = serializer.save()
+                
+                logger.info(f"Appointment created successfully: {appointment.appointment_number}")
+                
+                return Response({
+                    'success': True,
+                    'message': 'Appointment created successfully',
+                    'data': AppointmentDetailSerializer(appointment).data
+                }, status=status.HTTP_201_CREATED)
+            
+            else:
+                logger.warning(f"Appointment creation failed: {serializer.errors}")
+                return Response({
+                    'success': False,
+                    'message': 'Appointment creation failed',
+                    'errors': serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+    
+    except SlotUnavailable as e:
+        logger.info(f"Appointment slot taken: {e.messages}")
+        return Response({
+            'success': False,
+            'message': 'Appointment slot is no longer available',
+            'errors': {'appointment_slot_id': e.messages}
+        }, status=status.HTTP_409_CONFLICT)
+    
+    except ValidationError as e:
+        logger.warning(f"Appointment creation failed: {e.messages}")
+        return Response({
+            'success': False,
+            'message': 'Appointment creation failed',
+            'errors': {'non_field_errors': e.messages}
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    except Exception as e:
+        logger.error(f"Error creating appointment: {str(e)}")
+        return Response({
+            'success': False,
+            'message': 'Internal server error',
+            'errors': {'detail': str(e)}
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class AppointmentCreateView(APIView):
     """API view for creating new appointments"""
     
     @swagger_auto_schema(
         operation_description="Create a new appointment booking",
         request_body=AppointmentCreateSerializer,
+        manual_parameters=[
+            openapi.Parameter('Idempotency-Key', openapi.IN_HEADER, description="Client-chosen key; retries with the same key get the first response back", type=openapi.TYPE_STRING),
+        ],
         responses={
             201: AppointmentCreateResponseSerializer,
             400: AppointmentErrorResponseSerializer,
             404: AppointmentErrorResponseSerializer,
+            409: AppointmentErrorResponseSerializer,
         },
         tags=['Appointments']
     )
+    @idempotent
     def post(self, request):
         """Create a new appointment"""
-        try:
-            with transaction.atomic():
-                serializer = AppointmentCreateSerializer(
-                    data=request.data,
-                    context={'created_by': 'api_user'}
-                )
-                
-                if serializer.is_valid():
-                    appointment = serializer.save()
-                    
-                    logger.info(f"Appointment created successfully: {appointment.appointment_number}")
-                    
-                    return Response({
-                        'success': True,
-                        'message': 'Appointment created successfully',
-                        'data': AppointmentDetailSerializer(appointment).data
-                    }, status=status.HTTP_201_CREATED)
-                
-                else:
-                    logger.warning(f"Appointment creation failed: {serializer.errors}")
-                    return Response({
-                        'success': False,
-                        'message': 'Appointment creation failed',
-                        'errors': serializer.errors
-                    }, status=status.HTTP_400_BAD_REQUEST)
-        
-        except Exception as e:
-            logger.error(f"Error creating appointment: {str(e)}")
-            return Response({
-                'success': False,
-                'message': 'Internal server error',
-                'errors': {'detail': str(e)}
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return create_appointment(request.data, {'created_by': 'api_user'})
 
 
 class AppointmentListView(APIView):
@@ -93,6 +125,8 @@ class AppointmentListView(APIView):
             openapi.Parameter('appointment_mode', openapi.IN_QUERY, description="Filter by appointment mode", type=openapi.TYPE_STRING),
             openapi.Parameter('limit', openapi.IN_QUERY, description="Limit number of results", type=openapi.TYPE_INTEGER),
             openapi.Parameter('offset', openapi.IN_QUERY, description="Offset for pagination", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination", type=openapi.TYPE_STRING),
+            openapi.Parameter('include_count', openapi.IN_QUERY, description="Include the total count (default: true with offset, false with cursor)", type=openapi.TYPE_BOOLEAN),
         ],
         responses={
             200: AppointmentListResponseSerializer,
@@ -118,6 +152,8 @@ class AppointmentListView(APIView):
                 offset = int(offset)
                 if limit > 500:  # Maximum limit
                     limit = 500
+                elif limit < 1:  # A cursor page needs a last row to point past
+                    limit = 1
             except ValueError:
                 limit = 50
                 offset = 0
@@ -149,8 +185,34 @@ class AppointmentListView(APIView):
             if appointment_mode:
                 queryset = queryset.filter(appointment_mode=appointment_mode)
             
-            # Get total count
-            total_count = queryset.count()
+            # The count is optional; it costs a scan of every matching row
+            cursor = request.query_params.get('cursor')
+            include_count = request.query_params.get(
+                'include_count', 'false' if cursor is not None else 'true'
+            ).lower() == 'true'
+            total_count = queryset.count() if include_count else None
+            
+            if cursor is not None:
+                paginator = KeysetPaginator(Appointment._meta.ordering)
+                try:
+                    appointments, next_cursor = paginator.paginate(queryset, cursor, limit)
+                except InvalidCursor as e:
+                    return Response({
+                        'success': False,
+                        'message': str(e),
+                        'errors': {'cursor': [str(e)]}
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                
+                serializer = AppointmentListSerializer(appointments, many=True)
+                return Response({
+                    'success': True,
+                    'message': 'Appointments retrieved successfully',
+                    'count': total_count,
+                    'limit': limit,
+                    'next_cursor': next_cursor,
+                    'has_next': next_cursor is not None,
+                    'data': serializer.data
+                }, status=status.HTTP_200_OK)
             
             # Apply pagination
             appointments = queryset[offset:offset + limit]
@@ -292,6 +354,9 @@ class AppointmentCancelView(APIView):
             },
             required=['cancellation_reason']
         ),
+        manual_parameters=[
+            openapi.Parameter('Idempotency-Key', openapi.IN_HEADER, description="Client-chosen key; retries with the same key get the first response back", type=openapi.TYPE_STRING),
+        ],
         responses={
             200: AppointmentCreateResponseSerializer,
             400: AppointmentErrorResponseSerializer,
@@ -299,11 +364,14 @@ class AppointmentCancelView(APIView):
         },
         tags=['Appointments']
     )
+    @idempotent
     def post(self, request, appointment_id):
         """Cancel appointment"""
         try:
             with transaction.atomic():
-                appointment = Appointment.objects.get(id=appointment_id)
+                # Locked so that a concurrent cancel waits, then sees the cancelled status and
+                # cannot give the slot place back a second time
+                appointment = Appointment.objects.select_for_update().get(id=appointment_id)
                 
                 # Check if appointment can be cancelled
                 if not appointment.can_be_cancelled:
@@ -320,11 +388,9 @@ class AppointmentCancelView(APIView):
                 appointment.cancelled_by = request.data.get('cancelled_by', 'api_user')
                 appointment.save()
                 
-                # Update appointment slot if linked
-                if appointment.appointment_slot:
-                    appointment.appointment_slot.status = 'available'
-                    appointment.appointment_slot.patient_id = None
-                    appointment.appointment_slot.save()
+                # Give the place in the appointment slot back if linked
+                if appointment.appointment_slot_id:
+                    BookingService.release(appointment.appointment_slot_id)
                 
                 # Create history entry
                 AppointmentHistory.objects.create(
@@ -411,6 +477,156 @@ class AppointmentHistoryView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class SlotHoldCreateView(APIView):
+    """API view for holding an appointment slot before booking it"""
+    
+    @swagger_auto_schema(
+        operation_description="Hold an available slot for a patient for a few minutes; confirm the hold to book it",
+        request_body=SlotHoldCreateSerializer,
+        responses={
+            201: AppointmentCreateResponseSerializer,
+            400: AppointmentErrorResponseSerializer,
+            404: AppointmentErrorResponseSerializer,
+            409: AppointmentErrorResponseSerializer,
+        },
+        tags=['Appointments']
+    )
+    def post(self, request):
+        """Hold a slot"""
+        serializer = SlotHoldCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Slot hold failed',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        try:
+            patient = Patient.objects.get(id=data['patient_id'], is_active=True)
+            hold = SlotHoldService.hold(data['appointment_slot_id'], patient, data.get('hold_minutes'))
+        
+        except Patient.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Patient not found',
+                'errors': {'patient_id': ['Patient not found or inactive']}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        except AppointmentSlot.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Appointment slot not found',
+                'errors': {'appointment_slot_id': ['Appointment slot not found']}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        except SlotUnavailable as e:
+            return Response({
+                'success': False,
+                'message': 'Appointment slot is not available',
+                'errors': {'appointment_slot_id': e.messages}
+            }, status=status.HTTP_409_CONFLICT)
+        
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'message': 'Slot hold failed',
+                'errors': {'non_field_errors': e.messages}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        logger.info(f"Slot {hold.slot_id} held until {hold.expires_at}")
+        
+        return Response({
+            'success': True,
+            'message': 'Slot held successfully',
+            'data': {
+                'hold_id': str(hold.id),
+                'appointment_slot_id': str(hold.slot_id),
+                'patient_id': str(hold.patient_id),
+                'expires_at': hold.expires_at.isoformat(),
+            }
+        }, status=status.HTTP_201_CREATED)
+
+
+class SlotHoldDetailView(APIView):
+    """API view for releasing a slot hold"""
+    
+    @swagger_auto_schema(
+        operation_description="Release a slot hold, making the slot available again",
+        responses={
+            200: AppointmentCreateResponseSerializer,
+            404: AppointmentErrorResponseSerializer,
+        },
+        tags=['Appointments']
+    )
+    def delete(self, request, hold_id):
+        """Release a hold"""
+        try:
+            hold = SlotHold.objects.get(id=hold_id)
+        except SlotHold.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Slot hold not found',
+                'errors': {'hold_id': ['Slot hold not found or already expired']}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        SlotHoldService.release(hold)
+        
+        return Response({
+            'success': True,
+            'message': 'Slot hold released successfully',
+            'data': {'hold_id': str(hold_id)}
+        }, status=status.HTTP_200_OK)
+
+
+class SlotHoldConfirmView(APIView):
+    """API view for booking a held slot"""
+    
+    @swagger_auto_schema(
+        operation_description="Confirm a slot hold into an appointment; the patient, provider and slot come from the hold",
+        request_body=AppointmentCreateSerializer,
+        manual_parameters=[
+            openapi.Parameter('Idempotency-Key', openapi.IN_HEADER, description="Client-chosen key; retries with the same key get the first response back", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            201: AppointmentCreateResponseSerializer,
+            400: AppointmentErrorResponseSerializer,
+            404: AppointmentErrorResponseSerializer,
+            409: AppointmentErrorResponseSerializer,
+        },
+        tags=['Appointments']
+    )
+    @idempotent
+    def post(self, request, hold_id):
+        """Book the held slot"""
+        try:
+            hold = SlotHold.objects.select_related('slot').get(id=hold_id)
+        except SlotHold.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Slot hold not found',
+                'errors': {'hold_id': ['Slot hold not found or already expired']}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if hold.is_expired:
+            return Response({
+                'success': False,
+                'message': 'Slot hold has expired',
+                'errors': {'hold_id': ['Slot hold has expired']}
+            }, status=status.HTTP_409_CONFLICT)
+        
+        slot = hold.slot
+        data = {
+            **request.data,
+            'patient_id': str(hold.patient_id),
+            'provider_id': str(slot.provider_id),
+            'appointment_slot_id': str(slot.id),
+            'appointment_date': str(slot.slot_start_time.date()),
+            'appointment_time': str(slot.slot_start_time.time()),
+        }
+        return create_appointment(data, {'created_by': 'api_user', 'hold': hold})
+
+
 class AvailableSlotSearchView(APIView):
     """API view for searching available appointment slots"""
     
@@ -478,6 +694,16 @@ class AvailableSlotSearchView(APIView):
                     'errors': {'date': ['Use YYYY-MM-DD format']}
                 }, status=status.HTTP_400_BAD_REQUEST)
             
+            if virtual_slots_enabled():
+                slots = self._get_virtual_slots(
+                    provider, date_from_obj, date_to_obj, appointment_type, duration_minutes
+                )
+                return Response({
+                    'success': True,
+                    'message': f'Found {len(slots)} available slots',
+                    'data': [self._format_slot(slot, provider) for slot in slots]
+                }, status=status.HTTP_200_OK)
+            
             # Build queryset for available slots
             queryset = AppointmentSlot.objects.filter(
                 provider=provider,
@@ -510,18 +736,7 @@ class AvailableSlotSearchView(APIView):
             slots = queryset[:100]  # Limit to 100 slots
             
             # Format response data
-            slot_data = []
-            for slot in slots:
-                slot_data.append({
-                    'id': slot.id,
-                    'slot_start_time': slot.slot_start_time,
-                    'slot_end_time': slot.slot_end_time,
-                    'local_start_time': slot.get_local_start_time(),
-                    'local_end_time': slot.get_local_end_time(),
-                    'duration_minutes': int((slot.slot_end_time - slot.slot_start_time).total_seconds() / 60),
-                    'appointment_type': slot.appointment_type,
-                    'provider_name': f"{provider.first_name} {provider.last_name}",
-                })
+            slot_data = [self._format_slot(slot, provider) for slot in slots]
             
             return Response({
                 'success': True,
@@ -536,3 +751,43 @@ class AvailableSlotSearchView(APIView):
                 'message': 'Internal server error',
                 'errors': {'detail': str(e)}
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def _format_slot(self, slot, provider):
+        """Format a slot for the search response"""
+        slot_data = {
+            'id': slot.id,
+            'slot_start_time': slot.slot_start_time,
+            'slot_end_time': slot.slot_end_time,
+            'local_start_time': slot.get_local_start_time(),
+            'local_end_time': slot.get_local_end_time(),
+            'duration_minutes': int((slot.slot_end_time - slot.slot_start_time).total_seconds() / 60),
+            'appointment_type': slot.appointment_type,
+            'remaining_capacity': slot.remaining_capacity,
+            'provider_name': f"{provider.first_name} {provider.last_name}",
+        }
+        if virtual_slots_enabled():
+            # Needed to book a slot that has no row yet
+            slot_data['availability_id'] = slot.availability_id
+        return slot_data
+    
+    def _get_virtual_slots(self, provider, date_from, date_to, appointment_type, duration_minutes):
+        """Compute the provider's available future slots from availability rules"""
+        availabilities = Availability.objects.filter(provider=provider).select_related('provider')
+        if appointment_type:
+            availabilities = availabilities.filter(appointment_type=appointment_type)
+        availabilities = VirtualSlotResolver.filter_availabilities(availabilities, date_from, date_to)
+        
+        now = timezone.now()
+        slots = [
+            slot for slot in VirtualSlotResolver.slots_for(availabilities, date_from, date_to)
+            if slot.status == 'available' and slot.slot_start_time >= now
+        ]
+        
+        if duration_minutes:
+            try:
+                duration = timedelta(minutes=int(duration_minutes))
+                slots = [slot for slot in slots if slot.slot_end_time - slot.slot_start_time >= duration]
+            except ValueError:
+                pass
+        
+        return slots[:100]  # Limit to 100 slots
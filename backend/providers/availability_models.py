@@ -6,6 +6,8 @@ from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
 import pytz
 from .models import Provider
+from .availability_recurrence import RecurrenceRule
+from .utils.timezone_utils import TimezoneConverter, get_timezone
 
 class Availability(models.Model):
     STATUS_CHOICES = [
@@ -42,6 +44,18 @@ class Availability(models.Model):
     is_recurring = models.BooleanField(default=False)
     recurrence_pattern = models.CharField(max_length=16, choices=RECURRENCE_CHOICES, blank=True, null=True)
     recurrence_end_date = models.DateField(blank=True, null=True)
+    recurrence_interval = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1), MaxValueValidator(52)]
+    )
+    recurrence_weekdays = models.JSONField(blank=True, default=list)  # 0=Monday ... 6=Sunday, weekly only
+    recurrence_count = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1), MaxValueValidator(1000)]
+    )
+    recurrence_exceptions = models.JSONField(blank=True, default=list)  # ISO dates to skip
+    materialized_until = models.DateField(blank=True, null=True)  # Slots exist up to this date (rolling horizon)
     slot_duration = models.PositiveIntegerField(
         default=30,
         validators=[MinValueValidator(15), MaxValueValidator(480)]  # 15 min to 8 hours
@@ -84,6 +98,9 @@ class Availability(models.Model):
         if self.is_recurring and self.recurrence_end_date and self.recurrence_end_date <= self.date:
             raise ValidationError('Recurrence end date must be after the start date')
         
+        if self.recurrence_weekdays and self.recurrence_pattern != 'weekly':
+            raise ValidationError('Recurrence weekdays are only supported for weekly recurrence')
+        
         if self.current_appointments > self.max_appointments_per_slot:
             raise ValidationError('Current appointments cannot exceed maximum appointments per slot')
 
@@ -96,7 +113,7 @@ class Availability(models.Model):
 
     def get_local_datetime(self, time_field):
         """Convert time to provider's timezone"""
-        provider_tz = pytz.timezone(self.timezone)
+        provider_tz = get_timezone(self.timezone)
         dt = datetime.combine(self.date, time_field)
         return provider_tz.localize(dt)
 
@@ -105,6 +122,10 @@ class Availability(models.Model):
         local_dt = self.get_local_datetime(time_field)
         return local_dt.astimezone(pytz.UTC)
 
+    def get_recurrence_rule(self):
+        """Get the recurrence rule engine for this availability"""
+        return RecurrenceRule.from_availability(self)
+
     @property
     def duration_minutes(self):
         """Calculate total duration in minutes"""
@@ -119,12 +140,21 @@ class Availability(models.Model):
             return 0
         return self.duration_minutes // (self.slot_duration + self.break_duration)
 
+# Places a slot row can still be booked for, as a query expression (see AppointmentSlot.remaining_capacity)
+REMAINING_CAPACITY = models.Case(
+    models.When(status='available', then=models.F('capacity') - models.F('booked_count')),
+    default=models.Value(0),
+    output_field=models.PositiveIntegerField()
+)
+
+
 class AppointmentSlot(models.Model):
     STATUS_CHOICES = [
         ('available', 'Available'),
         ('booked', 'Booked'),
         ('cancelled', 'Cancelled'),
         ('blocked', 'Blocked'),
+        ('held', 'Held'),  # Reserved by a SlotHold while the patient completes the booking
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -136,6 +166,10 @@ class AppointmentSlot(models.Model):
     patient_id = models.UUIDField(blank=True, null=True)
     appointment_type = models.CharField(max_length=16)
     booking_reference = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    # Appointments the slot takes, copied from the availability's max_appointments_per_slot;
+    # the slot is 'booked' once booked_count reaches it
+    capacity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    booked_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=django_timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -150,18 +184,42 @@ class AppointmentSlot(models.Model):
             models.UniqueConstraint(
                 fields=['provider', 'slot_start_time'],
                 name='unique_provider_slot_time'
+            ),
+            models.CheckConstraint(
+                check=models.Q(booked_count__lte=models.F('capacity')),
+                name='slot_booked_count_within_capacity'
             )
         ]
 
+    @property
+    def remaining_capacity(self):
+        return max(self.capacity - self.booked_count, 0) if self.status == 'available' else 0
+
     def clean(self):
         """Validate slot data"""
         if self.slot_start_time and self.slot_end_time:
             if self.slot_start_time >= self.slot_end_time:
                 raise ValidationError('Slot end time must be after start time')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that status transitions can be rolled up after save
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_status = self.status
+
+    @staticmethod
+    def new_booking_reference():
+        return f"BOOK-{uuid.uuid4().hex[:8].upper()}"
+
     def save(self, *args, **kwargs):
         if not self.booking_reference and self.status == 'booked':
-            self.booking_reference = f"BOOK-{uuid.uuid4().hex[:8].upper()}"
+            self.booking_reference = self.new_booking_reference()
         self.full_clean()
         super().save(*args, **kwargs)
 
@@ -170,13 +228,11 @@ class AppointmentSlot(models.Model):
 
     def get_local_start_time(self, timezone_str=None):
         """Get slot start time in specified timezone or provider's timezone"""
-        tz = pytz.timezone(timezone_str or self.availability.timezone)
-        return self.slot_start_time.astimezone(tz)
+        return TimezoneConverter.from_utc(self.slot_start_time, timezone_str or self.availability.timezone)
 
     def get_local_end_time(self, timezone_str=None):
         """Get slot end time in specified timezone or provider's timezone"""
-        tz = pytz.timezone(timezone_str or self.availability.timezone)
-        return self.slot_end_time.astimezone(tz)
+        return TimezoneConverter.from_utc(self.slot_end_time, timezone_str or self.availability.timezone)
 
 class AvailabilityTemplate(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -186,3 +242,108 @@ class AvailabilityTemplate(models.Model):
     default_settings = models.JSONField()
     created_at = models.DateTimeField(default=django_timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+
+class SlotGenerationJob(models.Model):
+    """Background job materializing the slots of a large availability"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    availability = models.ForeignKey(Availability, on_delete=models.CASCADE, related_name='generation_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    dates_total = models.PositiveIntegerField(default=0)
+    dates_processed = models.PositiveIntegerField(default=0)
+    slots_created = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(default=django_timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"SlotGenerationJob {self.id} ({self.status})"
+
+    @property
+    def progress_percent(self):
+        """Share of recurrence dates processed so far"""
+        if not self.dates_total:
+            return 100 if self.status == 'completed' else 0
+        return round(self.dates_processed * 100 / self.dates_total, 1)
+
+class ProviderDailyAvailability(models.Model):
+    """Slot counts per status for one provider on one local date, maintained on slot writes"""
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name='daily_availability')
+    date = models.DateField()  # In the timezone of the slot's availability
+    available_slots = models.IntegerField(default=0)
+    booked_slots = models.IntegerField(default=0)
+    cancelled_slots = models.IntegerField(default=0)
+    blocked_slots = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['provider', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'date'], name='unique_provider_daily_availability')
+        ]
+
+    def __str__(self):
+        return f"{self.provider_id} {self.date}: {self.available_slots}/{self.total_slots} available"
+
+    @property
+    def total_slots(self):
+        return self.available_slots + self.booked_slots + self.cancelled_slots + self.blocked_slots
+
+
+class ProviderScheduleVersion(models.Model):
+    """Counter bumped by every slot or availability write of a provider, served as an ETag"""
+    provider = models.OneToOneField(
+        Provider, on_delete=models.CASCADE, primary_key=True, related_name='schedule_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.provider_id} schedule v{self.version}"
+
+
+class AvailabilitySearchEntry(models.Model):
+    """Denormalized, indexed projection of a slot for public availability search"""
+    slot = models.OneToOneField(
+        AppointmentSlot, on_delete=models.CASCADE, primary_key=True, related_name='search_entry'
+    )
+    availability = models.ForeignKey(Availability, on_delete=models.CASCADE, related_name='search_entries')
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name='search_entries')
+    slot_start_time = models.DateTimeField()  # Stored in UTC
+    status = models.CharField(max_length=16)
+    appointment_type = models.CharField(max_length=16)
+    specialization = models.CharField(max_length=100)  # Lowercased, whitespace collapsed
+    location_type = models.CharField(max_length=16, blank=True, default='')
+    location_tokens = models.TextField(blank=True, default='')  # Space-delimited address tokens, not indexed
+    base_fee = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    insurance_accepted = models.BooleanField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['provider', 'slot_start_time']
+        indexes = [
+            models.Index(fields=['status', 'slot_start_time']),
+            models.Index(fields=['specialization', 'slot_start_time']),
+            models.Index(fields=['provider', 'slot_start_time']),
+            models.Index(fields=['location_type', 'slot_start_time']),
+            models.Index(fields=['base_fee']),
+        ]
+
+    def __str__(self):
+        return f"Search entry for slot {self.slot_id} ({self.status})"
@@ -0,0 +1,158 @@
+"""
+Recurrence rule engine for availability scheduling
+"""
+import calendar
+from datetime import date, datetime, timedelta
+
+
+class RecurrenceRule:
+    """
+    Lazy expansion of an availability recurrence.
+
+    Supports daily, weekly and monthly frequencies with an interval, a
+    by-weekday set (weekly only), an occurrence count, an inclusive until
+    date and exception dates. Exception dates are removed after the count
+    is applied, so they never shift later occurrences.
+
+    Occurrences are produced by a generator, and ``occurrences()`` jumps
+    straight to the first occurrence inside the requested window instead
+    of walking from the start date.
+    """
+
+    PATTERNS = ('daily', 'weekly', 'monthly')
+
+    def __init__(self, start_date, pattern=None, interval=1, weekdays=None,
+                 count=None, until=None, exceptions=None):
+        self.start_date = start_date
+        self.pattern = pattern if pattern in self.PATTERNS else None
+        self.interval = max(int(interval or 1), 1)
+        self.count = count
+        self.until = until
+        self.exceptions = {self._parse_date(value) for value in (exceptions or [])}
+
+        if self.pattern == 'weekly':
+            self.weekdays = sorted(set(weekdays)) if weekdays else [start_date.weekday()]
+        else:
+            self.weekdays = []
+
+    @classmethod
+    def from_availability(cls, availability):
+        """Build the rule described by an Availability record"""
+        if not availability.is_recurring or not (
+            availability.recurrence_end_date or availability.recurrence_count
+        ):
+            # Open-ended rules are not expanded; only the anchor date applies
+            return cls(availability.date, exceptions=availability.recurrence_exceptions)
+
+        return cls(
+            availability.date,
+            pattern=availability.recurrence_pattern,
+            interval=availability.recurrence_interval,
+            weekdays=availability.recurrence_weekdays,
+            count=availability.recurrence_count,
+            until=availability.recurrence_end_date,
+            exceptions=availability.recurrence_exceptions,
+        )
+
+    @staticmethod
+    def _parse_date(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+    @property
+    def last_date(self):
+        """Upper bound on the occurrence dates, or None for an unbounded rule"""
+        if self.pattern is None:
+            return self.start_date
+        if self.count is None:
+            return self.until
+        # The count-th occurrence can be found without walking the rule
+        last = self._occurrence_at(self.count - 1)
+        return min(last, self.until) if self.until else last
+
+    def occurrences(self, window_start=None, window_end=None):
+        """Yield occurrence dates within the inclusive window, in order"""
+        window_start = max(window_start or self.start_date, self.start_date)
+        end = self.last_date
+        if window_end is not None:
+            end = min(end, window_end) if end else window_end
+        if end is None:
+            raise ValueError('An end bound is required to expand an unbounded recurrence')
+
+        if self.pattern is None:
+            candidates = iter([(0, self.start_date)])
+        elif self.pattern == 'weekly':
+            candidates = self._weekly_from(window_start)
+        else:
+            candidates = self._stepped_from(window_start)
+
+        for index, occurrence in candidates:
+            if occurrence > end or (self.count is not None and index >= self.count):
+                return
+            if occurrence >= window_start and occurrence not in self.exceptions:
+                yield occurrence
+
+    def _stepped_occurrence(self, index):
+        if self.pattern == 'daily':
+            return self.start_date + timedelta(days=index * self.interval)
+        return self._add_months(self.start_date, index * self.interval)
+
+    def _stepped_from(self, window_start):
+        """Daily and monthly occurrences start at an index computed directly"""
+        if self.pattern == 'daily':
+            elapsed = (window_start - self.start_date).days
+        else:
+            elapsed = ((window_start.year - self.start_date.year) * 12
+                       + window_start.month - self.start_date.month)
+        index = max(-(-elapsed // self.interval), 0)
+        if self._stepped_occurrence(index) < window_start:
+            index += 1
+
+        while True:
+            yield index, self._stepped_occurrence(index)
+            index += 1
+
+    def _weekly_from(self, window_start):
+        """Weekly occurrences start at the active week containing window_start"""
+        anchor_monday = self.start_date - timedelta(days=self.start_date.weekday())
+        first_week = [wd for wd in self.weekdays if wd >= self.start_date.weekday()]
+        per_week = len(self.weekdays)
+
+        week = (window_start - anchor_monday).days // 7
+        week = max(-(-week // self.interval) * self.interval, 0)
+        if week == 0:
+            index = 0
+        else:
+            index = len(first_week) + (week // self.interval - 1) * per_week
+
+        while True:
+            monday = anchor_monday + timedelta(weeks=week)
+            for weekday in (first_week if week == 0 else self.weekdays):
+                yield index, monday + timedelta(days=weekday)
+                index += 1
+            week += self.interval
+
+    def _occurrence_at(self, index):
+        """Date of the index-th occurrence (zero based), ignoring exceptions"""
+        if self.pattern != 'weekly':
+            return self._stepped_occurrence(index)
+
+        first_week = [wd for wd in self.weekdays if wd >= self.start_date.weekday()]
+        anchor_monday = self.start_date - timedelta(days=self.start_date.weekday())
+        if index < len(first_week):
+            return anchor_monday + timedelta(days=first_week[index])
+        active_week, position = divmod(index - len(first_week), len(self.weekdays))
+        week = (active_week + 1) * self.interval
+        return anchor_monday + timedelta(weeks=week, days=self.weekdays[position])
+
+    @staticmethod
+    def _add_months(start, months):
+        """Add months keeping the anchor day, clamped to each month's length"""
+        month_index = start.month - 1 + months
+        year = start.year + month_index // 12
+        month = month_index % 12 + 1
+        day = min(start.day, calendar.monthrange(year, month)[1])
+        return date(year, month, day)
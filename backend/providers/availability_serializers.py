@@ -7,6 +7,10 @@ from .models import Provider
 from .availability_utils import (
     AvailabilityManager, SlotGenerator, AvailabilityValidator
 )
+from .availability_virtual import virtual_slots_enabled
+from .utils.timezone_utils import TimezoneConverter
+from .services.slot_generation_service import SlotGenerationService
+from .services.slot_horizon_service import SlotHorizonService, slot_horizon_days
 
 
 class LocationSerializer(serializers.Serializer):
@@ -37,14 +41,26 @@ class AvailabilityCreateSerializer(serializers.ModelSerializer):
         required=False,
         default=list
     )
+    recurrence_weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        required=False,
+        default=list
+    )
+    recurrence_exceptions = serializers.ListField(
+        child=serializers.DateField(),
+        required=False,
+        default=list
+    )
 
     class Meta:
         model = Availability
         fields = [
             'date', 'start_time', 'end_time', 'timezone', 'slot_duration',
             'break_duration', 'is_recurring', 'recurrence_pattern',
-            'recurrence_end_date', 'appointment_type', 'location', 'pricing',
-            'special_requirements', 'notes', 'max_appointments_per_slot'
+            'recurrence_end_date', 'recurrence_interval', 'recurrence_weekdays',
+            'recurrence_count', 'recurrence_exceptions', 'appointment_type',
+            'location', 'pricing', 'special_requirements', 'notes',
+            'max_appointments_per_slot'
         ]
 
     def validate(self, data):
@@ -67,7 +83,11 @@ class AvailabilityCreateSerializer(serializers.ModelSerializer):
             data.get('is_recurring', False),
             data.get('recurrence_pattern'),
             data['date'],
-            data.get('recurrence_end_date')
+            data.get('recurrence_end_date'),
+            interval=data.get('recurrence_interval', 1),
+            weekdays=data.get('recurrence_weekdays'),
+            count=data.get('recurrence_count'),
+            exceptions=data.get('recurrence_exceptions')
         )
         
         # Validate pricing
@@ -79,11 +99,12 @@ class AvailabilityCreateSerializer(serializers.ModelSerializer):
         
         return data
 
-    def create(self, validated_data):
-        """Create availability and generate slots using utility classes"""
-        import json
+    def build_instance(self, validated_data):
+        """Build the unsaved Availability described by validated data"""
         from decimal import Decimal
         
+        validated_data = dict(validated_data)
+        
         # Extract provider from context (passed from view)
         provider = self.context.get('provider') or self.context['request'].user
         validated_data['provider'] = provider
@@ -105,12 +126,38 @@ class AvailabilityCreateSerializer(serializers.ModelSerializer):
                 pricing_dict['base_fee'] = str(pricing_dict['base_fee'])
             validated_data['pricing'] = pricing_dict
         
+        # Store exception dates as ISO strings in the JSON field
+        validated_data['recurrence_exceptions'] = [
+            exception_date.isoformat()
+            for exception_date in validated_data.get('recurrence_exceptions', [])
+        ]
+        
+        return Availability(**validated_data)
+
+    def create(self, validated_data):
+        """Create availability and generate slots using utility classes"""
         # Create the availability instance
-        availability = Availability.objects.create(**validated_data)
+        availability = self.build_instance(validated_data)
+        availability.save(force_insert=True)
         
         # Generate appointment slots using SlotGenerator
         generator = SlotGenerator(availability)
-        slots_created = generator.generate_slots()
+        availability._generation_job = None
+        horizon_days = slot_horizon_days()
+        if virtual_slots_enabled():
+            # Slots are computed on read; report how many the rules produce
+            slots_created = len(generator.build_candidate_slots())
+        elif horizon_days:
+            # Only the rolling horizon is materialized; the rest follows via cron
+            slots_created = SlotHorizonService.extend(
+                availability, SlotHorizonService.horizon_end(horizon_days)
+            )
+        elif self.context.get('async_generation'):
+            # Slots are materialized by the background worker
+            availability._generation_job = SlotGenerationService.enqueue(availability)
+            slots_created = 0
+        else:
+            slots_created = generator.generate_slots()
         
         # Store slots count for response
         availability._slots_created = slots_created
@@ -124,12 +171,13 @@ class AppointmentSlotSerializer(serializers.ModelSerializer):
     end_time = serializers.SerializerMethodField()
     location = serializers.SerializerMethodField()
     pricing = serializers.SerializerMethodField()
+    remaining_capacity = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = AppointmentSlot
         fields = [
             'id', 'start_time', 'end_time', 'status', 'appointment_type',
-            'location', 'pricing', 'booking_reference'
+            'location', 'pricing', 'booking_reference', 'capacity', 'remaining_capacity'
         ]
     
     def get_start_time(self, obj):
@@ -162,9 +210,10 @@ class AvailabilityDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'date', 'start_time', 'end_time', 'timezone', 'slot_duration',
             'break_duration', 'is_recurring', 'recurrence_pattern',
-            'recurrence_end_date', 'status', 'max_appointments_per_slot',
-            'current_appointments', 'appointment_type', 'location', 'pricing',
-            'notes', 'special_requirements', 'created_at', 'updated_at', 'slots'
+            'recurrence_end_date', 'recurrence_interval', 'recurrence_weekdays',
+            'recurrence_count', 'recurrence_exceptions', 'materialized_until', 'status',
+            'max_appointments_per_slot', 'current_appointments', 'appointment_type', 'location',
+            'pricing', 'notes', 'special_requirements', 'created_at', 'updated_at', 'slots'
         ]
 
 
@@ -228,6 +277,7 @@ class SlotSearchSerializer(serializers.Serializer):
     start_time = serializers.SerializerMethodField()
     end_time = serializers.SerializerMethodField()
     appointment_type = serializers.CharField()
+    remaining_capacity = serializers.IntegerField(read_only=True)
     location = serializers.SerializerMethodField()
     pricing = serializers.SerializerMethodField()
     special_requirements = serializers.SerializerMethodField()
@@ -283,25 +333,30 @@ class AllProviderAvailabilitySerializer(serializers.ModelSerializer):
     
     def get_slots_count(self, obj):
         """Get total number of slots for this availability"""
-        return obj.slots.count() if hasattr(obj, 'slots') else 0
+        if hasattr(obj, 'slots_count'):
+            return obj.slots_count
+        return obj.slots.count()
     
     def get_available_slots_count(self, obj):
         """Get number of available slots"""
-        return obj.slots.filter(status='available').count() if hasattr(obj, 'slots') else 0
+        if hasattr(obj, 'available_slots_count'):
+            return obj.available_slots_count
+        return obj.slots.filter(status='available').count()
     
     def get_booked_slots_count(self, obj):
         """Get number of booked slots"""
-        return obj.slots.filter(status='booked').count() if hasattr(obj, 'slots') else 0
+        if hasattr(obj, 'booked_slots_count'):
+            return obj.booked_slots_count
+        return obj.slots.filter(status='booked').count()
     
     def get_local_start_time(self, obj):
         """Get start time in provider's timezone"""
         if obj.timezone:
             try:
-                provider_tz = pytz.timezone(obj.timezone)
                 # Combine date and time, then localize
                 naive_datetime = datetime.combine(obj.date, obj.start_time)
                 utc_datetime = pytz.UTC.localize(naive_datetime)
-                local_datetime = utc_datetime.astimezone(provider_tz)
+                local_datetime = TimezoneConverter.from_utc(utc_datetime, obj.timezone)
                 return local_datetime.strftime('%H:%M')
             except:
                 pass
@@ -311,11 +366,10 @@ class AllProviderAvailabilitySerializer(serializers.ModelSerializer):
         """Get end time in provider's timezone"""
         if obj.timezone:
             try:
-                provider_tz = pytz.timezone(obj.timezone)
                 # Combine date and time, then localize
                 naive_datetime = datetime.combine(obj.date, obj.end_time)
                 utc_datetime = pytz.UTC.localize(naive_datetime)
-                local_datetime = utc_datetime.astimezone(provider_tz)
+                local_datetime = TimezoneConverter.from_utc(utc_datetime, obj.timezone)
                 return local_datetime.strftime('%H:%M')
             except:
                 pass
@@ -1,11 +1,15 @@
 from django.urls import path
 from .availability_views import (
     ProviderAvailabilityCreateView,
+    AvailabilityBatchCreateView,
+    AvailabilityTemplateApplyView,
     ProviderAvailabilityListView,
+    ProviderAvailabilityCalendarView,
     AvailabilitySlotUpdateView,
     AvailabilitySearchView,
     AllProviderAvailabilityListView,
-    AvailabilitySlotListView
+    AvailabilitySlotListView,
+    SlotGenerationJobStatusView
 )
 
 urlpatterns = [
@@ -14,6 +18,15 @@ urlpatterns = [
     path('<uuid:provider_id>/availability', ProviderAvailabilityListView.as_view(), name='provider-availability-list'),
     path('availability/<uuid:slot_id>', AvailabilitySlotUpdateView.as_view(), name='availability-slot-update'),
     
+    # Per-day or per-hour slot counts for calendar views
+    path('<uuid:provider_id>/availability/calendar', ProviderAvailabilityCalendarView.as_view(), name='provider-availability-calendar'),
+    
+    # Create many availabilities in one transaction
+    path('availability/batch', AvailabilityBatchCreateView.as_view(), name='availability-batch-create'),
+    
+    # Apply an availability template to one or many providers
+    path('availability/templates/<uuid:template_id>/apply', AvailabilityTemplateApplyView.as_view(), name='availability-template-apply'),
+    
     # GET endpoint to display all provider availability data
     path('availability/display', AllProviderAvailabilityListView.as_view(), name='provider-availability-display'),
     
@@ -23,6 +36,9 @@ urlpatterns = [
     # Get available slots for a specific availability record
     path('availability/<uuid:availability_id>/slots', AvailabilitySlotListView.as_view(), name='availability-slots-list'),
     
+    # Background slot generation job status
+    path('availability/jobs/<uuid:job_id>', SlotGenerationJobStatusView.as_view(), name='slot-generation-job-status'),
+    
     # Public search endpoint
     path('availability/search', AvailabilitySearchView.as_view(), name='availability-search'),
 ]
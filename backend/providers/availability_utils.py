@@ -3,9 +3,17 @@ Utility functions for availability management
 """
 import pytz
 from datetime import datetime, timedelta, time
+from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from .availability_models import Availability, AppointmentSlot
+from .availability_recurrence import RecurrenceRule
+from .services.daily_availability_service import DailyAvailabilityService
+from .services.schedule_version_service import ScheduleVersionService
+from .services.search_cache_service import AvailabilitySearchCache
+from .services.search_index_service import SearchIndexService
+from .utils.interval_index import SlotIntervalIndex
+from .utils.timezone_utils import TimezoneConverter, get_timezone
 
 
 class AvailabilityManager:
@@ -15,7 +23,7 @@ class AvailabilityManager:
     def validate_timezone(timezone_str):
         """Validate if timezone string is valid"""
         try:
-            pytz.timezone(timezone_str)
+            get_timezone(timezone_str)
             return True
         except pytz.UnknownTimeZoneError:
             return False
@@ -23,13 +31,15 @@ class AvailabilityManager:
     @staticmethod
     def convert_to_utc(date_obj, time_obj, timezone_str):
         """Convert local date/time to UTC"""
+        return AvailabilityManager.convert_many_to_utc(date_obj, [time_obj], timezone_str)[0]
+    
+    @staticmethod
+    def convert_many_to_utc(date_obj, time_objs, timezone_str):
+        """Convert several local times on one date to UTC"""
         if not AvailabilityManager.validate_timezone(timezone_str):
             raise ValidationError(f"Invalid timezone: {timezone_str}")
         
-        local_tz = pytz.timezone(timezone_str)
-        local_dt = datetime.combine(date_obj, time_obj)
-        localized_dt = local_tz.localize(local_dt)
-        return localized_dt.astimezone(pytz.UTC)
+        return TimezoneConverter.to_utc_many(date_obj, time_objs, timezone_str)
     
     @staticmethod
     def convert_from_utc(utc_datetime, timezone_str):
@@ -37,88 +47,145 @@ class AvailabilityManager:
         if not AvailabilityManager.validate_timezone(timezone_str):
             raise ValidationError(f"Invalid timezone: {timezone_str}")
         
-        local_tz = pytz.timezone(timezone_str)
-        return utc_datetime.astimezone(local_tz)
+        return TimezoneConverter.from_utc(utc_datetime, timezone_str)
     
     @staticmethod
     def check_slot_conflicts(provider, start_datetime, end_datetime, exclude_slot_id=None):
         """Check for conflicting appointment slots"""
-        conflicts = AppointmentSlot.objects.filter(
-            provider=provider,
-            slot_start_time__lt=end_datetime,
-            slot_end_time__gt=start_datetime,
-            status__in=['available', 'booked']
-        )
+        return bool(AvailabilityManager.find_slot_conflicts(
+            provider, [(start_datetime, end_datetime)], exclude_slot_id
+        )[0][1])
+    
+    @staticmethod
+    def find_slot_conflicts(provider, intervals, exclude_slot_id=None):
+        """Map each (start, end) UTC interval to the active slots it overlaps, using one query"""
+        intervals = list(intervals)
+        if not intervals:
+            return []
         
-        if exclude_slot_id:
-            conflicts = conflicts.exclude(id=exclude_slot_id)
+        index = SlotIntervalIndex.for_provider(
+            provider,
+            min(start for start, _ in intervals),
+            max(end for _, end in intervals),
+            exclude_slot_id
+        )
+        return index.find_conflicts(intervals)
+    
+    @staticmethod
+    def occurrence_windows(availability):
+        """(date, utc_start, utc_end) of the availability window on each occurrence date"""
+        return [
+            (occurrence_date, *AvailabilityManager.convert_many_to_utc(
+                occurrence_date,
+                [availability.start_time, availability.end_time],
+                availability.timezone
+            ))
+            for occurrence_date in availability.get_recurrence_rule().occurrences()
+        ]
+    
+    @staticmethod
+    def group_conflicts_by_date(windows, results):
+        """Build a conflict report keyed by ISO date from find_slot_conflicts results"""
+        report = {}
+        for (occurrence_date, _, _), (_, overlapping) in zip(windows, results):
+            if overlapping:
+                report.setdefault(occurrence_date.isoformat(), []).extend(
+                    {
+                        'slot_id': str(slot.id),
+                        'conflicting_time': f"{slot.start} - {slot.end}",
+                        'status': slot.status
+                    }
+                    for slot in overlapping
+                )
+        return report
+    
+    @staticmethod
+    def preview_conflicts(availability):
+        """
+        Report the active slots overlapping each occurrence of an (unsaved)
+        availability, keyed by ISO occurrence date.
         
-        return conflicts.exists()
+        The whole recurrence window is checked with one range query, so
+        conflicts can be rejected before anything is written.
+        """
+        windows = AvailabilityManager.occurrence_windows(availability)
+        results = AvailabilityManager.find_slot_conflicts(
+            availability.provider, [(start, end) for _, start, end in windows]
+        )
+        return AvailabilityManager.group_conflicts_by_date(windows, results)
     
     @staticmethod
     def generate_recurring_dates(start_date, pattern, end_date):
         """Generate list of dates based on recurrence pattern"""
-        dates = [start_date]
-        current_date = start_date
-        
-        while current_date < end_date:
-            if pattern == 'daily':
-                current_date += timedelta(days=1)
-            elif pattern == 'weekly':
-                current_date += timedelta(weeks=1)
-            elif pattern == 'monthly':
-                # Handle month increment properly
-                if current_date.month == 12:
-                    current_date = current_date.replace(year=current_date.year + 1, month=1)
-                else:
-                    try:
-                        current_date = current_date.replace(month=current_date.month + 1)
-                    except ValueError:
-                        # Handle cases like Jan 31 -> Feb 31 (doesn't exist)
-                        if current_date.month == 12:
-                            current_date = current_date.replace(year=current_date.year + 1, month=1, day=28)
-                        else:
-                            current_date = current_date.replace(month=current_date.month + 1, day=28)
-            else:
-                break
-            
-            if current_date <= end_date:
-                dates.append(current_date)
-        
-        return dates
+        return list(RecurrenceRule(start_date, pattern, until=end_date).occurrences())
 
 
 class SlotGenerator:
     """Generator class for appointment slots"""
     
+    # Rows written per INSERT statement when materializing slots
+    bulk_create_batch_size = 500
+    
     def __init__(self, availability):
         self.availability = availability
     
-    def generate_slots(self):
-        """Generate all slots for the availability"""
-        dates = self._get_dates_to_process()
-        total_slots = 0
+    def generate_slots(self, window_start=None, window_end=None):
+        """Generate the slots for the availability, optionally within a date window, in a single batched pass"""
+        candidates = self.build_candidate_slots(window_start, window_end)
+        if not candidates:
+            return 0
+        
+        # One query indexes every slot the candidates could collide with
+        index = SlotIntervalIndex.for_provider(
+            self.availability.provider,
+            candidates[0][0],
+            max(slot_end for _, slot_end in candidates)
+        )
+        
+        slots = [
+            AppointmentSlot(
+                availability=self.availability,
+                provider=self.availability.provider,
+                slot_start_time=slot_start,
+                slot_end_time=slot_end,
+                appointment_type=self.availability.appointment_type,
+                capacity=self.availability.max_appointments_per_slot,
+                status='available'
+            )
+            for slot_start, slot_end in index.filter_candidates(candidates)
+        ]
         
-        for date in dates:
-            slots_created = self._generate_slots_for_date(date)
-            total_slots += slots_created
+        with transaction.atomic():
+            AppointmentSlot.objects.bulk_create(slots, batch_size=self.bulk_create_batch_size)
+            DailyAvailabilityService.record_created(slots)
+            SearchIndexService.index_slots(slots)
+            AvailabilitySearchCache.invalidate_slots(slots)
+            if slots:
+                ScheduleVersionService.bump([self.availability.provider_id])
         
-        return total_slots
+        return len(slots)
     
-    def _get_dates_to_process(self):
-        """Get list of dates to process based on recurrence"""
-        if not self.availability.is_recurring or not self.availability.recurrence_end_date:
-            return [self.availability.date]
+    def build_candidate_slots(self, window_start=None, window_end=None):
+        """Compute every (start, end) UTC slot of the recurrence in memory, sorted by start"""
+        candidates = []
         
-        return AvailabilityManager.generate_recurring_dates(
-            self.availability.date,
-            self.availability.recurrence_pattern,
-            self.availability.recurrence_end_date
-        )
+        for date in self._get_dates_to_process(window_start, window_end):
+            try:
+                candidates.extend(self._candidate_slots_for_date(date))
+            except ValidationError:
+                # Skip if timezone conversion fails
+                return []
+        
+        candidates.sort()
+        return candidates
+    
+    def _get_dates_to_process(self, window_start=None, window_end=None):
+        """Get the occurrence dates to process, optionally limited to a date window"""
+        return self.availability.get_recurrence_rule().occurrences(window_start, window_end)
     
-    def _generate_slots_for_date(self, date):
-        """Generate slots for a specific date"""
-        slots_created = 0
+    def _candidate_slots_for_date(self, date):
+        """Compute the UTC slot boundaries for a specific date"""
+        local_bounds = []
         current_time = self.availability.start_time
         slot_duration = timedelta(minutes=self.availability.slot_duration)
         break_duration = timedelta(minutes=self.availability.break_duration)
@@ -132,32 +199,7 @@ class SlotGenerator:
             if slot_end_dt.time() > self.availability.end_time:
                 break
             
-            # Convert to UTC for storage
-            try:
-                slot_start_utc = AvailabilityManager.convert_to_utc(
-                    date, current_time, self.availability.timezone
-                )
-                slot_end_utc = AvailabilityManager.convert_to_utc(
-                    date, slot_end_dt.time(), self.availability.timezone
-                )
-            except ValidationError:
-                # Skip if timezone conversion fails
-                break
-            
-            # Check for conflicts
-            if not AvailabilityManager.check_slot_conflicts(
-                self.availability.provider, slot_start_utc, slot_end_utc
-            ):
-                # Create the slot
-                AppointmentSlot.objects.create(
-                    availability=self.availability,
-                    provider=self.availability.provider,
-                    slot_start_time=slot_start_utc,
-                    slot_end_time=slot_end_utc,
-                    appointment_type=self.availability.appointment_type,
-                    status='available'
-                )
-                slots_created += 1
+            local_bounds.append((current_time, slot_end_dt.time()))
             
             # Move to next slot time
             next_slot_start = slot_end_dt + break_duration
@@ -167,7 +209,23 @@ class SlotGenerator:
             if next_slot_start.time() >= self.availability.end_time:
                 break
         
-        return slots_created
+        # Convert all boundaries of the date to UTC for storage in one pass
+        utc_times = AvailabilityManager.convert_many_to_utc(
+            date,
+            [bound for bounds in local_bounds for bound in bounds],
+            self.availability.timezone
+        )
+        return list(zip(utc_times[0::2], utc_times[1::2]))
+    
+    @staticmethod
+    def filter_conflicts(candidates, existing_slots):
+        """
+        Drop candidates that overlap an active slot or reuse an occupied start time.
+        
+        existing_slots are (slot_start, slot_end, status) tuples; see
+        SlotIntervalIndex.filter_candidates for the candidate format.
+        """
+        return SlotIntervalIndex(existing_slots).filter_candidates(candidates)
 
 
 class AvailabilityValidator:
@@ -208,7 +266,8 @@ class AvailabilityValidator:
             )
     
     @staticmethod
-    def validate_recurrence(is_recurring, recurrence_pattern, start_date, end_date):
+    def validate_recurrence(is_recurring, recurrence_pattern, start_date, end_date,
+                            interval=1, weekdays=None, count=None, exceptions=None):
         """Validate recurrence settings"""
         if is_recurring:
             if not recurrence_pattern:
@@ -219,6 +278,21 @@ class AvailabilityValidator:
             
             if end_date and end_date <= start_date:
                 raise ValidationError("Recurrence end date must be after start date")
+            
+            if interval is not None and interval < 1:
+                raise ValidationError("Recurrence interval must be at least 1")
+            
+            if weekdays:
+                if recurrence_pattern != 'weekly':
+                    raise ValidationError("Recurrence weekdays are only supported for weekly recurrence")
+                if any(day not in range(7) for day in weekdays):
+                    raise ValidationError("Recurrence weekdays must be between 0 (Monday) and 6 (Sunday)")
+            
+            if count is not None and count < 1:
+                raise ValidationError("Recurrence count must be at least 1")
+        
+        elif weekdays or count or exceptions:
+            raise ValidationError("Recurrence settings require is_recurring to be true")
     
     @staticmethod
     def validate_pricing(pricing_data):
@@ -263,7 +337,7 @@ class AvailabilityValidator:
 def handle_daylight_saving_transition(local_datetime, timezone_str):
     """Handle daylight saving time transitions"""
     try:
-        tz = pytz.timezone(timezone_str)
+        tz = get_timezone(timezone_str)
         # This will handle ambiguous times during DST transitions
         return tz.localize(local_datetime, is_dst=None)
     except pytz.AmbiguousTimeError:
@@ -287,24 +361,16 @@ def get_provider_timezone(provider):
 
 
 def calculate_slot_statistics(provider, start_date, end_date):
-    """Calculate availability statistics for a provider"""
-    slots = AppointmentSlot.objects.filter(
-        provider=provider,
-        slot_start_time__date__gte=start_date,
-        slot_start_time__date__lte=end_date
-    )
-    
-    total_slots = slots.count()
-    available_slots = slots.filter(status='available').count()
-    booked_slots = slots.filter(status='booked').count()
-    cancelled_slots = slots.filter(status='cancelled').count()
-    blocked_slots = slots.filter(status='blocked').count()
+    """Calculate availability statistics for a provider over local dates, from the daily rollup"""
+    stats = DailyAvailabilityService.summary(provider, start_date, end_date)
+    total_slots = stats['total_slots']
+    booked_slots = stats['booked_slots']
     
     return {
         'total_slots': total_slots,
-        'available_slots': available_slots,
+        'available_slots': stats['available_slots'],
         'booked_slots': booked_slots,
-        'cancelled_slots': cancelled_slots,
-        'blocked_slots': blocked_slots,
+        'cancelled_slots': stats['cancelled_slots'],
+        'blocked_slots': stats['blocked_slots'],
         'utilization_rate': (booked_slots / total_slots * 100) if total_slots > 0 else 0
     }
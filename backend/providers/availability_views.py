@@ -3,14 +3,26 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Prefetch
+from django.conf import settings
+from django.urls import reverse
+from django.http import Http404
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q, Count, Max, Prefetch, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.functions import TruncDate, TruncHour
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from zoneinfo import ZoneInfo
 import pytz
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .availability_models import Availability, AppointmentSlot
+from .availability_models import (
+    REMAINING_CAPACITY, Availability, AppointmentSlot, AvailabilitySearchEntry, AvailabilityTemplate,
+    ProviderDailyAvailability, SlotGenerationJob
+)
 from .availability_serializers import (
     AvailabilityCreateSerializer,
     AvailabilityDetailSerializer,
@@ -21,7 +33,26 @@ from .availability_serializers import (
     SlotSearchSerializer,
     AllProviderAvailabilitySerializer
 )
+from .availability_utils import AvailabilityManager, SlotGenerator
+from .utils.conditional import schedule_etag
+from .utils.interval_index import ACTIVE_SLOT_STATUSES
+from .utils.pagination import InvalidCursor, KeysetPaginator
+from .utils.streaming import STREAM_CHUNK_SIZE, STREAMED_ITEMS, stream_mode, streaming_json_response
+from .utils.timezone_utils import TimezoneConverter
+from .availability_virtual import (
+    VirtualSlotResolver,
+    virtual_slots_enabled,
+    virtual_slot_id,
+    parse_slot_start_time
+)
 from .models import Provider
+from .services.availability_batch_service import AvailabilityBatchService
+from .services.availability_template_service import AvailabilityTemplateService
+from .services.booking_service import ACTIVE_APPOINTMENT_STATUSES
+from .services.daily_availability_service import STATUS_COLUMNS
+from .services.search_cache_service import AvailabilitySearchCache
+from .services.search_index_service import normalize_text, search_index_enabled, tokenize
+from .services.slot_status_service import SlotStatusService
 from .authentication import JWTAuthentication
 from .permissions import IsProviderAuthenticated
 
@@ -50,8 +81,27 @@ class ProviderAvailabilityCreateView(APIView):
                     }
                 }
             ),
+            202: openapi.Response(
+                description="Availability created; slot generation queued",
+                examples={
+                    "application/json": {
+                        "success": True,
+                        "message": "Availability created; slot generation queued",
+                        "data": {
+                            "availability_id": "uuid-here",
+                            "job_id": "uuid-here",
+                            "job_status": "pending",
+                            "status_url": "/api/v1/provider/availability/jobs/uuid-here"
+                        }
+                    }
+                }
+            ),
             400: "Bad Request - Validation errors"
-        }
+        },
+        manual_parameters=[
+            openapi.Parameter('async', openapi.IN_QUERY, description="Queue slot generation to the background worker", type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('dry_run', openapi.IN_QUERY, description="Only report conflicts across the recurrence, grouped by date", type=openapi.TYPE_BOOLEAN),
+        ]
     )
     def post(self, request, provider_id):
         """Create new availability slots"""
@@ -65,28 +115,68 @@ class ProviderAvailabilityCreateView(APIView):
                 'errors': {'provider_id': ['Provider not found']}
             }, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = AvailabilityCreateSerializer(data=request.data, context={'request': request, 'provider': provider})
+        async_param = request.query_params.get('async')
+        if async_param is not None:
+            async_generation = async_param.lower() == 'true'
+        else:
+            async_generation = getattr(settings, 'AVAILABILITY_ASYNC_SLOT_GENERATION', False)
+        
+        serializer = AvailabilityCreateSerializer(
+            data=request.data,
+            context={'request': request, 'provider': provider, 'async_generation': async_generation}
+        )
         
         if serializer.is_valid():
-            # Check for conflicts with existing availability
-            conflicts = self._check_conflicts(provider, serializer.validated_data)
+            # Check the whole recurrence for conflicts before anything is written
+            preview = serializer.build_instance(serializer.validated_data)
+            conflicts_by_date = self._check_conflicts(preview)
+            
+            if request.query_params.get('dry_run', '').lower() == 'true':
+                return Response({
+                    'success': not conflicts_by_date,
+                    'message': 'Conflicting availability slots found' if conflicts_by_date else 'No conflicts found',
+                    'data': {
+                        'dry_run': True,
+                        'occurrences': sum(1 for _ in preview.get_recurrence_rule().occurrences()),
+                        'slots_planned': len(SlotGenerator(preview).build_candidate_slots()),
+                        'conflicts_by_date': conflicts_by_date
+                    }
+                }, status=status.HTTP_200_OK)
             
-            if conflicts:
+            if conflicts_by_date:
                 return Response({
                     'success': False,
                     'message': 'Conflicting availability slots found',
-                    'conflicts': conflicts
+                    'conflicts': [
+                        conflict for conflicts in conflicts_by_date.values() for conflict in conflicts
+                    ],
+                    'conflicts_by_date': conflicts_by_date
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            availability = serializer.save()
+            # The availability and its slots are written together or not at all
+            with transaction.atomic():
+                availability = serializer.save()
+            
+            job = availability._generation_job
+            if job is not None:
+                return Response({
+                    'success': True,
+                    'message': 'Availability created; slot generation queued',
+                    'data': {
+                        'availability_id': str(availability.id),
+                        'job_id': str(job.id),
+                        'job_status': job.status,
+                        'status_url': reverse('slot-generation-job-status', kwargs={'job_id': job.id})
+                    }
+                }, status=status.HTTP_202_ACCEPTED)
             
             # Count generated slots
-            slots_count = AppointmentSlot.objects.filter(availability=availability).count()
+            slots_count = availability._slots_created
             
             # Calculate date range
             date_range = {
                 'start': availability.date.strftime('%Y-%m-%d'),
-                'end': availability.recurrence_end_date.strftime('%Y-%m-%d') if availability.recurrence_end_date else availability.date.strftime('%Y-%m-%d')
+                'end': availability.get_recurrence_rule().last_date.strftime('%Y-%m-%d')
             }
             
             return Response({
@@ -106,37 +196,190 @@ class ProviderAvailabilityCreateView(APIView):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    def _check_conflicts(self, provider, validated_data):
-        """Check for conflicting availability slots"""
-        conflicts = []
+    def _check_conflicts(self, preview):
+        """Check every occurrence of the requested schedule for conflicting slots, grouped by date"""
+        return AvailabilityManager.preview_conflicts(preview)
+
+
+class AvailabilityBatchCreateView(APIView):
+    """Create many availabilities, for one or more providers, in one request"""
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['items'],
+            properties={
+                'items': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description="Availability definitions, each with a provider_id",
+                    items=openapi.Schema(type=openapi.TYPE_OBJECT)
+                ),
+                'all_or_nothing': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Write nothing if any item fails")
+            }
+        ),
+        responses={
+            201: "All availabilities created",
+            207: "Some availabilities created; see per-item results",
+            400: "No availabilities created"
+        }
+    )
+    def post(self, request):
+        """Create availabilities in batch"""
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': {'items': ['A non-empty list of availability definitions is required']}
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get existing slots for the provider on the same date
-        existing_slots = AppointmentSlot.objects.filter(
-            provider=provider,
-            slot_start_time__date=validated_data['date'],
-            status__in=['available', 'booked']
+        if len(items) > AvailabilityBatchService.max_items:
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': {'items': [f'At most {AvailabilityBatchService.max_items} items are allowed per batch']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, stats = AvailabilityBatchService.create(
+            items, all_or_nothing=str(request.data.get('all_or_nothing', False)).lower() == 'true'
         )
+        created = stats['created']
         
-        if existing_slots.exists():
-            # Convert new availability times to UTC for comparison
-            provider_tz = pytz.timezone(validated_data['timezone'])
-            new_start = provider_tz.localize(
-                datetime.combine(validated_data['date'], validated_data['start_time'])
-            ).astimezone(pytz.UTC)
-            new_end = provider_tz.localize(
-                datetime.combine(validated_data['date'], validated_data['end_time'])
-            ).astimezone(pytz.UTC)
-            
-            for slot in existing_slots:
-                # Check for overlap
-                if (slot.slot_start_time < new_end and slot.slot_end_time > new_start):
-                    conflicts.append({
-                        'slot_id': str(slot.id),
-                        'conflicting_time': f"{slot.slot_start_time} - {slot.slot_end_time}",
-                        'status': slot.status
-                    })
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        
+        return Response({
+            'success': created == len(results),
+            'message': f'{created} of {len(results)} availabilities created',
+            'data': {
+                'created': created,
+                'failed': len(results) - created,
+                'slots_created': stats['slots_created'],
+                'results': results,
+                'stats': stats
+            }
+        }, status=response_status)
+
+
+class AvailabilityTemplateApplyView(APIView):
+    """Apply an availability template to one or many providers over a date range"""
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['start_date', 'end_date'],
+            properties={
+                'start_date': openapi.Schema(type=openapi.TYPE_STRING, format='date'),
+                'end_date': openapi.Schema(type=openapi.TYPE_STRING, format='date'),
+                'provider_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
+                    description="Providers to apply the template to (defaults to the template owner)"
+                ),
+                'all_or_nothing': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Write nothing if any item fails")
+            }
+        ),
+        responses={
+            201: "Template applied to every provider",
+            207: "Template partly applied; see per-item results",
+            400: "Bad Request - Validation errors",
+            404: "Template not found"
+        }
+    )
+    def post(self, request, template_id):
+        """Apply availability template"""
+        template = AvailabilityTemplate.objects.filter(id=template_id).first()
+        if template is None:
+            return Response({
+                'success': False,
+                'message': 'Availability template not found',
+                'errors': {'template_id': ['Template not found']}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            start_date = datetime.strptime(request.data.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.data.get('end_date', ''), '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': {'date_range': ['start_date and end_date are required in YYYY-MM-DD format']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        provider_ids = request.data.get('provider_ids') or [template.provider_id]
+        try:
+            # In-process: a process pool per request would fork the app server; the
+            # apply_availability_template command fans large rollouts out instead
+            results, stats = AvailabilityTemplateService.apply(
+                template, provider_ids, start_date, end_date, workers=1,
+                all_or_nothing=str(request.data.get('all_or_nothing', False)).lower() == 'true'
+            )
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': {'template': e.messages}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if stats['items'] and stats['created'] == stats['items']:
+            response_status = status.HTTP_201_CREATED
+        elif stats['created']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
         
-        return conflicts
+        return Response({
+            'success': response_status == status.HTTP_201_CREATED,
+            'message': f"Template applied: {stats['created']} of {stats['items']} availabilities created",
+            'data': {
+                'template_id': str(template.id),
+                'results': results,
+                'stats': stats
+            }
+        }, status=response_status)
+
+
+class SlotGenerationJobStatusView(APIView):
+    """Get the progress of a background slot generation job"""
+
+    @swagger_auto_schema(
+        responses={
+            200: "Job status retrieved successfully",
+            404: "Job not found"
+        }
+    )
+    def get(self, request, job_id):
+        """Get slot generation job status"""
+        try:
+            job = SlotGenerationJob.objects.get(id=job_id)
+        except SlotGenerationJob.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Slot generation job not found',
+                'errors': {'job_id': ['Job not found']}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'success': True,
+            'message': 'Slot generation job status retrieved successfully',
+            'data': {
+                'job_id': str(job.id),
+                'availability_id': str(job.availability_id),
+                'status': job.status,
+                'attempts': job.attempts,
+                'dates_total': job.dates_total,
+                'dates_processed': job.dates_processed,
+                'progress_percent': job.progress_percent,
+                'slots_created': job.slots_created,
+                'error_message': job.error_message,
+                'started_at': job.started_at,
+                'completed_at': job.completed_at
+            }
+        }, status=status.HTTP_200_OK)
 
 
 class ProviderAvailabilityListView(APIView):
@@ -150,9 +393,12 @@ class ProviderAvailabilityListView(APIView):
             openapi.Parameter('status', openapi.IN_QUERY, description="Filter by status", type=openapi.TYPE_STRING),
             openapi.Parameter('appointment_type', openapi.IN_QUERY, description="Filter by appointment type", type=openapi.TYPE_STRING),
             openapi.Parameter('timezone', openapi.IN_QUERY, description="Timezone for response", type=openapi.TYPE_STRING),
+            openapi.Parameter('stream', openapi.IN_QUERY, description="Stream the response incrementally (true or ndjson)", type=openapi.TYPE_STRING),
+            openapi.Parameter('If-None-Match', openapi.IN_HEADER, description="ETag of a previous response; 304 if the provider's schedule is unchanged", type=openapi.TYPE_STRING),
         ],
-        responses={200: "Success"}
+        responses={200: "Success", 304: "Schedule unchanged"}
     )
+    @schedule_etag(lambda provider_id, **kwargs: provider_id)
     def get(self, request, provider_id):
         """Get availability for a specific provider"""
         # Validate required parameters
@@ -178,10 +424,11 @@ class ProviderAvailabilityListView(APIView):
         provider = get_object_or_404(Provider, id=provider_id)
         
         # Build query filters
+        # A half-open UTC range keeps the (provider, slot_start_time) index usable
         filters = Q(
             provider=provider,
-            slot_start_time__date__gte=start_date,
-            slot_start_time__date__lte=end_date
+            slot_start_time__gte=pytz.UTC.localize(datetime.combine(start_date, datetime.min.time())),
+            slot_start_time__lt=pytz.UTC.localize(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
         )
         
         # Add optional filters
@@ -191,73 +438,329 @@ class ProviderAvailabilityListView(APIView):
         if request.query_params.get('appointment_type'):
             filters &= Q(appointment_type=request.query_params.get('appointment_type'))
         
-        # Get slots
-        slots = AppointmentSlot.objects.filter(filters).select_related(
-            'availability', 'provider'
-        ).order_by('slot_start_time')
+        response_timezone = request.query_params.get('timezone')
+        if response_timezone and not AvailabilityManager.validate_timezone(response_timezone):
+            return Response({
+                'success': False,
+                'message': 'Invalid timezone'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Slots as plain rows, the status summary and the availability details
+        if virtual_slots_enabled():
+            slots = self._get_virtual_slots(provider, start_date, end_date, request.query_params)
+            rows = [
+                {
+                    'id': slot.id,
+                    'availability_id': slot.availability_id,
+                    'slot_start_time': slot.slot_start_time,
+                    'slot_end_time': slot.slot_end_time,
+                    'status': slot.status,
+                    'remaining_capacity': slot.remaining_capacity,
+                    'appointment_type': slot.appointment_type
+                }
+                for slot in slots
+            ]
+            summary = self._count_statuses(rows)
+            availabilities = {slot.availability_id: slot.availability for slot in slots}
+            availability_details = {
+                availability_id: {
+                    'location': availability.location,
+                    'pricing': availability.pricing,
+                    'timezone': availability.timezone
+                }
+                for availability_id, availability in availabilities.items()
+            }
+        else:
+            slots = AppointmentSlot.objects.filter(filters)
+            summary = slots.aggregate(
+                total_slots=Count('id'),
+                available_slots=Count('id', filter=Q(status='available')),
+                booked_slots=Count('id', filter=Q(status='booked')),
+                cancelled_slots=Count('id', filter=Q(status='cancelled')),
+                remaining_capacity=Coalesce(Sum(REMAINING_CAPACITY), 0)
+            )
+            rows = slots.order_by('slot_start_time').annotate(remaining_capacity=REMAINING_CAPACITY).values(
+                'id', 'availability_id', 'slot_start_time', 'slot_end_time', 'status', 'remaining_capacity',
+                'appointment_type'
+            )
+            availability_details = {
+                details.pop('id'): details
+                for details in Availability.objects.filter(
+                    id__in=slots.values('availability_id')
+                ).values('id', 'location', 'pricing', 'timezone')
+            }
+        
+        availabilities_data = {
+            str(availability_id): {
+                'location': details['location'],
+                'pricing': details['pricing']
+            }
+            for availability_id, details in availability_details.items()
+        }
+        
+        mode = stream_mode(request)
+        if mode:
+            if not virtual_slots_enabled():
+                rows = rows.iterator(chunk_size=STREAM_CHUNK_SIZE)
+            days = (
+                {'date': date_str, 'slots': slots_data}
+                for date_str, slots_data in self._group_by_date(rows, availability_details, response_timezone)
+            )
+            return streaming_json_response({
+                'success': True,
+                'data': {
+                    'provider_id': str(provider.id),
+                    'availability_summary': summary,
+                    'availabilities': availabilities_data,
+                    'availability': STREAMED_ITEMS
+                }
+            }, days, mode)
         
-        # Group slots by date
         availability_by_date = {}
-        total_slots = 0
-        available_slots = 0
-        booked_slots = 0
-        cancelled_slots = 0
+        for date_str, slots_data in self._group_by_date(rows, availability_details, response_timezone):
+            availability_by_date.setdefault(date_str, []).extend(slots_data)
         
-        for slot in slots:
-            local_start = slot.get_local_start_time()
-            date_str = local_start.strftime('%Y-%m-%d')
-            
-            if date_str not in availability_by_date:
-                availability_by_date[date_str] = []
+        return Response({
+            'success': True,
+            'data': {
+                'provider_id': str(provider.id),
+                'availability_summary': summary,
+                'availability': [
+                    {'date': date_str, 'slots': slots_data}
+                    for date_str, slots_data in availability_by_date.items()
+                ],
+                'availabilities': availabilities_data
+            }
+        })
+
+    @staticmethod
+    def _group_by_date(rows, availability_details, response_timezone=None):
+        """Yield (local date, slot dicts) for each run of slots sharing a local date"""
+        # Location and pricing are listed once per availability, not per slot
+        current_date = None
+        current_slots = []
+        for row in rows:
+            timezone_str = response_timezone or availability_details[row['availability_id']]['timezone']
+            local_start = TimezoneConverter.from_utc(row['slot_start_time'], timezone_str)
+            local_end = TimezoneConverter.from_utc(row['slot_end_time'], timezone_str)
             
-            availability_by_date[date_str].append(slot)
+            slot_data = {
+                'slot_id': str(row['id']),
+                'start_time': local_start.strftime('%H:%M'),
+                'end_time': local_end.strftime('%H:%M'),
+                'status': row['status'],
+                'remaining_capacity': row['remaining_capacity'],
+                'appointment_type': row['appointment_type'],
+                'availability_id': str(row['availability_id'])
+            }
+            if virtual_slots_enabled():
+                # Needed to book or block a slot that has no row yet
+                slot_data['utc_start_time'] = row['slot_start_time'].isoformat()
             
-            # Count slots by status
-            total_slots += 1
-            if slot.status == 'available':
-                available_slots += 1
-            elif slot.status == 'booked':
-                booked_slots += 1
-            elif slot.status == 'cancelled':
-                cancelled_slots += 1
+            date_str = local_start.strftime('%Y-%m-%d')
+            if date_str != current_date and current_slots:
+                yield current_date, current_slots
+                current_slots = []
+            current_date = date_str
+            current_slots.append(slot_data)
         
-        # Format response
-        availability_data = []
-        for date_str, date_slots in availability_by_date.items():
-            slots_data = []
-            for slot in date_slots:
-                local_start = slot.get_local_start_time()
-                local_end = slot.get_local_end_time()
-                
-                slots_data.append({
-                    'slot_id': str(slot.id),
-                    'start_time': local_start.strftime('%H:%M'),
-                    'end_time': local_end.strftime('%H:%M'),
-                    'status': slot.status,
-                    'appointment_type': slot.appointment_type,
-                    'location': slot.availability.location,
-                    'pricing': slot.availability.pricing
-                })
-            
-            availability_data.append({
-                'date': date_str,
-                'slots': slots_data
-            })
+        if current_slots:
+            yield current_date, current_slots
+
+    @staticmethod
+    def _count_statuses(rows):
+        """Status summary of in-memory slot rows"""
+        statuses = [row['status'] for row in rows]
+        return {
+            'total_slots': len(statuses),
+            'available_slots': statuses.count('available'),
+            'booked_slots': statuses.count('booked'),
+            'cancelled_slots': statuses.count('cancelled'),
+            'remaining_capacity': sum(row['remaining_capacity'] for row in rows)
+        }
+
+    def _get_virtual_slots(self, provider, start_date, end_date, query_params):
+        """Compute the provider's slots from availability rules"""
+        availabilities = VirtualSlotResolver.filter_availabilities(
+            Availability.objects.filter(provider=provider).select_related('provider'),
+            start_date, end_date
+        )
+        slots = VirtualSlotResolver.slots_for(availabilities, start_date, end_date)
+        
+        if query_params.get('status'):
+            slots = [slot for slot in slots if slot.status == query_params.get('status')]
+        
+        if query_params.get('appointment_type'):
+            slots = [slot for slot in slots if slot.appointment_type == query_params.get('appointment_type')]
+        
+        return slots
+
+
+class ProviderAvailabilityView(ProviderAvailabilityCreateView, ProviderAvailabilityListView):
+    """Create (POST) or list (GET) a provider's availability on one route"""
+
+
+# Slot statuses counted per calendar bucket, in response column order
+CALENDAR_STATUSES = ('available', 'booked', 'blocked')
+
+# Longest range served per calendar granularity, in days
+CALENDAR_MAX_DAYS = {'day': 366, 'hour': 31}
+
+
+class ProviderAvailabilityCalendarView(APIView):
+    """Per-day or per-hour slot counts for shading month and week calendars"""
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('provider_id', openapi.IN_PATH, description="Provider UUID", type=openapi.TYPE_STRING),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="First local date (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Last local date (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('granularity', openapi.IN_QUERY, description="Bucket size: day (default, up to 366 days) or hour (up to 31 days)", type=openapi.TYPE_STRING),
+            openapi.Parameter('timezone', openapi.IN_QUERY, description="Timezone of the buckets (defaults to the provider's availability timezone)", type=openapi.TYPE_STRING),
+            openapi.Parameter('If-None-Match', openapi.IN_HEADER, description="ETag of a previous response; 304 if the provider's schedule is unchanged", type=openapi.TYPE_STRING),
+        ],
+        responses={200: "Success", 304: "Schedule unchanged", 400: "Invalid parameters", 404: "Provider not found"}
+    )
+    @schedule_etag(lambda provider_id, **kwargs: provider_id)
+    def get(self, request, provider_id):
+        """Get slot counts per status for each local day or hour of a range"""
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in CALENDAR_MAX_DAYS:
+            return Response({
+                'success': False,
+                'message': 'granularity must be day or hour'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        if not start_date or not end_date:
+            return Response({
+                'success': False,
+                'message': 'start_date and end_date are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Invalid date format. Use YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if end_date < start_date:
+            return Response({
+                'success': False,
+                'message': 'end_date must not be before start_date'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_days = CALENDAR_MAX_DAYS[granularity]
+        if (end_date - start_date).days + 1 > max_days:
+            return Response({
+                'success': False,
+                'message': f'{granularity} granularity covers at most {max_days} days'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        requested_timezone = request.query_params.get('timezone')
+        if requested_timezone and not AvailabilityManager.validate_timezone(requested_timezone):
+            return Response({
+                'success': False,
+                'message': 'Invalid timezone'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        provider = get_object_or_404(Provider, id=provider_id)
+        provider_timezones = self._provider_timezones(provider)
+        timezone_str = requested_timezone or (provider_timezones[0] if provider_timezones else 'UTC')
+        
+        if virtual_slots_enabled():
+            buckets = self._count_virtual_slots(provider, start_date, end_date, granularity, timezone_str)
+        elif granularity == 'day' and not requested_timezone and len(provider_timezones) == 1:
+            # Rollup rows are keyed by the availabilities' local dates, which are the
+            # reported timezone's dates only when every availability shares it
+            buckets = self._count_daily_rollup(provider, start_date, end_date)
+        else:
+            buckets = self._count_slots(provider, start_date, end_date, granularity, timezone_str)
         
         return Response({
             'success': True,
             'data': {
                 'provider_id': str(provider.id),
-                'availability_summary': {
-                    'total_slots': total_slots,
-                    'available_slots': available_slots,
-                    'booked_slots': booked_slots,
-                    'cancelled_slots': cancelled_slots
-                },
-                'availability': availability_data
+                'granularity': granularity,
+                'timezone': timezone_str,
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                # Each bucket maps to its counts in this order; empty buckets are omitted
+                'statuses': list(CALENDAR_STATUSES),
+                'buckets': buckets
             }
         })
 
+    @staticmethod
+    def _provider_timezones(provider):
+        """Timezones of the provider's availabilities, that of the latest availability first"""
+        return list(Availability.objects.filter(provider=provider).values('timezone').annotate(
+            latest_date=Max('date')
+        ).order_by('-latest_date').values_list('timezone', flat=True))
+
+    @staticmethod
+    def _bucket_key(local_datetime, granularity):
+        if granularity == 'hour':
+            return local_datetime.strftime('%Y-%m-%dT%H:00')
+        return local_datetime.strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _count_daily_rollup(provider, start_date, end_date):
+        """Day buckets read from the daily availability rollup"""
+        rows = ProviderDailyAvailability.objects.filter(
+            provider=provider, date__gte=start_date, date__lte=end_date
+        ).order_by('date').values_list('date', *[STATUS_COLUMNS[status_name] for status_name in CALENDAR_STATUSES])
+        return {day.isoformat(): list(counts) for day, *counts in rows if any(counts)}
+
+    @classmethod
+    def _count_slots(cls, provider, start_date, end_date, granularity, timezone_str):
+        """Buckets grouped by the database in the given timezone"""
+        range_start = TimezoneConverter.to_utc(start_date, time.min, timezone_str)
+        range_end = TimezoneConverter.to_utc(end_date + timedelta(days=1), time.min, timezone_str)
+        # zoneinfo rather than pytz, so that the repeated hour of a DST change does not raise
+        trunc = TruncHour if granularity == 'hour' else TruncDate
+        rows = AppointmentSlot.objects.filter(
+            provider=provider,
+            slot_start_time__gte=range_start,
+            slot_start_time__lt=range_end,
+            status__in=CALENDAR_STATUSES
+        ).annotate(
+            bucket=trunc('slot_start_time', tzinfo=ZoneInfo(timezone_str))
+        ).values('bucket').annotate(**{
+            status_name: Count('id', filter=Q(status=status_name)) for status_name in CALENDAR_STATUSES
+        }).order_by('bucket')
+        
+        buckets = {}
+        for row in rows:
+            counts = buckets.setdefault(cls._bucket_key(row['bucket'], granularity), [0] * len(CALENDAR_STATUSES))
+            for index, status_name in enumerate(CALENDAR_STATUSES):
+                counts[index] += row[status_name]
+        return buckets
+
+    @classmethod
+    def _count_virtual_slots(cls, provider, start_date, end_date, granularity, timezone_str):
+        """Buckets counted from slots computed from availability rules"""
+        availabilities = VirtualSlotResolver.filter_availabilities(
+            Availability.objects.filter(provider=provider).select_related('provider'),
+            start_date - timedelta(days=1), end_date + timedelta(days=1)
+        )
+        slots = VirtualSlotResolver.slots_for(availabilities, start_date - timedelta(days=1), end_date + timedelta(days=1))
+        
+        buckets = {}
+        for slot in slots:
+            if slot.status not in CALENDAR_STATUSES:
+                continue
+            local_start = TimezoneConverter.from_utc(slot.slot_start_time, timezone_str)
+            if not start_date <= local_start.date() <= end_date:
+                continue
+            counts = buckets.setdefault(cls._bucket_key(local_start, granularity), [0] * len(CALENDAR_STATUSES))
+            counts[CALENDAR_STATUSES.index(slot.status)] += 1
+        return dict(sorted(buckets.items()))
+
 
 class AvailabilitySlotUpdateView(APIView):
     """Update or delete specific availability slot"""
@@ -292,32 +795,71 @@ class AvailabilitySlotUpdateView(APIView):
                 'errors': {'provider_id': ['Provider not found']}
             }, status=status.HTTP_404_NOT_FOUND)
         
-        slot = get_object_or_404(AppointmentSlot, id=slot_id, provider=provider)
-        
-        # Update slot fields
-        if 'status' in request.data:
-            new_status = request.data['status']
-            
-            # Validate status change
-            if slot.status == 'booked' and new_status != 'booked' and not request.data.get('force_update', False):
+        slot = AppointmentSlot.objects.filter(id=slot_id, provider=provider).first()
+        if slot is None:
+            if not virtual_slots_enabled():
+                raise Http404
+            # Computed slots get their row written on the first status change
+            try:
+                slot = self._materialize_virtual_slot(provider, slot_id, request.data)
+            except ValidationError as e:
                 return Response({
                     'success': False,
-                    'message': 'Cannot change status of booked slot without force_update=true'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            slot.status = new_status
-        
-        # Update availability notes if provided
-        if 'notes' in request.data:
-            slot.availability.notes = request.data['notes']
-            slot.availability.save()
-        
-        # Update pricing if provided
-        if 'pricing' in request.data:
-            slot.availability.pricing = request.data['pricing']
-            slot.availability.save()
+                    'message': 'Slot not found',
+                    'errors': {'slot_id': e.messages}
+                }, status=status.HTTP_404_NOT_FOUND)
         
-        slot.save()
+        with transaction.atomic():
+            # Locked so that bookings cannot change the place count under a status change
+            slot = AppointmentSlot.objects.select_for_update().select_related('availability').get(id=slot.id)
+            
+            # Update slot fields
+            if 'status' in request.data:
+                new_status = request.data['status']
+            
+                # Validate status change
+                if slot.status == 'booked' and new_status != 'booked' and not request.data.get('force_update', False):
+                    return Response({
+                        'success': False,
+                        'message': 'Cannot change status of booked slot without force_update=true'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+            
+                # Reactivated slots must not overlap slots created in the meantime
+                if (new_status in ACTIVE_SLOT_STATUSES and slot.status not in ACTIVE_SLOT_STATUSES and
+                        AvailabilityManager.check_slot_conflicts(
+                            provider, slot.slot_start_time, slot.slot_end_time, exclude_slot_id=slot.id)):
+                    return Response({
+                        'success': False,
+                        'message': 'Slot overlaps another active slot'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+            
+                # The place count follows the slot's appointments; a slot marked booked by hand is full
+                booked_count = slot.appointments.filter(status__in=ACTIVE_APPOINTMENT_STATUSES).count()
+                if new_status == 'booked':
+                    booked_count = slot.capacity
+                elif new_status == 'available' and booked_count >= slot.capacity:
+                    return Response({
+                        'success': False,
+                        'message': 'Slot is full. Cancel its appointments before making it available.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+            
+                slot.status = new_status
+                slot.booked_count = booked_count
+                if not booked_count:
+                    slot.patient_id = None
+            
+            # Update availability notes if provided
+            if 'notes' in request.data:
+                slot.availability.notes = request.data['notes']
+                slot.availability.save()
+            
+            # Update pricing if provided
+            if 'pricing' in request.data:
+                slot.availability.pricing = request.data['pricing']
+                slot.availability.save()
+            
+            # Only the columns set here, so that a stale copy cannot undo concurrent writes
+            slot.save(update_fields=['status', 'booked_count', 'patient_id', 'booking_reference', 'updated_at'])
         
         return Response({
             'success': True,
@@ -329,6 +871,23 @@ class AvailabilitySlotUpdateView(APIView):
             }
         })
 
+    def _materialize_virtual_slot(self, provider, slot_id, data):
+        """Write the row of a computed slot identified by availability_id and slot_start_time"""
+        if not data.get('availability_id') or not data.get('slot_start_time'):
+            raise ValidationError('availability_id and slot_start_time are required for computed slots')
+        
+        availability = Availability.objects.filter(
+            id=data['availability_id'], provider=provider
+        ).select_related('provider').first()
+        if availability is None:
+            raise ValidationError('Availability not found')
+        
+        slot_start_time = parse_slot_start_time(data['slot_start_time'])
+        if virtual_slot_id(availability.id, slot_start_time) != slot_id:
+            raise ValidationError('Slot id does not match availability_id and slot_start_time')
+        
+        return VirtualSlotResolver.materialize(availability, slot_start_time)
+
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('delete_recurring', openapi.IN_QUERY, description="Delete all recurring instances", type=openapi.TYPE_BOOLEAN),
@@ -350,8 +909,8 @@ class AvailabilitySlotUpdateView(APIView):
         
         slot = get_object_or_404(AppointmentSlot, id=slot_id, provider=provider)
         
-        # Check if slot is booked
-        if slot.status == 'booked':
+        # Check if slot is booked, fully or for some of its places
+        if slot.status == 'booked' or slot.booked_count:
             return Response({
                 'success': False,
                 'message': 'Cannot delete booked slot. Cancel the appointment first.'
@@ -366,13 +925,22 @@ class AvailabilitySlotUpdateView(APIView):
             # Delete all slots from the same recurring availability
             related_slots = AppointmentSlot.objects.filter(
                 availability=slot.availability,
-                status__in=['available', 'blocked', 'cancelled']
+                status__in=['available', 'blocked', 'cancelled'],
+                booked_count=0
             )
-            deleted_count = related_slots.count()
-            related_slots.delete()
-            
-            # Also delete the availability record
-            slot.availability.delete()
+            with transaction.atomic():
+                deleted_slots = list(related_slots.only(
+                    'id', 'provider_id', 'availability_id', 'slot_start_time', 'status'
+                ))
+                for related_slot in deleted_slots:
+                    related_slot.availability = slot.availability
+                deleted_count = len(deleted_slots)
+                related_slots.filter(id__in=[related_slot.id for related_slot in deleted_slots]).delete()
+                # Queryset deletes skip the per-slot receivers
+                SlotStatusService.record_deletes(deleted_slots)
+                
+                # Also delete the availability record
+                slot.availability.delete()
         else:
             slot.delete()
         
@@ -397,6 +965,7 @@ class AvailabilitySearchView(APIView):
             openapi.Parameter('end_date', openapi.IN_QUERY, description="End date for range", type=openapi.TYPE_STRING),
             openapi.Parameter('specialization', openapi.IN_QUERY, description="Provider specialization", type=openapi.TYPE_STRING),
             openapi.Parameter('location', openapi.IN_QUERY, description="Location (city, state, zip)", type=openapi.TYPE_STRING),
+            openapi.Parameter('location_type', openapi.IN_QUERY, description="Location type (clinic, hospital, telemedicine, home_visit)", type=openapi.TYPE_STRING),
             openapi.Parameter('appointment_type', openapi.IN_QUERY, description="Type of appointment", type=openapi.TYPE_STRING),
             openapi.Parameter('insurance_accepted', openapi.IN_QUERY, description="Insurance accepted", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('max_price', openapi.IN_QUERY, description="Maximum price", type=openapi.TYPE_NUMBER),
@@ -413,6 +982,7 @@ class AvailabilitySearchView(APIView):
             try:
                 specific_date = datetime.strptime(request.query_params.get('date'), '%Y-%m-%d').date()
                 date_filter = Q(slot_start_time__date=specific_date)
+                date_range = (specific_date, specific_date)
             except ValueError:
                 return Response({
                     'success': False,
@@ -423,6 +993,7 @@ class AvailabilitySearchView(APIView):
                 start_date = datetime.strptime(request.query_params.get('start_date'), '%Y-%m-%d').date()
                 end_date = datetime.strptime(request.query_params.get('end_date'), '%Y-%m-%d').date()
                 date_filter = Q(slot_start_time__date__gte=start_date, slot_start_time__date__lte=end_date)
+                date_range = (start_date, end_date)
             except ValueError:
                 return Response({
                     'success': False,
@@ -433,6 +1004,7 @@ class AvailabilitySearchView(APIView):
             today = timezone.now().date()
             end_date = today + timedelta(days=30)
             date_filter = Q(slot_start_time__date__gte=today, slot_start_time__date__lte=end_date)
+            date_range = (today, end_date)
         
         # Build query filters
         filters = date_filter
@@ -458,26 +1030,49 @@ class AvailabilitySearchView(APIView):
                 Q(provider__clinic_address__address__icontains=location_query)
             )
         
+        # Filter by location type
+        if request.query_params.get('location_type'):
+            filters &= Q(availability__location__type=request.query_params.get('location_type'))
+        
         # Filter by insurance acceptance
         if request.query_params.get('insurance_accepted'):
             insurance_accepted = request.query_params.get('insurance_accepted').lower() == 'true'
             filters &= Q(availability__pricing__insurance_accepted=insurance_accepted)
         
         # Filter by maximum price
+        max_price = None
         if request.query_params.get('max_price'):
             try:
-                max_price = float(request.query_params.get('max_price'))
-                filters &= Q(availability__pricing__base_fee__lte=max_price)
-            except ValueError:
+                max_price = Decimal(request.query_params.get('max_price'))
+            except InvalidOperation:
+                max_price = Decimal('NaN')
+            # Decimal() accepts inf and nan, which no fee compares against
+            if not max_price.is_finite():
                 return Response({
                     'success': False,
                     'message': 'Invalid max_price format'
                 }, status=status.HTTP_400_BAD_REQUEST)
+            filters &= Q(availability__pricing__base_fee__lte=float(max_price))
+        
+        # Identical searches are answered from the cache until a write touches their dates
+        cache_key = None
+        if AvailabilitySearchCache.enabled() and AvailabilitySearchCache.cacheable(date_range):
+            mode = 'virtual' if virtual_slots_enabled() else 'index' if search_index_enabled() else 'slots'
+            criteria = AvailabilitySearchCache.criteria(request.query_params, date_range, mode)
+            cache_key = AvailabilitySearchCache.key(criteria, date_range)
+            results = AvailabilitySearchCache.get(cache_key)
+            if results is not None:
+                return self._search_response(request.query_params, results, 'HIT')
         
         # Get slots with related data
-        slots = AppointmentSlot.objects.filter(filters).select_related(
-            'provider', 'availability'
-        ).order_by('provider_id', 'slot_start_time')[:100]  # Limit results
+        if virtual_slots_enabled():
+            slots = self._get_virtual_slots(request.query_params, date_range, available_only, max_price)
+        elif search_index_enabled():
+            slots = self._get_indexed_slots(request.query_params, date_range, available_only, max_price)
+        else:
+            slots = AppointmentSlot.objects.filter(filters).select_related(
+                'provider', 'availability'
+            ).order_by('provider_id', 'slot_start_time')[:100]  # Limit results
         
         # Group slots by provider
         providers_data = {}
@@ -523,16 +1118,23 @@ class AvailabilitySearchView(APIView):
                 'available_slots': available_slots
             })
         
+        if cache_key:
+            AvailabilitySearchCache.set(cache_key, results)
+            return self._search_response(request.query_params, results, 'MISS')
+        return self._search_response(request.query_params, results)
+
+    def _search_response(self, query_params, results, cache_status=None):
+        """Search response around the results, echoing the criteria as requested"""
         # Build search criteria for response
         search_criteria = {}
-        if request.query_params.get('date'):
-            search_criteria['date'] = request.query_params.get('date')
-        if request.query_params.get('specialization'):
-            search_criteria['specialization'] = request.query_params.get('specialization')
-        if request.query_params.get('location'):
-            search_criteria['location'] = request.query_params.get('location')
+        if query_params.get('date'):
+            search_criteria['date'] = query_params.get('date')
+        if query_params.get('specialization'):
+            search_criteria['specialization'] = query_params.get('specialization')
+        if query_params.get('location'):
+            search_criteria['location'] = query_params.get('location')
         
-        return Response({
+        response = Response({
             'success': True,
             'data': {
                 'search_criteria': search_criteria,
@@ -540,6 +1142,83 @@ class AvailabilitySearchView(APIView):
                 'results': results
             }
         })
+        if cache_status:
+            response['X-Cache'] = cache_status
+        return response
+
+    def _get_virtual_slots(self, query_params, date_range, available_only, max_price=None):
+        """Compute matching slots from availability rules"""
+        availability_filters = Q()
+        
+        if query_params.get('appointment_type'):
+            availability_filters &= Q(appointment_type=query_params.get('appointment_type'))
+        
+        if query_params.get('specialization'):
+            availability_filters &= Q(provider__specialization__icontains=query_params.get('specialization'))
+        
+        if query_params.get('location'):
+            location_query = query_params.get('location')
+            availability_filters &= (
+                Q(location__address__icontains=location_query) |
+                Q(provider__clinic_address__address__icontains=location_query)
+            )
+        
+        if query_params.get('location_type'):
+            availability_filters &= Q(location__type=query_params.get('location_type'))
+        
+        if query_params.get('insurance_accepted'):
+            insurance_accepted = query_params.get('insurance_accepted').lower() == 'true'
+            availability_filters &= Q(pricing__insurance_accepted=insurance_accepted)
+        
+        if max_price is not None:
+            availability_filters &= Q(pricing__base_fee__lte=float(max_price))
+        
+        availabilities = VirtualSlotResolver.filter_availabilities(
+            Availability.objects.filter(availability_filters).select_related('provider'),
+            *date_range
+        )
+        slots = VirtualSlotResolver.slots_for(availabilities, *date_range)
+        
+        if available_only:
+            slots = [slot for slot in slots if slot.status == 'available']
+        
+        slots.sort(key=lambda slot: (str(slot.provider_id), slot.slot_start_time))
+        return slots[:100]  # Limit results
+
+    def _get_indexed_slots(self, query_params, date_range, available_only, max_price=None):
+        """Find matching slots through the typed, indexed columns of the search index"""
+        entries = AvailabilitySearchEntry.objects.filter(
+            slot_start_time__gte=pytz.UTC.localize(datetime.combine(date_range[0], datetime.min.time())),
+            slot_start_time__lt=pytz.UTC.localize(datetime.combine(date_range[1] + timedelta(days=1), datetime.min.time()))
+        )
+        
+        if available_only:
+            entries = entries.filter(status='available')
+        
+        if query_params.get('appointment_type'):
+            entries = entries.filter(appointment_type=query_params.get('appointment_type'))
+        
+        if query_params.get('specialization'):
+            entries = entries.filter(specialization__contains=normalize_text(query_params.get('specialization')))
+        
+        # Every location word must start one of the address tokens. location_tokens is
+        # not indexed; this substring match scans the rows the indexed filters leave
+        for token in tokenize(query_params.get('location')):
+            entries = entries.filter(location_tokens__contains=f' {token}')
+        
+        if query_params.get('location_type'):
+            entries = entries.filter(location_type=query_params.get('location_type'))
+        
+        if query_params.get('insurance_accepted'):
+            entries = entries.filter(insurance_accepted=query_params.get('insurance_accepted').lower() == 'true')
+        
+        if max_price is not None:
+            entries = entries.filter(base_fee__lte=max_price)
+        
+        entries = entries.select_related('slot__availability', 'slot__provider').order_by(
+            'provider_id', 'slot_start_time'
+        )[:100]  # Limit results
+        return [entry.slot for entry in entries]
 
 
 class AllProviderAvailabilityListView(APIView):
@@ -559,8 +1238,11 @@ class AllProviderAvailabilityListView(APIView):
             openapi.Parameter('is_recurring', openapi.IN_QUERY, description="Filter by recurring availability", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('limit', openapi.IN_QUERY, description="Number of results per page (default: 50, max: 500)", type=openapi.TYPE_INTEGER),
             openapi.Parameter('offset', openapi.IN_QUERY, description="Offset for pagination", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination", type=openapi.TYPE_STRING),
+            openapi.Parameter('include_count', openapi.IN_QUERY, description="Include total and filtered counts (default: true with offset, false with cursor)", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('sort_by', openapi.IN_QUERY, description="Sort by field (date, provider_name, appointment_type, status, created_at)", type=openapi.TYPE_STRING),
             openapi.Parameter('order', openapi.IN_QUERY, description="Sort order (asc, desc)", type=openapi.TYPE_STRING),
+            openapi.Parameter('stream', openapi.IN_QUERY, description="Stream every matching record incrementally (true or ndjson); limit is optional", type=openapi.TYPE_STRING),
         ],
         responses={
             200: openapi.Response(
@@ -588,7 +1270,7 @@ class AllProviderAvailabilityListView(APIView):
         """Get all provider availability data with filtering and pagination"""
         try:
             # Start with all availability records
-            queryset = Availability.objects.select_related('provider').prefetch_related('slots')
+            queryset = Availability.objects.select_related('provider')
             
             # Apply filters
             filters = Q()
@@ -662,9 +1344,20 @@ class AllProviderAvailabilityListView(APIView):
             # Apply filters to queryset
             queryset = queryset.filter(filters)
             
-            # Get total count before pagination
-            total_count = Availability.objects.count()
-            filtered_count = queryset.count()
+            # Counts are optional; they cost a scan of the table and of the filtered rows
+            cursor = request.query_params.get('cursor')
+            include_count = request.query_params.get(
+                'include_count', 'false' if cursor is not None else 'true'
+            ).lower() == 'true'
+            total_count = Availability.objects.count() if include_count else None
+            filtered_count = queryset.count() if include_count else None
+            
+            # Slot counts are aggregated in the same query as the page
+            queryset = queryset.annotate(
+                slots_count=Count('slots'),
+                available_slots_count=Count('slots', filter=Q(slots__status='available')),
+                booked_slots_count=Count('slots', filter=Q(slots__status='booked'))
+            )
             
             # Sorting
             sort_by = request.query_params.get('sort_by', 'date')
@@ -683,20 +1376,33 @@ class AllProviderAvailabilityListView(APIView):
                 sort_field = sort_mapping[sort_by]
                 if order.lower() == 'desc':
                     sort_field = f'-{sort_field}'
-                queryset = queryset.order_by(sort_field)
             else:
-                queryset = queryset.order_by('date')
+                sort_field = 'date'
+            # The id tiebreaker keeps pages stable when sort values repeat
+            queryset = queryset.order_by(sort_field, 'id')
+            
+            mode = stream_mode(request)
+            if mode:
+                return self._stream(queryset, request.query_params, total_count, filtered_count, mode)
             
             # Pagination
-            limit = min(int(request.query_params.get('limit', 50)), 500)  # Max 500
-            offset = int(request.query_params.get('offset', 0))
+            limit = max(min(int(request.query_params.get('limit', 50)), 500), 1)  # Between 1 and 500
             
-            # Calculate pagination info
-            has_next = (offset + limit) < filtered_count
-            has_previous = offset > 0
+            if cursor is not None:
+                return self._cursor_page(queryset, sort_field, cursor, limit, total_count, filtered_count)
+            
+            offset = int(request.query_params.get('offset', 0))
             
             # Apply pagination
-            paginated_queryset = queryset[offset:offset + limit]
+            if filtered_count is not None:
+                has_next = (offset + limit) < filtered_count
+                paginated_queryset = queryset[offset:offset + limit]
+            else:
+                # Without a count, one extra row tells whether another page exists
+                paginated_queryset = list(queryset[offset:offset + limit + 1])
+                has_next = len(paginated_queryset) > limit
+                paginated_queryset = paginated_queryset[:limit]
+            has_previous = offset > 0
             
             # Serialize data
             serializer = AllProviderAvailabilitySerializer(paginated_queryset, many=True)
@@ -727,6 +1433,55 @@ class AllProviderAvailabilityListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+    def _cursor_page(self, queryset, sort_field, cursor, limit, total_count, filtered_count):
+        """Keyset page following the cursor"""
+        try:
+            records, next_cursor = KeysetPaginator([sort_field]).paginate(queryset, cursor, limit)
+        except InvalidCursor as e:
+            return Response({
+                'success': False,
+                'message': str(e),
+                'errors': {'cursor': [str(e)]}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = AllProviderAvailabilitySerializer(records, many=True)
+        return Response({
+            'success': True,
+            'message': f'Retrieved {len(serializer.data)} availability records',
+            'data': {
+                'total_count': total_count,
+                'filtered_count': filtered_count,
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None,
+                'has_previous': bool(cursor),
+                'availability_records': serializer.data
+            }
+        }, status=status.HTTP_200_OK)
+
+    def _stream(self, queryset, query_params, total_count, filtered_count, mode):
+        """Stream the matching records in chunks instead of one page"""
+        offset = int(query_params.get('offset', 0))
+        if query_params.get('limit'):
+            records = queryset[offset:offset + int(query_params['limit'])]
+        else:
+            records = queryset[offset:]
+        
+        return streaming_json_response({
+            'success': True,
+            'message': 'Streaming availability records',
+            'data': {
+                'total_count': total_count,
+                'filtered_count': filtered_count,
+                'offset': offset,
+                'availability_records': STREAMED_ITEMS
+            }
+        }, (
+            AllProviderAvailabilitySerializer(record).data
+            for record in records.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        ), mode)
+
+
 class AvailabilitySlotListView(APIView):
     """Get available appointment slots for a specific availability record"""
     permission_classes = [permissions.AllowAny]
@@ -737,6 +1492,7 @@ class AvailabilitySlotListView(APIView):
             openapi.Parameter('status', openapi.IN_QUERY, description="Filter by slot status (available, booked, cancelled)", type=openapi.TYPE_STRING),
             openapi.Parameter('date', openapi.IN_QUERY, description="Filter by specific date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
             openapi.Parameter('limit', openapi.IN_QUERY, description="Number of slots to return (default: 50)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('If-None-Match', openapi.IN_HEADER, description="ETag of a previous response; 304 if the provider's schedule is unchanged", type=openapi.TYPE_STRING),
         ],
         responses={
             200: openapi.Response(
@@ -754,9 +1510,13 @@ class AvailabilitySlotListView(APIView):
                     }
                 }
             ),
+            304: "Schedule unchanged",
             404: "Availability record not found"
         }
     )
+    @schedule_etag(lambda availability_id, **kwargs: Availability.objects.filter(
+        id=availability_id
+    ).values_list('provider_id', flat=True).first())
     def get(self, request, availability_id):
         """Get available appointment slots for a specific availability record"""
         try:
@@ -805,6 +1565,7 @@ class AvailabilitySlotListView(APIView):
                     'start_time': local_start.strftime('%H:%M'),
                     'end_time': local_end.strftime('%H:%M'),
                     'status': slot.status,
+                    'remaining_capacity': slot.remaining_capacity,
                     'appointment_type': slot.appointment_type,
                     'booking_reference': slot.booking_reference,
                     'utc_start_time': slot.slot_start_time.isoformat(),
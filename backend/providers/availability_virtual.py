@@ -0,0 +1,172 @@
+"""
+Virtual (computed-on-read) appointment slots
+
+When ``AVAILABILITY_VIRTUAL_SLOTS`` is enabled, availability rules are not
+expanded into AppointmentSlot rows up front. Free slots are computed on read
+from the Availability rules, and a real row is only written when a slot is
+booked, blocked or cancelled. Rows that exist always take precedence over the
+computed slot at the same start time.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .availability_models import AppointmentSlot
+from .availability_utils import AvailabilityManager, SlotGenerator
+
+# Namespace for deterministic virtual slot ids, so a computed slot keeps the
+# same id across reads and after it is materialized
+VIRTUAL_SLOT_NAMESPACE = uuid.UUID('6f1c1f0e-8a43-4b8e-9d0c-3b1b6c0a7e52')
+
+
+def virtual_slots_enabled():
+    """Check whether slots are computed on read instead of pre-materialized"""
+    return getattr(settings, 'AVAILABILITY_VIRTUAL_SLOTS', False)
+
+
+def virtual_slot_id(availability_id, slot_start_time):
+    """Deterministic id of the slot of an availability starting at slot_start_time"""
+    start_utc = slot_start_time.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return uuid.uuid5(VIRTUAL_SLOT_NAMESPACE, f"{availability_id}:{start_utc}")
+
+
+def parse_slot_start_time(value):
+    """Parse a slot start time from request data, treating naive values as UTC"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = parse_datetime(str(value)) if value else None
+    if parsed is None:
+        raise ValidationError('Invalid slot_start_time. Use ISO 8601 format')
+    if parsed.tzinfo is None:
+        parsed = pytz.UTC.localize(parsed)
+    return parsed.astimezone(pytz.UTC)
+
+
+class VirtualSlotResolver:
+    """Computes free slots from Availability rules minus materialized rows"""
+
+    @staticmethod
+    def filter_availabilities(queryset, start_date, end_date):
+        """Narrow an Availability queryset to rules that can produce slots in the date range"""
+        # Local dates may fall a day either side of the UTC range
+        padded_start = start_date - timedelta(days=1)
+        padded_end = end_date + timedelta(days=1)
+        return queryset.filter(date__lte=padded_end).filter(
+            Q(is_recurring=False, date__gte=padded_start) |
+            Q(is_recurring=True, recurrence_end_date__gte=padded_start) |
+            Q(is_recurring=True, recurrence_end_date__isnull=True)
+        )
+
+    @classmethod
+    def slots_for(cls, availabilities, start_date, end_date):
+        """
+        Get the slots whose UTC start date falls within the inclusive range.
+
+        Returns the materialized rows of the given availabilities together
+        with unsaved AppointmentSlot instances (``is_virtual`` set) for every
+        free computed slot, ordered by start time.
+        """
+        availabilities = list(availabilities)
+        if not availabilities:
+            return []
+
+        range_start = pytz.UTC.localize(datetime.combine(start_date, time.min))
+        range_end = pytz.UTC.localize(datetime.combine(end_date + timedelta(days=1), time.min))
+
+        availability_ids = {availability.id for availability in availabilities}
+        candidates_by_provider = defaultdict(list)
+        for availability in availabilities:
+            generator = SlotGenerator(availability)
+            candidates = generator.build_candidate_slots(
+                start_date - timedelta(days=1), end_date + timedelta(days=1)
+            )
+            candidates_by_provider[availability.provider_id].extend(
+                (slot_start, slot_end, availability)
+                for slot_start, slot_end in candidates
+                if range_start <= slot_start < range_end
+            )
+
+        # One query for every materialized row that can shadow a computed slot
+        rows = list(
+            AppointmentSlot.objects.filter(
+                provider_id__in={availability.provider_id for availability in availabilities},
+                slot_start_time__lt=range_end + timedelta(days=1),
+                slot_end_time__gt=range_start - timedelta(days=1)
+            ).select_related('availability', 'provider').order_by('slot_start_time')
+        )
+        rows_by_provider = defaultdict(list)
+        for row in rows:
+            rows_by_provider[row.provider_id].append(row)
+
+        slots = [
+            row for row in rows
+            if row.availability_id in availability_ids and range_start <= row.slot_start_time < range_end
+        ]
+        for provider_id, candidates in candidates_by_provider.items():
+            candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+            existing = [
+                (row.slot_start_time, row.slot_end_time, row.status)
+                for row in rows_by_provider[provider_id]
+            ]
+            for slot_start, slot_end, availability in SlotGenerator.filter_conflicts(candidates, existing):
+                slots.append(cls._build_virtual_slot(availability, slot_start, slot_end))
+
+        slots.sort(key=lambda slot: slot.slot_start_time)
+        return slots
+
+    @classmethod
+    def resolve(cls, availability, slot_start_time):
+        """
+        Get the slot of an availability starting at slot_start_time.
+
+        Returns the materialized row if one exists, otherwise an unsaved
+        virtual slot after checking it belongs to the availability schedule
+        and does not conflict with an active slot.
+        """
+        existing = AppointmentSlot.objects.filter(
+            provider_id=availability.provider_id,
+            slot_start_time=slot_start_time
+        ).select_related('availability', 'provider').first()
+        if existing:
+            return existing
+
+        local_date = AvailabilityManager.convert_from_utc(slot_start_time, availability.timezone).date()
+        candidates = SlotGenerator(availability).build_candidate_slots(local_date, local_date)
+        for slot_start, slot_end in candidates:
+            if slot_start == slot_start_time:
+                if AvailabilityManager.check_slot_conflicts(availability.provider, slot_start, slot_end):
+                    raise ValidationError('Slot conflicts with an existing appointment slot')
+                return cls._build_virtual_slot(availability, slot_start, slot_end)
+
+        raise ValidationError('Slot start time does not match the availability schedule')
+
+    @classmethod
+    def materialize(cls, availability, slot_start_time):
+        """Get the slot of an availability at slot_start_time, writing its row if needed"""
+        slot = cls.resolve(availability, slot_start_time)
+        if getattr(slot, 'is_virtual', False):
+            slot.save(force_insert=True)
+            slot.is_virtual = False
+        return slot
+
+    @staticmethod
+    def _build_virtual_slot(availability, slot_start, slot_end):
+        slot = AppointmentSlot(
+            id=virtual_slot_id(availability.id, slot_start),
+            availability=availability,
+            provider=availability.provider,
+            slot_start_time=slot_start,
+            slot_end_time=slot_end,
+            appointment_type=availability.appointment_type,
+            capacity=availability.max_appointments_per_slot,
+            status='available'
+        )
+        slot.is_virtual = True
+        return slot
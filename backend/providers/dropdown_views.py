@@ -14,10 +14,35 @@ from .dropdown_serializers import (
     PatientListResponseSerializer
 )
 from .serializers import ErrorResponseSerializer
+from .services.dropdown_search_service import (
+    dropdown_search_index_enabled,
+    patient_search_index,
+    provider_search_index
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Result limits in autocomplete mode
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 25
+
+AUTOCOMPLETE_PARAMETERS = [
+    openapi.Parameter(
+        'autocomplete',
+        openapi.IN_QUERY,
+        description="Typeahead mode: ranked prefix matches for search, at most 25 (default: false)",
+        type=openapi.TYPE_BOOLEAN,
+        required=False
+    )
+]
+
+
+def autocomplete_limit(query_params):
+    """Result limit requested for autocomplete mode"""
+    limit = int(query_params.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT))
+    return min(max(limit, 1), AUTOCOMPLETE_MAX_LIMIT)
+
 
 class ProviderListView(APIView):
     """
@@ -50,8 +75,15 @@ class ProviderListView(APIView):
                 description="Show only verified providers (default: true)",
                 type=openapi.TYPE_BOOLEAN,
                 required=False
+            ),
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Limit number of results in autocomplete mode (default: 10, max: 25)",
+                type=openapi.TYPE_INTEGER,
+                required=False
             )
-        ],
+        ] + AUTOCOMPLETE_PARAMETERS,
         responses={
             200: openapi.Response(
                 description="Providers retrieved successfully",
@@ -82,17 +114,32 @@ class ProviderListView(APIView):
             if specialization:
                 queryset = queryset.filter(specialization__icontains=specialization)
             
+            autocomplete = request.query_params.get('autocomplete', 'false').lower() == 'true'
+            matches = None
+            if search and dropdown_search_index_enabled():
+                matches = provider_search_index.matches(search, within=queryset)
+            
             # Search functionality
-            if search:
-                queryset = queryset.filter(
-                    Q(first_name__icontains=search) |
-                    Q(last_name__icontains=search) |
-                    Q(email__icontains=search) |
-                    Q(specialization__icontains=search)
+            if autocomplete and matches is not None:
+                # Ranked prefix matches straight from the token index
+                queryset = provider_search_index.ranked(
+                    search, within=queryset, limit=autocomplete_limit(request.query_params)
                 )
-            
-            # Order by name
-            queryset = queryset.order_by('first_name', 'last_name')
+            else:
+                if matches is not None:
+                    queryset = queryset.filter(pk__in=matches.values('owner_id'))
+                elif search:
+                    queryset = queryset.filter(
+                        Q(first_name__icontains=search) |
+                        Q(last_name__icontains=search) |
+                        Q(email__icontains=search) |
+                        Q(specialization__icontains=search)
+                    )
+                
+                # Order by name
+                queryset = queryset.order_by('first_name', 'last_name')
+                if autocomplete:
+                    queryset = queryset[:autocomplete_limit(request.query_params)]
             
             # Serialize data
             serializer = ProviderDropdownSerializer(queryset, many=True)
@@ -143,11 +190,11 @@ class PatientListView(APIView):
             openapi.Parameter(
                 'limit',
                 openapi.IN_QUERY,
-                description="Limit number of results (default: 100, max: 500)",
+                description="Limit number of results (default: 100, max: 500; autocomplete: 10, max 25)",
                 type=openapi.TYPE_INTEGER,
                 required=False
             )
-        ],
+        ] + AUTOCOMPLETE_PARAMETERS,
         responses={
             200: openapi.Response(
                 description="Patients retrieved successfully",
@@ -165,10 +212,13 @@ class PatientListView(APIView):
             # Get query parameters
             search = request.query_params.get('search', '').strip()
             verified_only = request.query_params.get('verified_only', 'false').lower() == 'true'
+            autocomplete = request.query_params.get('autocomplete', 'false').lower() == 'true'
             limit = int(request.query_params.get('limit', 100))
             
             # Validate limit
-            if limit > 500:
+            if autocomplete:
+                limit = autocomplete_limit(request.query_params)
+            elif limit > 500:
                 limit = 500
             elif limit < 1:
                 limit = 100
@@ -180,19 +230,29 @@ class PatientListView(APIView):
             if verified_only:
                 queryset = queryset.filter(email_verified=True)
             
-            # Search functionality
-            if search:
-                queryset = queryset.filter(
-                    Q(first_name__icontains=search) |
-                    Q(last_name__icontains=search) |
-                    Q(middle_name__icontains=search) |
-                    Q(preferred_name__icontains=search) |
-                    Q(email__icontains=search) |
-                    Q(phone_number__icontains=search)
-                )
+            matches = None
+            if search and dropdown_search_index_enabled():
+                matches = patient_search_index.matches(search, within=queryset)
             
-            # Order by name and limit results
-            queryset = queryset.order_by('first_name', 'last_name')[:limit]
+            # Search functionality
+            if autocomplete and matches is not None:
+                # Ranked prefix matches straight from the token index
+                queryset = patient_search_index.ranked(search, within=queryset, limit=limit)
+            else:
+                if matches is not None:
+                    queryset = queryset.filter(pk__in=matches.values('owner_id'))
+                elif search:
+                    queryset = queryset.filter(
+                        Q(first_name__icontains=search) |
+                        Q(last_name__icontains=search) |
+                        Q(middle_name__icontains=search) |
+                        Q(preferred_name__icontains=search) |
+                        Q(email__icontains=search) |
+                        Q(phone_number__icontains=search)
+                    )
+                
+                # Order by name and limit results
+                queryset = queryset.order_by('first_name', 'last_name')[:limit]
             
             # Serialize data
             serializer = PatientDropdownSerializer(queryset, many=True)
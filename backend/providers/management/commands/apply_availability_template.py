@@ -0,0 +1,62 @@
+"""
+Apply an availability template to one or many providers
+"""
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from providers.availability_models import AvailabilityTemplate
+from providers.models import Provider
+from providers.services.availability_template_service import AvailabilityTemplateService
+
+
+class Command(BaseCommand):
+    help = 'Apply an availability template to providers over a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('template_id', help='Availability template id')
+        parser.add_argument('--start-date', required=True, help='First date (YYYY-MM-DD)')
+        parser.add_argument('--end-date', required=True, help='Last date (YYYY-MM-DD)')
+        parser.add_argument('--provider', action='append', dest='providers', default=[],
+                            help='Provider id; repeat for several (defaults to the template owner)')
+        parser.add_argument('--all-providers', action='store_true', help='Apply to every active provider')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Slot generation processes (defaults to the CPU count for large rollouts)')
+        parser.add_argument('--all-or-nothing', action='store_true', help='Write nothing if any item fails')
+
+    def handle(self, *args, **options):
+        template = AvailabilityTemplate.objects.filter(id=options['template_id']).first()
+        if template is None:
+            raise CommandError(f"Availability template {options['template_id']} not found")
+
+        try:
+            start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Dates must use the YYYY-MM-DD format')
+
+        if options['all_providers']:
+            provider_ids = list(Provider.objects.filter(is_active=True).values_list('id', flat=True))
+        else:
+            provider_ids = options['providers'] or [template.provider_id]
+
+        try:
+            results, stats = AvailabilityTemplateService.apply(
+                template, provider_ids, start_date, end_date,
+                workers=options['workers'], all_or_nothing=options['all_or_nothing']
+            )
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
+
+        for result in results:
+            if not result['success']:
+                details = result.get('errors') or result.get('conflicts_by_date')
+                self.stderr.write(f"Item {result['index']} {result['status']}: {details}")
+
+        self.stdout.write(
+            f"Created {stats['created']} of {stats['items']} availabilities and {stats['slots_created']} slots "
+            f"in {stats['elapsed_seconds']}s ({stats['slots_per_second']} slots/s, {stats['workers']} workers)"
+        )
+        self.stdout.write(f"Phase timings: {stats['timings']}")
+        self.stdout.write(self.style.SUCCESS('Template applied'))
@@ -0,0 +1,21 @@
+"""
+Release expired slot holds; meant to run every minute or so from cron
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from providers.services.slot_hold_service import SlotHoldService
+
+
+class Command(BaseCommand):
+    help = 'Return slots whose holds have expired to available'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SlotHoldService.batch_size,
+                            help='Holds released per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        expired = SlotHoldService.expire(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {expired} expired slot holds'))
@@ -0,0 +1,39 @@
+"""
+Extend the rolling slot horizon and trim expired slots (cron-friendly)
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from providers.services.slot_horizon_service import SlotHorizonService, slot_horizon_days
+
+
+class Command(BaseCommand):
+    help = 'Materialize appointment slots up to the rolling horizon and delete expired unbooked slots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Horizon length in days (defaults to AVAILABILITY_SLOT_HORIZON_DAYS)')
+        parser.add_argument('--keep-days', type=int, default=0,
+                            help='Keep expired unbooked slots for this many days before trimming')
+        parser.add_argument('--skip-trim', action='store_true', help='Do not delete expired slots')
+
+    def handle(self, *args, **options):
+        days = options['days'] or slot_horizon_days()
+        if not days or days < 1:
+            raise CommandError('Set --days or AVAILABILITY_SLOT_HORIZON_DAYS to a positive number of days')
+
+        horizon_end = SlotHorizonService.horizon_end(days)
+        stats = SlotHorizonService.extend_all(horizon_end)
+        self.stdout.write(
+            f"Horizon extended to {horizon_end}: {stats['slots_created']} slots created "
+            f"for {stats['availabilities']} availabilities"
+        )
+
+        if not options['skip_trim']:
+            cutoff = timezone.now() - timedelta(days=options['keep_days'])
+            deleted = SlotHorizonService.trim_expired(cutoff)
+            self.stdout.write(f'Trimmed {deleted} expired slots')
+
+        self.stdout.write(self.style.SUCCESS('Slot horizon materialization finished'))
@@ -0,0 +1,21 @@
+"""
+Delete expired idempotency keys; meant to run hourly from cron
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from providers.services.idempotency_service import IdempotencyService
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys whose replay window has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=IdempotencyService.batch_size,
+                            help='Keys deleted per statement')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        purged = IdempotencyService.purge(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired idempotency keys'))
@@ -0,0 +1,21 @@
+"""
+Rebuild the availability search index from the slot table
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from providers.services.search_index_service import SearchIndexService, search_index_enabled
+
+
+class Command(BaseCommand):
+    help = 'Recreate every availability search entry from the current appointment slots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Slots loaded per query (defaults to SearchIndexService.batch_size)')
+
+    def handle(self, *args, **options):
+        if not search_index_enabled():
+            raise CommandError('AVAILABILITY_SEARCH_INDEX is disabled')
+
+        written = SearchIndexService.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Availability search index rebuilt with {written} entries'))
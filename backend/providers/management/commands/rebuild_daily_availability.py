@@ -0,0 +1,38 @@
+"""
+Backfill or repair the per-provider daily availability rollup
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from providers.services.daily_availability_service import DailyAvailabilityService
+
+
+class Command(BaseCommand):
+    help = 'Recount provider daily availability rows from the appointment slots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', action='append', dest='provider_ids', default=[],
+                            help='Provider ID to repair (repeatable; defaults to every provider)')
+        parser.add_argument('--start-date', help='First local date to repair (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Last local date to repair (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Slots read per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = self._parse_date(options['start_date'])
+            end_date = self._parse_date(options['end_date'])
+        except ValueError:
+            raise CommandError('Dates must use the YYYY-MM-DD format')
+        if start_date and end_date and end_date < start_date:
+            raise CommandError('--end-date must not be before --start-date')
+
+        rows = DailyAvailabilityService.rebuild(
+            options['provider_ids'] or None, start_date, end_date, chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} provider daily availability rows'))
+
+    @staticmethod
+    def _parse_date(value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
@@ -0,0 +1,32 @@
+"""
+Rebuild the provider and patient dropdown search tokens
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from providers.services.dropdown_search_service import (
+    dropdown_search_index_enabled,
+    patient_search_index,
+    provider_search_index
+)
+
+
+class Command(BaseCommand):
+    help = 'Recreate the dropdown search tokens of every provider and patient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows loaded and inserted per query')
+        parser.add_argument('--providers-only', action='store_true', help='Only rebuild provider tokens')
+        parser.add_argument('--patients-only', action='store_true', help='Only rebuild patient tokens')
+
+    def handle(self, *args, **options):
+        if not dropdown_search_index_enabled():
+            raise CommandError('DROPDOWN_SEARCH_INDEX is disabled')
+
+        if not options['patients_only']:
+            indexed = provider_search_index.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(f'Indexed {indexed} providers')
+        if not options['providers_only']:
+            indexed = patient_search_index.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(f'Indexed {indexed} patients')
+
+        self.stdout.write(self.style.SUCCESS('Dropdown search index rebuilt'))
@@ -0,0 +1,35 @@
+"""
+Worker process for background slot generation jobs
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from providers.services.slot_generation_service import SlotGenerationService
+
+
+class Command(BaseCommand):
+    help = 'Process queued slot generation jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=None, help='Exit after running this many jobs')
+
+    def handle(self, *args, **options):
+        processed = 0
+        max_jobs = options['max_jobs']
+
+        while True:
+            remaining = None if max_jobs is None else max_jobs - processed
+            ran = SlotGenerationService.run_pending(max_jobs=remaining)
+            processed += ran
+            if ran:
+                self.stdout.write(f'Processed {ran} slot generation job(s)')
+
+            if options['once'] or (max_jobs is not None and processed >= max_jobs):
+                break
+            if not ran:
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Slot generation worker finished: {processed} job(s)'))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:36
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0004_appointment_alter_patient_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availability',
+            name='recurrence_count',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)]),
+        ),
+        migrations.AddField(
+            model_name='availability',
+            name='recurrence_exceptions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='availability',
+            name='recurrence_interval',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(52)]),
+        ),
+        migrations.AddField(
+            model_name='availability',
+            name='recurrence_weekdays',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0005_availability_recurrence_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotGenerationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('dates_total', models.PositiveIntegerField(default=0)),
+                ('dates_processed', models.PositiveIntegerField(default=0)),
+                ('slots_created', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('availability', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to='providers.availability')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='providers_s_status_ed3a2d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0006_slotgenerationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availability',
+            name='materialized_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
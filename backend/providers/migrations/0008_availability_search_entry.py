@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:55
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _search_columns(availability, provider):
+    """Index columns shared by the slots of an availability, as the search index computed them at 0008"""
+    location = availability.location if isinstance(availability.location, dict) else {}
+    pricing = availability.pricing if isinstance(availability.pricing, dict) else {}
+    clinic_address = provider.clinic_address if isinstance(provider.clinic_address, dict) else {}
+
+    tokens = (
+        re.findall(r'[a-z0-9]+', str(location.get('address') or '').lower()) +
+        re.findall(r'[a-z0-9]+', str(clinic_address.get('address') or '').lower())
+    )
+    base_fee = pricing.get('base_fee')
+    if base_fee is None or isinstance(base_fee, bool):
+        base_fee = None
+    else:
+        try:
+            base_fee = Decimal(str(base_fee)).quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            base_fee = None
+    insurance_accepted = pricing.get('insurance_accepted')
+    return {
+        'specialization': ' '.join(str(provider.specialization or '').lower().split()),
+        'location_type': location.get('type') or '',
+        'location_tokens': f" {' '.join(dict.fromkeys(tokens))} " if tokens else '',
+        'base_fee': base_fee,
+        'insurance_accepted': insurance_accepted if isinstance(insurance_accepted, bool) else None,
+    }
+
+
+def backfill_search_entries(apps, schema_editor):
+    """Index the slots that already exist so search does not come up empty after deploy"""
+    if not getattr(settings, 'AVAILABILITY_SEARCH_INDEX', True):
+        return
+    AppointmentSlot = apps.get_model('providers', 'AppointmentSlot')
+    AvailabilitySearchEntry = apps.get_model('providers', 'AvailabilitySearchEntry')
+    slots = AppointmentSlot.objects.select_related('availability__provider').order_by('id')
+    last_id = None
+    while True:
+        page = slots.filter(id__gt=last_id) if last_id else slots
+        batch = list(page[:1000])
+        if not batch:
+            break
+        shared = {}
+        entries = []
+        for slot in batch:
+            if slot.availability_id not in shared:
+                shared[slot.availability_id] = _search_columns(slot.availability, slot.availability.provider)
+            entries.append(AvailabilitySearchEntry(
+                slot_id=slot.id,
+                availability_id=slot.availability_id,
+                provider_id=slot.provider_id,
+                slot_start_time=slot.slot_start_time,
+                status=slot.status,
+                appointment_type=slot.appointment_type,
+                **shared[slot.availability_id]
+            ))
+        AvailabilitySearchEntry.objects.bulk_create(entries)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0007_availability_materialized_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySearchEntry',
+            fields=[
+                ('slot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='providers.appointmentslot')),
+                ('slot_start_time', models.DateTimeField()),
+                ('status', models.CharField(max_length=16)),
+                ('appointment_type', models.CharField(max_length=16)),
+                ('specialization', models.CharField(max_length=100)),
+                ('location_type', models.CharField(blank=True, default='', max_length=16)),
+                ('location_tokens', models.TextField(blank=True, default='')),
+                ('base_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('insurance_accepted', models.BooleanField(blank=True, null=True)),
+                ('availability', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='providers.availability')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='providers.provider')),
+            ],
+            options={
+                'ordering': ['provider', 'slot_start_time'],
+                'indexes': [models.Index(fields=['status', 'slot_start_time'], name='providers_a_status_f4ba16_idx'), models.Index(fields=['specialization', 'slot_start_time'], name='providers_a_special_2dfc96_idx'), models.Index(fields=['provider', 'slot_start_time'], name='providers_a_provide_218c87_idx'), models.Index(fields=['location_type', 'slot_start_time'], name='providers_a_locatio_332167_idx'), models.Index(fields=['base_fee'], name='providers_a_base_fe_20cb10_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_search_entries, migrations.RunPython.noop),
+    ]
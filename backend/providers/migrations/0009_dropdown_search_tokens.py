@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:58
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# (field, weight) pairs tokenized per model, as the dropdown index defined them at 0009
+PROVIDER_FIELDS = (
+    ('first_name', 3), ('last_name', 3), ('email', 2), ('phone_number', 2), ('specialization', 1)
+)
+PATIENT_FIELDS = (
+    ('first_name', 3), ('last_name', 3), ('preferred_name', 2), ('middle_name', 2),
+    ('email', 2), ('phone_number', 2)
+)
+
+
+def _field_tokens(field, value):
+    value = str(value or '').lower().strip()
+    if not value:
+        return []
+    if field == 'phone_number':
+        digits = re.sub(r'\D', '', value)
+        return [digits, digits[-10:]] if len(digits) > 10 else [digits]
+    tokens = re.findall(r'[a-z0-9]+', value)
+    if field == 'email':
+        tokens.insert(0, value)
+    return tokens
+
+
+def _index_model(model, token_model, fields):
+    tokens = []
+    for instance in model.objects.order_by('pk').iterator(chunk_size=1000):
+        weights = {}
+        for field, weight in fields:
+            for token in _field_tokens(field, getattr(instance, field, None)):
+                weights[token[:64]] = max(weights.get(token[:64], 0), weight)
+        tokens.extend(token_model(owner=instance, token=token, weight=weight) for token, weight in weights.items())
+        if len(tokens) >= 1000:
+            token_model.objects.bulk_create(tokens)
+            tokens = []
+    token_model.objects.bulk_create(tokens)
+
+
+def backfill_search_tokens(apps, schema_editor):
+    """Tokenize existing providers and patients so dropdown search keeps finding them after deploy"""
+    if not getattr(settings, 'DROPDOWN_SEARCH_INDEX', True):
+        return
+    _index_model(apps.get_model('providers', 'Provider'), apps.get_model('providers', 'ProviderSearchToken'), PROVIDER_FIELDS)
+    _index_model(apps.get_model('providers', 'Patient'), apps.get_model('providers', 'PatientSearchToken'), PATIENT_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0008_availability_search_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='providers.provider')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'owner'], name='providers_p_token_194050_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='providers.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'owner'], name='providers_p_token_b249fe_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
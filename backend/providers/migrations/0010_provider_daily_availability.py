@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:02
+
+from collections import Counter, defaultdict
+
+import pytz
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_daily_availability(apps, schema_editor):
+    """Count the existing slots per provider and local date so the rollup starts in step with the slot table"""
+    AppointmentSlot = apps.get_model('providers', 'AppointmentSlot')
+    ProviderDailyAvailability = apps.get_model('providers', 'ProviderDailyAvailability')
+    columns = {'available': 'available_slots', 'booked': 'booked_slots', 'cancelled': 'cancelled_slots', 'blocked': 'blocked_slots'}
+
+    counts = defaultdict(Counter)
+    rows = AppointmentSlot.objects.values_list('provider_id', 'slot_start_time', 'status', 'availability__timezone')
+    for provider_id, slot_start_time, status, timezone_name in rows.iterator(chunk_size=2000):
+        day = slot_start_time.astimezone(pytz.timezone(timezone_name)).date()
+        counts[(provider_id, day)][status] += 1
+
+    ProviderDailyAvailability.objects.bulk_create(
+        [
+            ProviderDailyAvailability(
+                provider_id=provider_id,
+                date=day,
+                **{column: statuses.get(status, 0) for status, column in columns.items()}
+            )
+            for (provider_id, day), statuses in counts.items()
+        ],
+        batch_size=100
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0009_dropdown_search_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderDailyAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('available_slots', models.IntegerField(default=0)),
+                ('booked_slots', models.IntegerField(default=0)),
+                ('cancelled_slots', models.IntegerField(default=0)),
+                ('blocked_slots', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_availability', to='providers.provider')),
+            ],
+            options={
+                'ordering': ['provider', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='providerdailyavailability',
+            constraint=models.UniqueConstraint(fields=('provider', 'date'), name='unique_provider_daily_availability'),
+        ),
+        migrations.RunPython(backfill_daily_availability, migrations.RunPython.noop),
+    ]
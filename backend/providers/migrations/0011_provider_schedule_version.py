@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0010_provider_daily_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderScheduleVersion',
+            fields=[
+                ('provider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule_version', serialize=False, to='providers.provider')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
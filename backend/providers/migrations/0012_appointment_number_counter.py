@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0011_provider_schedule_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentNumberCounter',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0012_appointment_number_counter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointmentslot',
+            name='status',
+            field=models.CharField(choices=[('available', 'Available'), ('booked', 'Booked'), ('cancelled', 'Cancelled'), ('blocked', 'Blocked'), ('held', 'Held')], default='available', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='providers.patient')),
+                ('slot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hold', to='providers.appointmentslot')),
+            ],
+            options={
+                'ordering': ['expires_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:20
+
+from collections import Counter
+
+import django.core.validators
+import pytz
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_slot_capacity(apps, schema_editor):
+    """Copy capacities from the availabilities, count the places already taken in each slot and reopen unfilled group slots"""
+    AppointmentSlot = apps.get_model('providers', 'AppointmentSlot')
+    Appointment = apps.get_model('providers', 'Appointment')
+    Availability = apps.get_model('providers', 'Availability')
+    AvailabilitySearchEntry = apps.get_model('providers', 'AvailabilitySearchEntry')
+    ProviderDailyAvailability = apps.get_model('providers', 'ProviderDailyAvailability')
+
+    AppointmentSlot.objects.update(capacity=models.Subquery(
+        Availability.objects.filter(id=models.OuterRef('availability_id')).values('max_appointments_per_slot')[:1]
+    ))
+    has_appointment = models.Exists(Appointment.objects.filter(
+        appointment_slot_id=models.OuterRef('id'), status__in=['scheduled', 'confirmed', 'in_progress']
+    ))
+    AppointmentSlot.objects.filter(has_appointment).update(booked_count=1)
+    # Slots booked directly through the slot endpoint have no appointment but must stay full
+    AppointmentSlot.objects.filter(~has_appointment, status='booked').update(booked_count=models.F('capacity'))
+
+    # The old flow marked a slot booked after one appointment; reopen group slots with places left
+    reopened = AppointmentSlot.objects.filter(
+        status='booked', capacity__gt=1, booked_count__gt=0, booked_count__lt=models.F('capacity')
+    )
+    days = Counter(
+        (provider_id, slot_start_time.astimezone(pytz.timezone(timezone_name)).date())
+        for provider_id, slot_start_time, timezone_name in reopened.values_list(
+            'provider_id', 'slot_start_time', 'availability__timezone'
+        )
+    )
+    AvailabilitySearchEntry.objects.filter(slot__in=reopened).update(status='available')
+    reopened.update(status='available')
+    for (provider_id, day), count in days.items():
+        ProviderDailyAvailability.objects.filter(provider_id=provider_id, date=day).update(
+            booked_slots=models.F('booked_slots') - count,
+            available_slots=models.F('available_slots') + count
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0014_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='unique_provider_appointment_time',
+        ),
+        migrations.AddField(
+            model_name='appointmentslot',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='appointmentslot',
+            name='capacity',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='appointment_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='providers.appointmentslot'),
+        ),
+        migrations.RunPython(backfill_slot_capacity, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('appointment_slot__isnull', True), ('status__in', ['scheduled', 'confirmed', 'in_progress'])), fields=('provider', 'appointment_date', 'appointment_time'), name='unique_provider_appointment_time'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['scheduled', 'confirmed', 'in_progress'])), fields=('appointment_slot', 'patient'), name='unique_slot_patient'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentslot',
+            constraint=models.CheckConstraint(check=models.Q(('booked_count__lte', models.F('capacity'))), name='slot_booked_count_within_capacity'),
+        ),
+    ]
@@ -57,6 +57,20 @@ class Provider(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
+class ProviderSearchToken(models.Model):
+    """Normalized search token of a provider, for indexed prefix lookups"""
+    owner = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'owner']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} ({self.owner_id})"
+
 class RefreshToken(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name='refresh_tokens')
@@ -255,6 +255,20 @@ class Patient(models.Model):
         address_parts.extend([self.city, self.state, self.zipcode])
         return ", ".join(address_parts)
 
+class PatientSearchToken(models.Model):
+    """Normalized search token of a patient, for indexed prefix lookups"""
+    owner = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'owner']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} ({self.owner_id})"
+
 class VerificationToken(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='verification_tokens')
@@ -0,0 +1,121 @@
+"""
+Collision-free appointment numbers
+
+Numbers are APT-YYYYMMDD-XXXX, where XXXX encodes a per-day sequence value
+from AppointmentNumberCounter. Each process leases a block of values with
+one atomic increment of the day's counter row and hands them out from
+memory, so most bookings run no query for their number and the counter row
+is locked once per block rather than once per booking. A block is only
+reused after the transaction that leased it commits; a rolled-back lease
+also rolls back the counter, so its values are never handed out twice.
+
+Values below 36^4 are permuted before base36 encoding, so consecutive
+bookings do not get consecutive-looking suffixes; larger values widen the
+suffix to keep numbers unique.
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..appointment_models import AppointmentNumberCounter
+
+SUFFIX_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+SUFFIX_LENGTH = 4
+SUFFIX_SPACE = len(SUFFIX_ALPHABET) ** SUFFIX_LENGTH
+
+# Coprime with 36, so multiplying by it permutes [0, SUFFIX_SPACE)
+SUFFIX_MULTIPLIER = 1000003
+
+
+def number_block_size():
+    """Sequence values leased from the counter at a time"""
+    return max(1, getattr(settings, 'APPOINTMENT_NUMBER_BLOCK_SIZE', 20))
+
+
+def format_appointment_number(day, value):
+    """Appointment number of a day's sequence value"""
+    if value < SUFFIX_SPACE:
+        value = value * SUFFIX_MULTIPLIER % SUFFIX_SPACE
+    suffix = ''
+    while value:
+        value, digit = divmod(value, len(SUFFIX_ALPHABET))
+        suffix = SUFFIX_ALPHABET[digit] + suffix
+    return f"APT-{day.strftime('%Y%m%d')}-{suffix.rjust(SUFFIX_LENGTH, '0')}"
+
+
+class AppointmentNumberAllocator:
+    """Hands out appointment numbers from blocks leased off the per-day counter"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # day -> [next value, end value), only for committed leases
+        self._blocks = {}
+
+    def allocate(self, day=None):
+        """Next unused appointment number of a day (today in UTC by default)"""
+        day = day or timezone.now().date()
+        with self._lock:
+            block = self._blocks.get(day)
+            if block and block[0] < block[1]:
+                block[0] += 1
+                return format_appointment_number(day, block[0] - 1)
+
+        size = number_block_size()
+        last_value = self._lease(day, size)
+        first_value = last_value - size + 1
+        if size > 1:
+            transaction.on_commit(lambda: self._adopt(day, first_value + 1, last_value + 1))
+        return format_appointment_number(day, first_value)
+
+    def reset(self):
+        """Forget leased blocks, e.g. after the counter table was cleared"""
+        with self._lock:
+            self._blocks.clear()
+
+    def _adopt(self, day, start, end):
+        with self._lock:
+            # Earlier days are no longer handed out
+            self._blocks = {day: [start, end]}
+
+    @classmethod
+    def _lease(cls, day, size):
+        """Advance the day's counter by size; returns its new value"""
+        # RETURNING support also implies ON CONFLICT support on these backends
+        if connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_rows_from_bulk_insert:
+            return cls._upsert(day, size)
+
+        counters = AppointmentNumberCounter.objects.filter(date=day)
+        with transaction.atomic():
+            if not counters.update(last_value=F('last_value') + size):
+                try:
+                    with transaction.atomic():
+                        AppointmentNumberCounter.objects.create(date=day, last_value=size)
+                    return size
+                except IntegrityError:
+                    # Created by a concurrent lease since the update
+                    counters.update(last_value=F('last_value') + size)
+            # The update keeps the row locked, so this reads our own increment
+            return counters.values_list('last_value', flat=True).get()
+
+    @staticmethod
+    def _upsert(day, size):
+        """Create-or-increment of the counter row as one INSERT ... ON CONFLICT ... RETURNING"""
+        meta = AppointmentNumberCounter._meta
+        quote = connection.ops.quote_name
+        table = quote(meta.db_table)
+        date_column = quote(meta.get_field('date').column)
+        value_column = quote(meta.get_field('last_value').column)
+        sql = (
+            f"INSERT INTO {table} ({date_column}, {value_column}) VALUES (%s, %s) "
+            f"ON CONFLICT ({date_column}) DO UPDATE SET {value_column} = {table}.{value_column} + excluded.{value_column} "
+            f"RETURNING {value_column}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [meta.get_field('date').get_db_prep_value(day, connection), size])
+            return cursor.fetchone()[0]
+
+
+appointment_number_allocator = AppointmentNumberAllocator()
@@ -0,0 +1,274 @@
+"""
+Batch availability creation
+
+Validates many availability definitions together, checks them against the
+existing slots of every provider involved with one range query (and against
+each other in memory), then writes all Availability and AppointmentSlot rows
+in one transaction with bulk inserts.
+
+Slot candidates can be computed in a process pool: each worker receives the
+plain schedule fields of one provider's availabilities and returns plain
+(start, end) tuples, while all database writes stay in the calling process.
+"""
+import logging
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import transaction
+
+from ..availability_models import Availability, AppointmentSlot
+from ..availability_serializers import AvailabilityCreateSerializer
+from ..availability_utils import AvailabilityManager, SlotGenerator
+from ..availability_virtual import virtual_slots_enabled
+from ..models import Provider
+from ..utils.interval_index import DisjointIntervalSet, SlotIntervalIndex
+from .daily_availability_service import DailyAvailabilityService
+from .schedule_version_service import ScheduleVersionService
+from .search_cache_service import AvailabilitySearchCache
+from .search_index_service import SearchIndexService
+from .slot_horizon_service import SlotHorizonService, slot_horizon_days
+
+logger = logging.getLogger(__name__)
+
+BatchOutcome = namedtuple('BatchOutcome', ['results', 'stats'])
+
+# Availability fields a worker process needs to expand a schedule
+SCHEDULE_FIELDS = (
+    'date', 'start_time', 'end_time', 'timezone', 'slot_duration', 'break_duration',
+    'is_recurring', 'recurrence_pattern', 'recurrence_end_date', 'recurrence_interval',
+    'recurrence_weekdays', 'recurrence_count', 'recurrence_exceptions', 'appointment_type'
+)
+
+
+def _init_worker():
+    """Make Django usable in spawned worker processes"""
+    django.setup()
+
+
+def _candidate_slots_for_provider(tasks):
+    """Compute candidate slots for one provider's availabilities from plain data"""
+    return [
+        (index, SlotGenerator(Availability(**fields)).build_candidate_slots(window_start, window_end))
+        for index, fields, window_start, window_end in tasks
+    ]
+
+
+class AvailabilityBatchService:
+    # Maximum availability definitions accepted per request
+    max_items = 1000
+
+    @classmethod
+    def create(cls, items, all_or_nothing=False, workers=1):
+        """
+        Create the availabilities described by items.
+
+        Returns a BatchOutcome with one result per item, in order, and
+        throughput statistics. Invalid or conflicting items are reported and
+        skipped; with all_or_nothing, any failure skips the whole batch.
+        Slot candidates are computed in a pool of the given number of worker
+        processes when more than one is requested.
+        """
+        started = time.perf_counter()
+        timings = {}
+        results = [{'index': index, 'success': False} for index in range(len(items))]
+        providers = cls._load_providers(items)
+
+        # Validate every item before touching the database
+        prepared = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index].update(status='invalid', errors={'non_field_errors': ['Each item must be an availability object']})
+                continue
+
+            provider = providers.get(cls._parse_uuid(item.get('provider_id')))
+            if provider is None:
+                results[index].update(status='invalid', errors={'provider_id': ['Provider not found or inactive']})
+                continue
+
+            serializer = AvailabilityCreateSerializer(data=item, context={'provider': provider})
+            if not serializer.is_valid():
+                results[index].update(status='invalid', errors=serializer.errors)
+                continue
+
+            availability = serializer.build_instance(serializer.validated_data)
+            prepared.append((index, availability, AvailabilityManager.occurrence_windows(availability)))
+        timings['validate'] = time.perf_counter() - started
+
+        phase_started = time.perf_counter()
+        accepted = cls._sweep_conflicts(prepared, results)
+        timings['conflicts'] = time.perf_counter() - phase_started
+
+        if all_or_nothing and len(accepted) < len(items):
+            for index, _, _ in accepted:
+                results[index].update(status='skipped', errors={'non_field_errors': ['Batch rejected because other items failed']})
+            accepted = []
+
+        timings.update(cls._write(accepted, results, workers))
+        return BatchOutcome(results, cls._stats(results, timings, workers, time.perf_counter() - started))
+
+    @staticmethod
+    def _stats(results, timings, workers, elapsed):
+        created = [result for result in results if result['success']]
+        slots_created = sum(result['slots_created'] for result in created)
+        return {
+            'items': len(results),
+            'created': len(created),
+            'failed': len(results) - len(created),
+            'slots_created': slots_created,
+            'workers': workers,
+            'elapsed_seconds': round(elapsed, 3),
+            'slots_per_second': round(slots_created / elapsed) if elapsed > 0 else slots_created,
+            'timings': {phase: round(seconds, 3) for phase, seconds in timings.items()}
+        }
+
+    @staticmethod
+    def _parse_uuid(value):
+        try:
+            return uuid.UUID(str(value))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _load_providers(cls, items):
+        """Fetch every referenced active provider with one query"""
+        provider_ids = {
+            cls._parse_uuid(item.get('provider_id')) for item in items if isinstance(item, dict)
+        } - {None}
+        return Provider.objects.filter(id__in=provider_ids, is_active=True).in_bulk()
+
+    @staticmethod
+    def _sweep_conflicts(prepared, results):
+        """Reject items overlapping existing active slots or earlier items of the batch"""
+        windows = [window for _, _, item_windows in prepared for window in item_windows]
+        if not windows:
+            return []
+
+        provider_ids = {availability.provider_id for _, availability, _ in prepared}
+        indexes = SlotIntervalIndex.for_providers(
+            provider_ids,
+            min(start for _, start, _ in windows),
+            max(end for _, _, end in windows)
+        )
+        batch_windows = defaultdict(DisjointIntervalSet)
+
+        accepted = []
+        for index, availability, item_windows in prepared:
+            intervals = [(start, end) for _, start, end in item_windows]
+            report = AvailabilityManager.group_conflicts_by_date(
+                item_windows, indexes[availability.provider_id].find_conflicts(intervals)
+            )
+
+            # Earlier items of the batch count as existing availability
+            claimed = batch_windows[availability.provider_id]
+            for occurrence_date, start, end in item_windows:
+                other_index = claimed.find(start, end)
+                if other_index is not None:
+                    report.setdefault(occurrence_date.isoformat(), []).append({
+                        'batch_index': other_index,
+                        'conflicting_time': f"{start} - {end}",
+                        'status': 'batch'
+                    })
+
+            if report:
+                results[index].update(status='conflict', conflicts_by_date=report)
+                continue
+
+            for _, start, end in item_windows:
+                claimed.add(start, end, index)
+            accepted.append((index, availability, indexes[availability.provider_id]))
+        return accepted
+
+    @classmethod
+    def _write(cls, accepted, results, workers=1):
+        """Insert the accepted availabilities and their slots in one transaction; returns phase timings"""
+        if not accepted:
+            return {}
+
+        phase_started = time.perf_counter()
+        virtual = virtual_slots_enabled()
+        horizon_days = slot_horizon_days()
+        horizon_end = SlotHorizonService.horizon_end(horizon_days) if horizon_days else None
+
+        # Plain-data generation tasks, grouped per provider
+        tasks_by_provider = defaultdict(list)
+        for index, availability, _ in accepted:
+            window_start = window_end = None
+            if horizon_end:
+                window_start, window_end, availability.materialized_until = SlotHorizonService.plan_window(
+                    availability, horizon_end
+                )
+                if window_start > window_end:
+                    continue
+            fields = {field: getattr(availability, field) for field in SCHEDULE_FIELDS}
+            tasks_by_provider[availability.provider_id].append((index, fields, window_start, window_end))
+
+        candidates = cls._compute_candidates(list(tasks_by_provider.values()), workers)
+        timings = {'generate': time.perf_counter() - phase_started}
+
+        phase_started = time.perf_counter()
+        slots = []
+        slot_counts = {}
+        for index, availability, provider_index in accepted:
+            item_candidates = candidates.get(index, [])
+            if virtual:
+                # Slots are computed on read; report how many the rules produce
+                slot_counts[index] = len(item_candidates)
+                continue
+
+            # Start times held by cancelled or blocked rows are still taken
+            new_slots = [
+                AppointmentSlot(
+                    availability=availability,
+                    provider=availability.provider,
+                    slot_start_time=slot_start,
+                    slot_end_time=slot_end,
+                    appointment_type=availability.appointment_type,
+                    capacity=availability.max_appointments_per_slot,
+                    status='available'
+                )
+                for slot_start, slot_end in provider_index.filter_candidates(item_candidates)
+            ]
+            slot_counts[index] = len(new_slots)
+            slots.extend(new_slots)
+
+        with transaction.atomic():
+            Availability.objects.bulk_create(
+                [availability for _, availability, _ in accepted],
+                batch_size=SlotGenerator.bulk_create_batch_size
+            )
+            AppointmentSlot.objects.bulk_create(slots, batch_size=SlotGenerator.bulk_create_batch_size)
+            DailyAvailabilityService.record_created(slots)
+            SearchIndexService.index_slots(slots)
+            AvailabilitySearchCache.invalidate_slots(slots)
+            ScheduleVersionService.bump(availability.provider_id for _, availability, _ in accepted)
+            if virtual:
+                for _, availability, _ in accepted:
+                    AvailabilitySearchCache.invalidate_availability(availability)
+        timings['write'] = time.perf_counter() - phase_started
+
+        for index, availability, _ in accepted:
+            results[index].update(
+                success=True,
+                status='created',
+                availability_id=str(availability.id),
+                slots_created=slot_counts[index]
+            )
+        logger.info(f"Batch created {len(accepted)} availabilities with {len(slots)} slots")
+        return timings
+
+    @staticmethod
+    def _compute_candidates(provider_tasks, workers):
+        """Map item index to its candidate slots, fanning providers out to a process pool"""
+        if workers > 1 and len(provider_tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(provider_tasks)), initializer=_init_worker) as pool:
+                computed = pool.map(_candidate_slots_for_provider, provider_tasks)
+                return {index: slots for provider_slots in computed for index, slots in provider_slots}
+
+        return {
+            index: slots
+            for tasks in provider_tasks
+            for index, slots in _candidate_slots_for_provider(tasks)
+        }
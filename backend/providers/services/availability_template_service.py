@@ -0,0 +1,108 @@
+"""
+Apply availability templates to providers
+
+A template's ``schedule`` lists weekly time blocks, either as a list::
+
+    [{"weekdays": [0, 1, 2, 3, 4], "start_time": "09:00", "end_time": "12:00"}]
+
+or keyed by weekday name::
+
+    {"monday": [{"start_time": "09:00", "end_time": "12:00"}]}
+
+``default_settings`` holds the remaining availability fields (timezone,
+slot_duration, break_duration, appointment_type, location, pricing, ...);
+any other key on a block overrides them for that block. Blocks sharing the
+same times and settings become one weekly availability per provider, and
+the whole rollout goes through AvailabilityBatchService.
+"""
+import json
+import os
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+
+from .availability_batch_service import AvailabilityBatchService
+
+WEEKDAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+class AvailabilityTemplateService:
+    # Providers per rollout before slot generation is fanned out to processes
+    parallel_threshold = 20
+
+    @staticmethod
+    def parse_schedule(template):
+        """Normalize a template schedule to [(weekdays, block_settings)] grouped by identical settings"""
+        schedule = template.schedule
+        if isinstance(schedule, dict):
+            blocks = []
+            for day_name, day_blocks in schedule.items():
+                if day_name.lower() not in WEEKDAY_NAMES:
+                    raise ValidationError(f"Unknown weekday '{day_name}' in template schedule")
+                if not isinstance(day_blocks, list):
+                    raise ValidationError(f"Template blocks for '{day_name}' must be a list")
+                for block in day_blocks:
+                    if not isinstance(block, dict):
+                        raise ValidationError('Each template block requires start_time and end_time')
+                    blocks.append(dict(block, weekdays=[WEEKDAY_NAMES.index(day_name.lower())]))
+        elif isinstance(schedule, list):
+            blocks = schedule
+        else:
+            raise ValidationError('Template schedule must be a list of blocks or a mapping of weekdays')
+
+        grouped = {}
+        for block in blocks:
+            if not isinstance(block, dict) or 'start_time' not in block or 'end_time' not in block:
+                raise ValidationError('Each template block requires start_time and end_time')
+
+            weekdays = block.get('weekdays')
+            if weekdays is None and 'weekday' in block:
+                weekdays = [block['weekday']]
+            if not isinstance(weekdays, list) or not weekdays or any(
+                isinstance(day, bool) or day not in range(7) for day in weekdays
+            ):
+                raise ValidationError('Template block weekdays must be between 0 (Monday) and 6 (Sunday)')
+
+            settings = {key: value for key, value in block.items() if key not in ('weekday', 'weekdays')}
+            key = json.dumps(settings, sort_keys=True, default=str)
+            grouped.setdefault(key, (set(), settings))[0].update(weekdays)
+
+        return [(sorted(weekdays), settings) for weekdays, settings in grouped.values()]
+
+    @classmethod
+    def build_items(cls, template, provider_ids, start_date, end_date):
+        """Batch availability definitions applying the template to each provider over the date range"""
+        if end_date < start_date:
+            raise ValidationError('end_date must not be before start_date')
+
+        items = []
+        for weekdays, block_settings in cls.parse_schedule(template):
+            first_date = next(
+                (start_date + timedelta(days=offset) for offset in range(7)
+                 if (start_date + timedelta(days=offset)).weekday() in weekdays),
+                None
+            )
+            if first_date is None or first_date > end_date:
+                continue
+
+            definition = dict(template.default_settings or {}, **block_settings)
+            definition['date'] = first_date.isoformat()
+            if first_date < end_date:
+                definition.update(
+                    is_recurring=True,
+                    recurrence_pattern='weekly',
+                    recurrence_weekdays=weekdays,
+                    recurrence_end_date=end_date.isoformat()
+                )
+            items.extend(dict(definition, provider_id=str(provider_id)) for provider_id in provider_ids)
+        return items
+
+    @classmethod
+    def apply(cls, template, provider_ids, start_date, end_date, workers=None, all_or_nothing=False):
+        """Apply the template; returns the batch outcome with per-item results and throughput stats"""
+        provider_ids = list(provider_ids)
+        if workers is None:
+            workers = (os.cpu_count() or 1) if len(provider_ids) >= cls.parallel_threshold else 1
+
+        items = cls.build_items(template, provider_ids, start_date, end_date)
+        return AvailabilityBatchService.create(items, all_or_nothing=all_or_nothing, workers=workers)
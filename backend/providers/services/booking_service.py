@@ -0,0 +1,203 @@
+"""
+Contention-safe appointment booking
+
+BookingService.book() takes a place in the slot with one conditional
+UPDATE that increments its booked_count only while it is below the slot's
+capacity, and marks the slot booked in the same statement when that fills
+it. Of concurrent bookings of a slot's last place exactly one updates a row
+and the others get SlotUnavailable, without holding a lock across request
+validation. It reuses the patient, provider and slot loaded during
+validation and inserts the appointment and its history row directly;
+unique appointment numbers, patients per slot and provider times are left
+to the database constraints.
+"""
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from ..appointment_models import Appointment, AppointmentHistory, SlotHold
+from ..availability_models import AppointmentSlot
+from .slot_status_service import SlotStatusService
+
+logger = logging.getLogger(__name__)
+
+# Appointment fields validated by the database instead of per-field queries
+DATABASE_CHECKED_FIELDS = ['patient', 'provider', 'appointment_slot']
+
+# Appointment statuses that keep a place in a slot or a provider's time
+ACTIVE_APPOINTMENT_STATUSES = ['scheduled', 'confirmed', 'in_progress']
+
+
+class SlotUnavailable(ValidationError):
+    """The slot or time was booked by someone else first"""
+
+
+class BookingService:
+    @classmethod
+    def book(cls, patient, provider, slot=None, hold=None, performed_by='system', **details):
+        """
+        Book an appointment for a patient, on a slot if given; returns the appointment.
+
+        slot is a row loaded with its availability, or an unsaved virtual slot;
+        hold is the patient's SlotHold on it when confirming a hold. Raises
+        SlotUnavailable if the slot or time is already taken or the hold
+        expired, and ValidationError for invalid appointment details.
+        """
+        if slot is not None:
+            if slot.provider_id != provider.id:
+                raise ValidationError('Appointment slot provider must match appointment provider')
+            if slot.status != ('held' if hold else 'available'):
+                raise SlotUnavailable('Selected appointment slot is not available')
+            slot.provider = provider
+
+        appointment = Appointment(patient=patient, provider=provider, **details)
+        # Without the slot, whose status clean() expects to be available; it was checked above
+        appointment.full_clean(
+            exclude=DATABASE_CHECKED_FIELDS + ['appointment_number'], validate_unique=False, validate_constraints=False
+        )
+        appointment.appointment_slot = slot
+
+        try:
+            with transaction.atomic():
+                if hold is not None:
+                    cls._claim_held(slot, hold)
+                elif slot is not None:
+                    cls.claim(slot, patient)
+                cls._check_time_free(appointment)
+                # Allocated last, as a new block lease holds the day's counter row until commit
+                appointment.appointment_number = appointment.generate_appointment_number()
+                # Bypasses Appointment.save(), whose validation queries and slot.save() the claim replaces
+                Appointment.objects.bulk_create([appointment])
+                AppointmentHistory.objects.create(
+                    appointment=appointment,
+                    action='created',
+                    description=f'Appointment created for {patient.first_name} {patient.last_name}',
+                    performed_by=performed_by,
+                    new_values={
+                        'appointment_mode': appointment.appointment_mode,
+                        'appointment_type': appointment.appointment_type,
+                        'appointment_date': str(appointment.appointment_date),
+                        'appointment_time': str(appointment.appointment_time),
+                        'reason_for_visit': appointment.reason_for_visit,
+                    }
+                )
+        except IntegrityError as e:
+            logger.info(f"Booking for provider {provider.id} lost to a concurrent booking: {e}")
+            raise SlotUnavailable('The provider already has an appointment at this time')
+
+        return appointment
+
+    @staticmethod
+    def release(slot_id):
+        """Give back the place of a cancelled appointment in its slot"""
+        with transaction.atomic():
+            slot = AppointmentSlot.objects.select_for_update().select_related('availability').filter(
+                id=slot_id, booked_count__gt=0
+            ).first()
+            if slot is None:
+                return
+            AppointmentSlot.objects.filter(id=slot.id).update(
+                booked_count=F('booked_count') - 1,
+                status=Case(When(status='booked', then=Value('available')), default=F('status')),
+                patient_id=None,
+                updated_at=timezone.now()
+            )
+            old_status = slot.status
+            slot.booked_count -= 1
+            slot.patient_id = None
+            if old_status == 'booked':
+                slot.status = 'available'
+                SlotStatusService.record_updates([slot], old_status)
+            else:
+                SlotStatusService.record_capacity_changes([slot])
+
+    @staticmethod
+    def claim(slot, patient):
+        """Take a place in the slot for the patient; raises SlotUnavailable if none is left"""
+        booking_reference = slot.booking_reference or AppointmentSlot.new_booking_reference()
+        # Only a single-place slot belongs to one patient
+        patient_id = patient.id if slot.capacity == 1 else None
+
+        if getattr(slot, 'is_virtual', False):
+            # A computed slot has no row yet, so inserting it with its first booking is the claim
+            slot.booked_count = 1
+            slot.status = 'booked' if slot.capacity == 1 else 'available'
+            slot.patient_id = patient_id
+            slot.booking_reference = booking_reference
+            slot.save(force_insert=True)
+            slot.is_virtual = False
+            return
+
+        claimed = AppointmentSlot.objects.filter(
+            id=slot.id, status='available', booked_count__lt=F('capacity')
+        ).update(
+            booked_count=F('booked_count') + 1,
+            # Compares the count before this increment, so it fills on the last place
+            status=Case(When(booked_count__gte=F('capacity') - 1, then=Value('booked')), default=F('status')),
+            patient_id=patient_id,
+            booking_reference=booking_reference,
+            updated_at=timezone.now()
+        )
+        if not claimed:
+            raise SlotUnavailable('Selected appointment slot is no longer available')
+
+        slot.patient_id = patient_id
+        slot.booking_reference = booking_reference
+        if slot.capacity == 1:
+            slot.status, slot.booked_count = 'booked', 1
+        else:
+            # Concurrent bookings may have taken places since the slot was loaded
+            slot.status, slot.booked_count = AppointmentSlot.objects.filter(id=slot.id).values_list(
+                'status', 'booked_count'
+            ).get()
+        if slot.status == 'available':
+            SlotStatusService.record_capacity_changes([slot])
+        else:
+            SlotStatusService.record_updates([slot], 'available')
+
+    @staticmethod
+    def _check_time_free(appointment):
+        """
+        Fail if an appointment outside the booked slot holds the provider's time.
+
+        The database constraint only covers appointments without a slot, and
+        places within a slot are limited by its capacity.
+        """
+        others = Appointment.objects.filter(
+            provider_id=appointment.provider_id,
+            appointment_date=appointment.appointment_date,
+            appointment_time=appointment.appointment_time,
+            status__in=ACTIVE_APPOINTMENT_STATUSES
+        )
+        if appointment.appointment_slot_id:
+            others = others.exclude(appointment_slot_id=appointment.appointment_slot_id)
+        else:
+            others = others.filter(appointment_slot__isnull=False)
+        if others.exists():
+            raise SlotUnavailable('The provider already has an appointment at this time')
+
+    @staticmethod
+    def _claim_held(slot, hold):
+        """Book a slot under an unexpired hold and remove the hold"""
+        booking_reference = slot.booking_reference or AppointmentSlot.new_booking_reference()
+
+        # The hold conditions make an expired hold, even one not yet swept, fail the claim
+        claimed = AppointmentSlot.objects.filter(
+            id=slot.id, status='held', hold__id=hold.id, hold__expires_at__gt=timezone.now()
+        ).update(
+            status='booked',
+            booked_count=F('booked_count') + 1,
+            booking_reference=booking_reference,
+            updated_at=timezone.now()
+        )
+        if not claimed:
+            raise SlotUnavailable('Slot hold has expired')
+
+        SlotHold.objects.filter(id=hold.id).delete()
+        slot.status = 'booked'
+        slot.booked_count += 1
+        slot.booking_reference = booking_reference
+        SlotStatusService.record_updates([slot], 'held')
@@ -0,0 +1,210 @@
+"""
+Per-provider daily availability rollup
+
+ProviderDailyAvailability holds slot counts per status for each provider
+and local date. Every slot insert, delete and status change applies its
+deltas in the same transaction as the write, as one additive upsert
+(INSERT ... ON CONFLICT DO UPDATE), so concurrent writers never lose
+increments and bulk inserts cost one statement per batch. Statistics and
+calendar views then read one row per day instead of counting slots.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import pytz
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..availability_models import AppointmentSlot, Availability, ProviderDailyAvailability
+from ..utils.timezone_utils import TimezoneConverter
+
+logger = logging.getLogger(__name__)
+
+# Rollup column of each slot status
+STATUS_COLUMNS = {
+    'available': 'available_slots',
+    'booked': 'booked_slots',
+    'cancelled': 'cancelled_slots',
+    'blocked': 'blocked_slots',
+}
+
+
+class DailyAvailabilityService:
+    # Rollup rows written per upsert statement
+    upsert_batch_size = 100
+
+    @staticmethod
+    def local_date(slot_start_time, timezone_name):
+        """Date of a UTC slot start in the availability's timezone"""
+        return TimezoneConverter.from_utc(slot_start_time, timezone_name).date()
+
+    @classmethod
+    def record_created(cls, slots):
+        """Count newly inserted slots"""
+        cls.apply(cls._deltas(slots, 1))
+
+    @classmethod
+    def record_deleted(cls, slots):
+        """Uncount deleted slots"""
+        cls.apply(cls._deltas(slots, -1))
+
+    @classmethod
+    def record_transition(cls, slot, old_status, new_status):
+        """Move one slot from old_status to new_status"""
+        if old_status == new_status:
+            return
+        day = cls.local_date(slot.slot_start_time, cls._timezone(slot))
+        changes = Counter({new_status: 1})
+        changes[old_status] -= 1
+        cls.apply({(slot.provider_id, day): changes})
+
+    @classmethod
+    def record_transitions(cls, slots, old_status):
+        """Move slots whose status was changed with a queryset update() from old_status"""
+        timezones = {}
+        deltas = defaultdict(Counter)
+        for slot in slots:
+            if slot.status == old_status:
+                continue
+            if slot.availability_id not in timezones:
+                timezones[slot.availability_id] = cls._timezone(slot)
+            day = cls.local_date(slot.slot_start_time, timezones[slot.availability_id])
+            deltas[(slot.provider_id, day)][slot.status] += 1
+            deltas[(slot.provider_id, day)][old_status] -= 1
+        cls.apply(deltas)
+
+    @classmethod
+    def apply(cls, deltas):
+        """Add {(provider_id, date): {status: change}} to the rollup rows"""
+        rows = []
+        for (provider_id, day), changes in deltas.items():
+            columns = {column: changes.get(status, 0) for status, column in STATUS_COLUMNS.items()}
+            if any(columns.values()):
+                rows.append((provider_id, day, columns))
+        if not rows:
+            return
+
+        with transaction.atomic():
+            if connection.vendor in ('sqlite', 'postgresql'):
+                for start in range(0, len(rows), cls.upsert_batch_size):
+                    cls._upsert(rows[start:start + cls.upsert_batch_size])
+                return
+
+            for provider_id, day, columns in rows:
+                ProviderDailyAvailability.objects.get_or_create(provider_id=provider_id, date=day)
+                ProviderDailyAvailability.objects.filter(provider_id=provider_id, date=day).update(
+                    **{column: F(column) + change for column, change in columns.items() if change}
+                )
+
+    @staticmethod
+    def summary(provider, start_date, end_date):
+        """Slot counts per status over a local date range"""
+        totals = ProviderDailyAvailability.objects.filter(
+            provider=provider, date__gte=start_date, date__lte=end_date
+        ).aggregate(**{column: Sum(column) for column in STATUS_COLUMNS.values()})
+        totals = {column: value or 0 for column, value in totals.items()}
+        totals['total_slots'] = sum(totals.values())
+        return totals
+
+    @staticmethod
+    def has_availability(provider, day):
+        """Whether the provider has an open slot on the local date"""
+        return ProviderDailyAvailability.objects.filter(
+            provider=provider, date=day, available_slots__gt=0
+        ).exists()
+
+    @classmethod
+    def rebuild(cls, provider_ids=None, start_date=None, end_date=None, chunk_size=2000):
+        """Recount the rollup from the slot table, optionally for some providers or a local date range"""
+        slots = AppointmentSlot.objects.all()
+        rollups = ProviderDailyAvailability.objects.all()
+        if provider_ids:
+            slots = slots.filter(provider_id__in=provider_ids)
+            rollups = rollups.filter(provider_id__in=provider_ids)
+        # Local dates lie within a day of the UTC date
+        if start_date:
+            slots = slots.filter(slot_start_time__gte=cls._utc_midnight(start_date - timedelta(days=1)))
+            rollups = rollups.filter(date__gte=start_date)
+        if end_date:
+            slots = slots.filter(slot_start_time__lt=cls._utc_midnight(end_date + timedelta(days=2)))
+            rollups = rollups.filter(date__lte=end_date)
+
+        counts = defaultdict(Counter)
+        rows = slots.values_list('provider_id', 'slot_start_time', 'status', 'availability__timezone')
+        for provider_id, slot_start_time, status, timezone_name in rows.iterator(chunk_size=chunk_size):
+            day = cls.local_date(slot_start_time, timezone_name)
+            if (start_date and day < start_date) or (end_date and day > end_date):
+                continue
+            counts[(provider_id, day)][status] += 1
+
+        with transaction.atomic():
+            rollups.delete()
+            ProviderDailyAvailability.objects.bulk_create(
+                [
+                    ProviderDailyAvailability(
+                        provider_id=provider_id,
+                        date=day,
+                        **{column: statuses.get(status, 0) for status, column in STATUS_COLUMNS.items()}
+                    )
+                    for (provider_id, day), statuses in counts.items()
+                ],
+                batch_size=cls.upsert_batch_size
+            )
+        logger.info(f"Rebuilt {len(counts)} provider daily availability rows")
+        return len(counts)
+
+    @classmethod
+    def _deltas(cls, slots, sign):
+        timezones = {}
+        deltas = defaultdict(Counter)
+        for slot in slots:
+            if slot.availability_id not in timezones:
+                timezones[slot.availability_id] = cls._timezone(slot)
+            day = cls.local_date(slot.slot_start_time, timezones[slot.availability_id])
+            deltas[(slot.provider_id, day)][getattr(slot, '_loaded_status', slot.status)] += sign
+        return deltas
+
+    @staticmethod
+    def _utc_midnight(day):
+        return pytz.UTC.localize(datetime.combine(day, datetime.min.time()))
+
+    @staticmethod
+    def _timezone(slot):
+        if AppointmentSlot.availability.is_cached(slot):
+            return slot.availability.timezone
+        return Availability.objects.filter(id=slot.availability_id).values_list('timezone', flat=True).first() or 'UTC'
+
+    @staticmethod
+    def _upsert(rows):
+        """Additive INSERT ... ON CONFLICT DO UPDATE of rollup rows"""
+        meta = ProviderDailyAvailability._meta
+        quote = connection.ops.quote_name
+        provider_field = meta.get_field('provider')
+        date_field = meta.get_field('date')
+        updated_at_field = meta.get_field('updated_at')
+        counters = list(STATUS_COLUMNS.values())
+        columns = [provider_field.column, date_field.column] + counters + [updated_at_field.column]
+
+        now = updated_at_field.get_db_prep_value(timezone.now(), connection)
+        params = []
+        for provider_id, day, changes in rows:
+            params.append(provider_field.get_db_prep_value(provider_id, connection))
+            params.append(date_field.get_db_prep_value(day, connection))
+            params.extend(changes[column] for column in counters)
+            params.append(now)
+
+        table = quote(meta.db_table)
+        placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        updates = [f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}' for column in counters]
+        updates.append(f'{quote(updated_at_field.column)} = excluded.{quote(updated_at_field.column)}')
+        sql = (
+            f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+            f"VALUES {', '.join([placeholders] * len(rows))} "
+            f"ON CONFLICT ({quote(provider_field.column)}, {quote(date_field.column)}) "
+            f"DO UPDATE SET {', '.join(updates)}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
@@ -0,0 +1,157 @@
+"""
+Prefix search index for the provider and patient dropdowns
+
+Every provider and patient is broken into normalized tokens (name parts,
+email and its parts, phone digits, specialization words) stored with a
+field weight in ProviderSearchToken / PatientSearchToken. A query word
+matches a token it is a prefix of, looked up as a range on the indexed
+token column, which works the same on SQLite and Postgres. An entity
+matches when every query word matches one of its tokens, and is ranked by
+the weights of the matched tokens, doubled for exact matches.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+
+from ..models import Provider, ProviderSearchToken
+from ..patient_models import Patient, PatientSearchToken
+
+MAX_TOKEN_LENGTH = 64
+
+# (field, weight) pairs indexed per model; name fields rank highest
+PROVIDER_FIELDS = (
+    ('first_name', 3), ('last_name', 3), ('email', 2), ('phone_number', 2), ('specialization', 1)
+)
+PATIENT_FIELDS = (
+    ('first_name', 3), ('last_name', 3), ('preferred_name', 2), ('middle_name', 2),
+    ('email', 2), ('phone_number', 2)
+)
+
+
+def dropdown_search_index_enabled():
+    """Whether dropdown search reads, and saves maintain, the token index"""
+    return getattr(settings, 'DROPDOWN_SEARCH_INDEX', True)
+
+
+def field_tokens(field, value):
+    """Normalized tokens of one field value"""
+    value = str(value or '').lower().strip()
+    if not value:
+        return []
+    if field == 'phone_number':
+        digits = re.sub(r'\D', '', value)
+        # Also index the national number so it matches without a country code
+        return [digits, digits[-10:]] if len(digits) > 10 else [digits]
+    tokens = re.findall(r'[a-z0-9]+', value)
+    if field == 'email':
+        tokens.insert(0, value)
+    return tokens
+
+
+def query_terms(search):
+    """Normalized prefix terms of a search string"""
+    terms = []
+    for word in search.lower().split():
+        if '@' in word:
+            terms.append(word)
+        elif re.fullmatch(r'[+\d()\-.]+', word) and re.search(r'\d', word):
+            terms.append(re.sub(r'\D', '', word))
+        else:
+            terms.extend(re.findall(r'[a-z0-9]+', word))
+    return [term[:MAX_TOKEN_LENGTH] for term in dict.fromkeys(terms)]
+
+
+class DropdownSearchIndex:
+    """Token index maintenance and ranked prefix queries for a model"""
+
+    def __init__(self, model, token_model, fields):
+        self.model = model
+        self.token_model = token_model
+        self.fields = fields
+
+    def tokens_for(self, instance):
+        """Unsaved token rows for an instance, keeping the highest weight per token"""
+        weights = {}
+        for field, weight in self.fields:
+            for token in field_tokens(field, getattr(instance, field, None)):
+                token = token[:MAX_TOKEN_LENGTH]
+                weights[token] = max(weights.get(token, 0), weight)
+        return [self.token_model(owner=instance, token=token, weight=weight) for token, weight in weights.items()]
+
+    def index(self, instance):
+        """Replace the tokens of one instance"""
+        if not dropdown_search_index_enabled():
+            return
+        with transaction.atomic():
+            self.token_model.objects.filter(owner=instance).delete()
+            self.token_model.objects.bulk_create(self.tokens_for(instance))
+
+    def rebuild(self, batch_size=1000):
+        """Recreate every token from the model table; returns the number of instances indexed"""
+        indexed = 0
+        with transaction.atomic():
+            self.token_model.objects.all().delete()
+            tokens = []
+            for instance in self.model.objects.order_by('pk').iterator(chunk_size=batch_size):
+                tokens.extend(self.tokens_for(instance))
+                indexed += 1
+                if len(tokens) >= batch_size:
+                    self.token_model.objects.bulk_create(tokens, batch_size=batch_size)
+                    tokens = []
+            self.token_model.objects.bulk_create(tokens, batch_size=batch_size)
+        return indexed
+
+    def matches(self, search, within=None):
+        """
+        Rows of {'owner_id', 'score'} for instances matching every term of search.
+
+        within restricts the candidates to a queryset of the model; returns
+        None when search has no usable terms.
+        """
+        terms = query_terms(search)
+        if not terms:
+            return None
+
+        prefixes = [self._prefix(term) for term in terms]
+        tokens = self.token_model.objects.filter(
+            Q(*prefixes, _connector=Q.OR) if len(prefixes) > 1 else prefixes[0]
+        )
+        if within is not None:
+            tokens = tokens.filter(owner__in=within.values('pk'))
+
+        # One flag per term so that every term has to match some token
+        flags = {
+            f'term_{position}': Max(Case(When(prefix, then=Value(1)), default=Value(0), output_field=IntegerField()))
+            for position, prefix in enumerate(prefixes)
+        }
+        score = Sum(Case(
+            When(token__in=terms, then=2 * F('weight')),
+            default=F('weight'),
+            output_field=IntegerField()
+        ))
+        return (
+            tokens.values('owner_id')
+            .annotate(score=score, **flags)
+            .filter(**{name: 1 for name in flags})
+            .values('owner_id', 'score')
+        )
+
+    def ranked(self, search, within=None, limit=10):
+        """Matching instances, best score first, then by name"""
+        rows = self.matches(search, within)
+        if rows is None:
+            return []
+        rows = list(rows.order_by('-score', 'owner__first_name', 'owner__last_name', 'owner_id')[:limit])
+        instances = self.model.objects.in_bulk([row['owner_id'] for row in rows])
+        return [instances[row['owner_id']] for row in rows if row['owner_id'] in instances]
+
+    @staticmethod
+    def _prefix(term):
+        # A range rather than LIKE so that a plain btree index on token serves it
+        return Q(token__gte=term, token__lt=term[:-1] + chr(ord(term[-1]) + 1))
+
+
+provider_search_index = DropdownSearchIndex(Provider, ProviderSearchToken, PROVIDER_FIELDS)
+patient_search_index = DropdownSearchIndex(Patient, PatientSearchToken, PATIENT_FIELDS)
@@ -0,0 +1,136 @@
+"""
+Idempotency keys for appointment writes
+
+The first request with a key inserts a pending IdempotencyKey row, runs
+and stores its response on the row; a retry with the same key finds the
+row with its primary key lookup and gets the stored response back without
+running the view again. Rows live for APPOINTMENT_IDEMPOTENCY_KEY_HOURS and
+are deleted in batches by the purge_idempotency_keys command; a key found
+expired before the purge is simply claimed again.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..appointment_models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+# Seconds a pending key blocks retries; after that the request that claimed
+# it is assumed lost and a retry may run again
+PENDING_SECONDS = 60
+
+
+class IdempotencyKeyInUse(ValidationError):
+    """The first request with the key is still running"""
+
+
+class IdempotencyKeyReused(ValidationError):
+    """The key was already used for a request with a different body"""
+
+
+def key_ttl():
+    return timedelta(hours=getattr(settings, 'APPOINTMENT_IDEMPOTENCY_KEY_HOURS', 24))
+
+
+class IdempotencyService:
+    # Expired keys deleted per statement by purge()
+    batch_size = 1000
+
+    @staticmethod
+    def key_hash(method, path, key):
+        return hashlib.sha256(f'{method} {path}\n{key}'.encode()).hexdigest()
+
+    @staticmethod
+    def request_hash(data):
+        body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    @classmethod
+    def begin(cls, key_hash, request_hash):
+        """
+        Claim a key for a request; returns the completed IdempotencyKey to
+        replay, or None if the caller should run the request.
+
+        Raises IdempotencyKeyInUse while another request holds the key and
+        IdempotencyKeyReused if the key was used for a different body.
+        """
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    key_hash=key_hash, request_hash=request_hash, expires_at=now + timedelta(seconds=PENDING_SECONDS)
+                )
+            return None
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+        if record is None or record.expires_at <= now:
+            # Deleted or expired since the insert; take it over unless another retry did first
+            return cls._reclaim(key_hash, request_hash, record, now)
+        if record.request_hash != request_hash:
+            raise IdempotencyKeyReused('Idempotency-Key was already used for a different request')
+        if not record.is_completed:
+            raise IdempotencyKeyInUse('A request with this Idempotency-Key is still being processed')
+        return record
+
+    @staticmethod
+    def complete(key_hash, status_code, body):
+        """Store the response of a claimed key; server errors release the key so a retry runs again"""
+        keys = IdempotencyKey.objects.filter(key_hash=key_hash)
+        if status_code >= 500:
+            keys.delete()
+            return
+        keys.update(status_code=status_code, response_body=body, expires_at=timezone.now() + key_ttl())
+
+    @staticmethod
+    def release(key_hash):
+        """Give up a claimed key without a response, e.g. when the request raised"""
+        IdempotencyKey.objects.filter(key_hash=key_hash, status_code__isnull=True).delete()
+
+    @classmethod
+    def purge(cls, now=None, batch_size=None):
+        """Delete expired keys; returns the number deleted"""
+        now = now or timezone.now()
+        batch_size = batch_size or cls.batch_size
+        purged = 0
+        while True:
+            key_hashes = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now).values_list('key_hash', flat=True)[:batch_size]
+            )
+            if not key_hashes:
+                break
+            purged += IdempotencyKey.objects.filter(key_hash__in=key_hashes, expires_at__lte=now).delete()[0]
+        if purged:
+            logger.info(f"Purged {purged} expired idempotency keys")
+        return purged
+
+    @staticmethod
+    def _reclaim(key_hash, request_hash, record, now):
+        pending = {
+            'request_hash': request_hash,
+            'status_code': None,
+            'response_body': None,
+            'expires_at': now + timedelta(seconds=PENDING_SECONDS),
+        }
+        if record is None:
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(key_hash=key_hash, **pending)
+                return None
+            except IntegrityError:
+                raise IdempotencyKeyInUse('A request with this Idempotency-Key is still being processed')
+        # Conditional on the expiry read, so of two retries only one takes the key over
+        if IdempotencyKey.objects.filter(key_hash=key_hash, expires_at=record.expires_at).update(**pending):
+            return None
+        raise IdempotencyKeyInUse('A request with this Idempotency-Key is still being processed')
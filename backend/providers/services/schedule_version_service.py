@@ -0,0 +1,45 @@
+"""
+Per-provider schedule versions for conditional GETs
+
+ProviderScheduleVersion.version is bumped in the same transaction as every
+slot or availability write of the provider: signals for single saves and
+deletes, explicit calls after bulk inserts. Listing endpoints send it as
+their ETag and answer a matching If-None-Match with 304 Not Modified after
+a primary-key lookup, without running their slot queries.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..availability_models import ProviderScheduleVersion
+
+
+class ScheduleVersionService:
+    @staticmethod
+    def current(provider_id):
+        """Current schedule version of a provider; 0 before its first write"""
+        return ProviderScheduleVersion.objects.filter(provider_id=provider_id).values_list(
+            'version', flat=True
+        ).first() or 0
+
+    @classmethod
+    def bump(cls, provider_ids):
+        """Advance the schedule version of each provider"""
+        # A fixed order keeps concurrent multi-provider writers from deadlocking
+        for provider_id in sorted(set(provider_ids), key=str):
+            cls._bump(provider_id)
+
+    @staticmethod
+    def etag(provider_id, version):
+        return f'"{provider_id}-{version}"'
+
+    @staticmethod
+    def _bump(provider_id):
+        versions = ProviderScheduleVersion.objects.filter(provider_id=provider_id)
+        if versions.update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                ProviderScheduleVersion.objects.create(provider_id=provider_id, version=1)
+        except IntegrityError:
+            # Created by a concurrent writer since the update
+            versions.update(version=F('version') + 1)
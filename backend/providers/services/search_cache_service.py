@@ -0,0 +1,176 @@
+"""
+Read-through cache for public availability search
+
+Results are cached under a digest of the normalized search criteria plus
+the current generation token of every UTC date the search covers and a
+global generation. Slot and availability writes replace the tokens of the
+dates they touch, provider changes replace the global token, so exactly the
+cached searches that could see the change stop matching. Tokens are
+replaced at write time and again once the surrounding transaction commits.
+The cache alias has to be shared by all worker processes, so a process-local
+LocMemCache leaves the cache disabled.
+"""
+import hashlib
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .search_index_service import normalize_text, tokenize
+
+KEY_PREFIX = 'availability_search'
+
+# Writes spanning more days than this replace the global token instead
+MAX_INVALIDATED_DAYS = 62
+
+# Query parameters that select search results, with their normalizers
+CRITERIA = {
+    'specialization': normalize_text,
+    'location': lambda value: ' '.join(tokenize(value)),
+    'location_type': normalize_text,
+    'appointment_type': normalize_text,
+    'insurance_accepted': lambda value: value.lower() == 'true',
+    'max_price': lambda value: str(float(value)),
+    'available_only': lambda value: value.lower() == 'true',
+}
+
+
+def search_cache_timeout():
+    """Seconds a search result stays cached; 0 disables the cache"""
+    return getattr(settings, 'AVAILABILITY_SEARCH_CACHE_TIMEOUT', 300)
+
+
+class AvailabilitySearchCache:
+    @staticmethod
+    def cache():
+        return caches[getattr(settings, 'AVAILABILITY_SEARCH_CACHE_ALIAS', 'default')]
+
+    @classmethod
+    def enabled(cls):
+        # A per-process cache would keep serving results that writes in other workers expired
+        return bool(search_cache_timeout()) and not isinstance(cls.cache(), LocMemCache)
+
+    @staticmethod
+    def criteria(query_params, date_range, mode):
+        """Normalized criteria identifying a search"""
+        criteria = {'from': date_range[0].isoformat(), 'to': date_range[1].isoformat(), 'mode': mode}
+        for name, normalize in CRITERIA.items():
+            value = query_params.get(name)
+            if value:
+                criteria[name] = normalize(value)
+        criteria.setdefault('available_only', True)
+        return criteria
+
+    @staticmethod
+    def cacheable(date_range):
+        """Whether a search over the range is cached; wider ranges would write a generation key per day"""
+        return (date_range[1] - date_range[0]).days + 1 <= MAX_INVALIDATED_DAYS
+
+    @classmethod
+    def key(cls, criteria, date_range):
+        """Cache key of the criteria under the current generations of the range"""
+        generation_keys = [cls._generation_key(None)] + [
+            cls._generation_key(date_range[0] + timedelta(days=offset))
+            for offset in range((date_range[1] - date_range[0]).days + 1)
+        ]
+        cache = cls.cache()
+        generations = cache.get_many(generation_keys)
+        for key in generation_keys:
+            if key not in generations:
+                # A fresh token for evicted keys, so older results never become reachable again
+                token = uuid.uuid4().hex
+                generations[key] = token if cache.add(key, token, None) else cache.get(key, token)
+        digest = hashlib.sha1(json.dumps(
+            [criteria, [generations[key] for key in generation_keys]], sort_keys=True
+        ).encode()).hexdigest()
+        return f'{KEY_PREFIX}:result:{digest}'
+
+    @classmethod
+    def get(cls, key):
+        """Cached result or None, counting the hit or miss"""
+        result = cls.cache().get(key)
+        cls._count('hits' if result is not None else 'misses')
+        return result
+
+    @classmethod
+    def set(cls, key, result):
+        cls.cache().set(key, result, search_cache_timeout())
+
+    @classmethod
+    def stats(cls):
+        """Hit and miss counters since the cache was last cleared"""
+        counters = cls.cache().get_many([f'{KEY_PREFIX}:hits', f'{KEY_PREFIX}:misses'])
+        hits = counters.get(f'{KEY_PREFIX}:hits', 0)
+        misses = counters.get(f'{KEY_PREFIX}:misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None
+        }
+
+    @classmethod
+    def invalidate_dates(cls, dates):
+        """Expire cached searches covering any of the UTC dates"""
+        dates = set(dates)
+        if not dates:
+            return
+        if len(dates) > MAX_INVALIDATED_DAYS:
+            cls.invalidate_all()
+            return
+        cls._replace_generations([cls._generation_key(day) for day in dates])
+
+    @classmethod
+    def invalidate_slots(cls, slots):
+        """Expire cached searches that could include any of the slots"""
+        cls.invalidate_dates(slot.slot_start_time.date() for slot in slots)
+
+    @classmethod
+    def invalidate_availability(cls, availability):
+        """Expire cached searches over the dates an availability's rules cover"""
+        if availability.is_recurring and not availability.recurrence_end_date:
+            cls.invalidate_all()
+            return
+        last_date = availability.recurrence_end_date if availability.is_recurring else availability.date
+        span = (last_date - availability.date).days + 1
+        if span > MAX_INVALIDATED_DAYS:
+            cls.invalidate_all()
+            return
+        # Local dates can fall on the neighbouring UTC dates
+        first_date = availability.date - timedelta(days=1)
+        cls.invalidate_dates(first_date + timedelta(days=offset) for offset in range(span + 2))
+
+    @classmethod
+    def invalidate_all(cls):
+        """Expire every cached search"""
+        cls._replace_generations([cls._generation_key(None)])
+
+    @classmethod
+    def _replace_generations(cls, keys):
+        if not cls.enabled():
+            return
+
+        def replace():
+            cls.cache().set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+        # Now for the writing request, and again after commit so that a
+        # concurrent search cannot keep pre-commit rows under the new token
+        replace()
+        transaction.on_commit(replace)
+
+    @staticmethod
+    def _generation_key(day):
+        return f'{KEY_PREFIX}:generation:{day.isoformat() if day else "global"}'
+
+    @classmethod
+    def _count(cls, counter):
+        key = f'{KEY_PREFIX}:{counter}'
+        cache = cls.cache()
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
@@ -0,0 +1,169 @@
+"""
+Availability search index maintenance
+
+Public search reads AvailabilitySearchEntry, one row per slot with the
+provider, availability and pricing attributes it filters on copied into
+typed columns, instead of joining slots, availabilities and providers and
+filtering on JSON fields. Status, start time, specialization, location type
+and fee are indexed; the address tokens are matched with a substring scan
+over the rows those columns narrow down. Entries are written alongside slot
+writes (signals for single saves, explicit calls after bulk inserts) and can
+be rebuilt from scratch with the rebuild_availability_search_index command.
+"""
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from ..availability_models import AppointmentSlot, AvailabilitySearchEntry
+
+logger = logging.getLogger(__name__)
+
+# Columns copied from the slot itself
+SLOT_COLUMNS = ('slot_start_time', 'status', 'appointment_type')
+
+# Columns copied from the availability and its provider
+SHARED_COLUMNS = (
+    'specialization', 'location_type', 'location_tokens', 'base_fee', 'insurance_accepted'
+)
+
+
+def search_index_enabled():
+    """Whether public search reads, and slot writes maintain, the search index"""
+    return getattr(settings, 'AVAILABILITY_SEARCH_INDEX', True)
+
+
+def normalize_text(value):
+    """Lowercase with runs of whitespace collapsed"""
+    return ' '.join(str(value or '').lower().split())
+
+
+def tokenize(value):
+    """Lowercase alphanumeric tokens of a free-text value"""
+    return re.findall(r'[a-z0-9]+', str(value or '').lower())
+
+
+class SearchIndexService:
+    # Slots loaded per query while refreshing or rebuilding
+    batch_size = 1000
+
+    @staticmethod
+    def shared_columns(availability, provider):
+        """Index columns common to every slot of the availability"""
+        location = availability.location if isinstance(availability.location, dict) else {}
+        pricing = availability.pricing if isinstance(availability.pricing, dict) else {}
+        clinic_address = provider.clinic_address if isinstance(provider.clinic_address, dict) else {}
+
+        tokens = tokenize(location.get('address')) + tokenize(clinic_address.get('address'))
+        insurance_accepted = pricing.get('insurance_accepted')
+        return {
+            'specialization': normalize_text(provider.specialization),
+            'location_type': location.get('type') or '',
+            # Padded so that ' token' matches a whole token or a token prefix
+            'location_tokens': f" {' '.join(dict.fromkeys(tokens))} " if tokens else '',
+            'base_fee': SearchIndexService._decimal(pricing.get('base_fee')),
+            'insurance_accepted': insurance_accepted if isinstance(insurance_accepted, bool) else None,
+        }
+
+    @classmethod
+    def index_slots(cls, slots):
+        """Insert or replace the entries of the given slots; returns the number written"""
+        if not search_index_enabled():
+            return 0
+
+        shared = {}
+        entries = []
+        for slot in slots:
+            if slot.availability_id not in shared:
+                shared[slot.availability_id] = cls.shared_columns(slot.availability, slot.availability.provider)
+            entries.append(AvailabilitySearchEntry(
+                slot_id=slot.id,
+                availability_id=slot.availability_id,
+                provider_id=slot.provider_id,
+                **{column: getattr(slot, column) for column in SLOT_COLUMNS},
+                **shared[slot.availability_id]
+            ))
+
+        AvailabilitySearchEntry.objects.bulk_create(
+            entries,
+            batch_size=cls.batch_size,
+            update_conflicts=True,
+            unique_fields=['slot'],
+            update_fields=list(SLOT_COLUMNS + SHARED_COLUMNS)
+        )
+        return len(entries)
+
+    @classmethod
+    def refresh_slot(cls, slot):
+        """Sync one saved slot; only its own columns change unless the entry is missing"""
+        if not search_index_enabled():
+            return
+        updated = AvailabilitySearchEntry.objects.filter(slot_id=slot.id).update(
+            **{column: getattr(slot, column) for column in SLOT_COLUMNS}
+        )
+        if not updated:
+            cls.index_slots([slot])
+
+    @staticmethod
+    def refresh_statuses(slots):
+        """Sync the status column of slots changed with a queryset update()"""
+        if not search_index_enabled():
+            return
+        slot_ids_by_status = {}
+        for slot in slots:
+            slot_ids_by_status.setdefault(slot.status, []).append(slot.id)
+        for slot_status, slot_ids in slot_ids_by_status.items():
+            AvailabilitySearchEntry.objects.filter(slot_id__in=slot_ids).update(status=slot_status)
+
+    @classmethod
+    def refresh_availability(cls, availability):
+        """Sync the entries of an availability after it or its provider changed"""
+        if not search_index_enabled():
+            return 0
+        return AvailabilitySearchEntry.objects.filter(availability_id=availability.id).update(
+            **cls.shared_columns(availability, availability.provider)
+        )
+
+    @classmethod
+    def refresh_provider(cls, provider):
+        """Sync the entries of every availability of the provider"""
+        if not search_index_enabled():
+            return 0
+        updated = 0
+        for availability in provider.availabilities.all():
+            availability.provider = provider
+            updated += cls.refresh_availability(availability)
+        return updated
+
+    @classmethod
+    def rebuild(cls, batch_size=None):
+        """Recreate every entry from the slot table; returns the number of entries written"""
+        batch_size = batch_size or cls.batch_size
+        written = 0
+        slots = AppointmentSlot.objects.select_related('availability__provider').order_by('id')
+        last_id = None
+
+        # Searches keep reading the previous entries until the rebuild commits
+        with transaction.atomic():
+            AvailabilitySearchEntry.objects.all().delete()
+            while True:
+                page = slots.filter(id__gt=last_id) if last_id else slots
+                batch = list(page[:batch_size])
+                if not batch:
+                    break
+                written += cls.index_slots(batch)
+                last_id = batch[-1].id
+
+        logger.info(f"Rebuilt availability search index with {written} entries")
+        return written
+
+    @staticmethod
+    def _decimal(value):
+        if value is None or isinstance(value, bool):
+            return None
+        try:
+            return Decimal(str(value)).quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            return None
@@ -0,0 +1,102 @@
+"""
+Background slot generation jobs
+
+Large recurring availabilities are persisted immediately and their slots
+are materialized by a worker process (``manage.py run_slot_generation_worker``)
+in short per-batch transactions, with progress recorded on the job row.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..availability_models import SlotGenerationJob
+from ..availability_utils import SlotGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class SlotGenerationService:
+    # Recurrence dates materialized per transaction
+    dates_per_batch = 31
+    # Running jobs not heard from for this long are assumed abandoned by their worker
+    stale_after = timedelta(minutes=10)
+
+    @staticmethod
+    def enqueue(availability):
+        """Queue slot generation for an availability"""
+        return SlotGenerationJob.objects.create(availability=availability)
+
+    @classmethod
+    def claim_next(cls):
+        """Claim the oldest runnable job with a conditional UPDATE, or return None"""
+        now = timezone.now()
+        stale = Q(status='running', locked_at__lt=now - cls.stale_after)
+
+        # Abandoned jobs that used up their attempts (e.g. crashing their worker) are not retried
+        SlotGenerationJob.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+            status='failed',
+            locked_at=None,
+            error_message='Worker stopped responding on the last attempt',
+            updated_at=now
+        )
+        runnable = Q(status='pending') | (stale & Q(attempts__lt=F('max_attempts')))
+
+        job_ids = SlotGenerationJob.objects.filter(runnable).order_by('created_at').values_list('id', flat=True)[:10]
+        for job_id in job_ids:
+            # Only one worker can win the update for a given job
+            claimed = SlotGenerationJob.objects.filter(runnable, id=job_id).update(
+                status='running',
+                locked_at=now,
+                attempts=F('attempts') + 1
+            )
+            if claimed:
+                return SlotGenerationJob.objects.select_related('availability__provider').get(id=job_id)
+        return None
+
+    @classmethod
+    def run(cls, job):
+        """Materialize the job's slots batch by batch, resuming after earlier progress"""
+        availability = job.availability
+        generator = SlotGenerator(availability)
+        dates = list(availability.get_recurrence_rule().occurrences())
+
+        job.dates_total = len(dates)
+        job.started_at = job.started_at or timezone.now()
+        job.save(update_fields=['dates_total', 'started_at', 'updated_at'])
+
+        try:
+            for offset in range(job.dates_processed, len(dates), cls.dates_per_batch):
+                batch = dates[offset:offset + cls.dates_per_batch]
+                job.slots_created += generator.generate_slots(batch[0], batch[-1])
+                job.dates_processed = offset + len(batch)
+                job.locked_at = timezone.now()
+                job.save(update_fields=['slots_created', 'dates_processed', 'locked_at', 'updated_at'])
+        except Exception as e:
+            logger.error(f"Slot generation job {job.id} failed (attempt {job.attempts}): {str(e)}")
+            job.error_message = str(e)
+            job.status = 'failed' if job.attempts >= job.max_attempts else 'pending'
+            job.locked_at = None
+            job.save(update_fields=['error_message', 'status', 'locked_at', 'updated_at'])
+            return job
+
+        job.status = 'completed'
+        job.error_message = None
+        job.locked_at = None
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'locked_at', 'completed_at', 'updated_at'])
+        logger.info(f"Slot generation job {job.id} completed: {job.slots_created} slots")
+        return job
+
+    @classmethod
+    def run_pending(cls, max_jobs=None):
+        """Run claimable jobs until none are left (or max_jobs ran); returns the number run"""
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            job = cls.claim_next()
+            if job is None:
+                break
+            cls.run(job)
+            processed += 1
+        return processed
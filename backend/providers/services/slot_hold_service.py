@@ -0,0 +1,115 @@
+"""
+Short-lived slot holds
+
+A hold moves an available slot to the 'held' status with one conditional
+UPDATE and records a SlotHold row with its expiry. Held slots drop out of
+every availability read, which only lists 'available' slots, until the hold
+is confirmed into an appointment (BookingService.book with the hold),
+released by the patient, or expired. Expiry is not checked on reads: the
+expire_slot_holds command releases expired holds in batches through the
+expires_at index.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from ..appointment_models import SlotHold
+from ..availability_models import AppointmentSlot
+from .booking_service import SlotUnavailable
+from .slot_status_service import SlotStatusService
+
+logger = logging.getLogger(__name__)
+
+MAX_HOLD_MINUTES = 30
+
+# Unexpired holds a patient may have at once, so one client cannot reserve a whole calendar
+MAX_ACTIVE_HOLDS_PER_PATIENT = 3
+
+
+def default_hold_minutes():
+    return getattr(settings, 'APPOINTMENT_SLOT_HOLD_MINUTES', 10)
+
+
+class SlotHoldService:
+    # Expired holds released per transaction by expire()
+    batch_size = 500
+
+    @staticmethod
+    def hold(slot_id, patient, minutes=None):
+        """
+        Hold an available slot for the patient; returns the SlotHold.
+
+        Raises AppointmentSlot.DoesNotExist for unknown slots, SlotUnavailable
+        if the slot is not available and ValidationError for group slots or
+        if the patient already has the maximum number of active holds.
+        """
+        minutes = minutes or default_hold_minutes()
+        if not 1 <= minutes <= MAX_HOLD_MINUTES:
+            raise ValidationError(f'Holds last between 1 and {MAX_HOLD_MINUTES} minutes')
+
+        now = timezone.now()
+        slot = AppointmentSlot.objects.select_related('availability').get(id=slot_id)
+        if slot.capacity > 1:
+            # A hold reserves the whole slot, which would lock out the rest of a group
+            raise ValidationError('Group slots cannot be held; book them directly')
+        if SlotHold.objects.filter(patient=patient, expires_at__gt=now).count() >= MAX_ACTIVE_HOLDS_PER_PATIENT:
+            raise ValidationError(f'A patient can hold at most {MAX_ACTIVE_HOLDS_PER_PATIENT} slots at once')
+
+        with transaction.atomic():
+            claimed = AppointmentSlot.objects.filter(id=slot.id, status='available', booked_count=0).update(
+                status='held', patient_id=patient.id, updated_at=now
+            )
+            if not claimed:
+                raise SlotUnavailable('Selected appointment slot is not available')
+            hold = SlotHold.objects.create(
+                slot=slot, patient=patient, expires_at=now + timedelta(minutes=minutes), created_at=now
+            )
+            slot.status = 'held'
+            slot.patient_id = patient.id
+            SlotStatusService.record_updates([slot], 'available')
+        return hold
+
+    @classmethod
+    def release(cls, hold):
+        """Give a held slot back before its hold expires"""
+        with transaction.atomic():
+            cls._release([hold.slot_id], SlotHold.objects.filter(id=hold.id))
+
+    @classmethod
+    def expire(cls, now=None, batch_size=None):
+        """Release every hold that expired by now; returns the number of holds removed"""
+        now = now or timezone.now()
+        batch_size = batch_size or cls.batch_size
+        expired = 0
+        while True:
+            with transaction.atomic():
+                holds = SlotHold.objects.filter(expires_at__lte=now)
+                slot_ids = list(holds.order_by('expires_at').values_list('slot_id', flat=True)[:batch_size])
+                if not slot_ids:
+                    break
+                expired += cls._release(slot_ids, holds.filter(slot_id__in=slot_ids))
+        if expired:
+            logger.info(f"Released {expired} expired slot holds")
+        return expired
+
+    @staticmethod
+    def _release(slot_ids, holds):
+        """Return the still-held slots among slot_ids to available and delete the holds"""
+        # Locked so that a confirm or another release cannot move them in between
+        slots = list(
+            AppointmentSlot.objects.select_for_update().select_related('availability').filter(
+                id__in=slot_ids, status='held'
+            )
+        )
+        AppointmentSlot.objects.filter(id__in=[slot.id for slot in slots]).update(
+            status='available', patient_id=None, updated_at=timezone.now()
+        )
+        for slot in slots:
+            slot.status = 'available'
+            slot.patient_id = None
+        SlotStatusService.record_updates(slots, 'held')
+        return holds.delete()[1].get(SlotHold._meta.label, 0)
@@ -0,0 +1,125 @@
+"""
+Rolling-horizon slot materialization
+
+With ``AVAILABILITY_SLOT_HORIZON_DAYS`` set, only the next N days of slots
+are written. ``Availability.materialized_until`` records how far each
+availability has been expanded, so every run of the
+``materialize_slot_horizon`` command only generates the newly uncovered days
+and trims slots that have expired unbooked.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..availability_models import Availability, AppointmentSlot
+from ..availability_utils import SlotGenerator
+from .slot_status_service import SlotStatusService
+
+logger = logging.getLogger(__name__)
+
+
+def slot_horizon_days():
+    """Number of days ahead to materialize, or None to expand whole recurrences"""
+    return getattr(settings, 'AVAILABILITY_SLOT_HORIZON_DAYS', None)
+
+
+class SlotHorizonService:
+    # Expired slots deleted per DELETE statement
+    trim_batch_size = 1000
+
+    @staticmethod
+    def horizon_end(days, today=None):
+        """Last date covered by a horizon of the given length"""
+        today = today or timezone.now().date()
+        return today + timedelta(days=days)
+
+    @staticmethod
+    def plan_window(availability, horizon_end, today=None):
+        """
+        Next extension of an availability as (window_start, window_end, watermark).
+        
+        Nothing needs generating when window_start is after window_end, and a
+        watermark of None leaves materialized_until unchanged.
+        """
+        today = today or timezone.now().date()
+        last_date = availability.get_recurrence_rule().last_date
+        window_end = min(horizon_end, last_date)
+
+        if availability.materialized_until:
+            window_start = availability.materialized_until + timedelta(days=1)
+        else:
+            # Days already in the past are never worth materializing
+            window_start = max(availability.date, today)
+
+        if window_start <= window_end:
+            return window_start, window_end, window_end
+        if last_date < window_start:
+            # The recurrence has nothing left to materialize
+            return window_start, window_end, last_date
+        # The recurrence starts beyond the horizon
+        return window_start, window_end, None
+
+    @classmethod
+    def extend(cls, availability, horizon_end, today=None):
+        """Materialize an availability's slots up to horizon_end; returns slots created"""
+        window_start, window_end, watermark = cls.plan_window(availability, horizon_end, today)
+
+        slots_created = 0
+        if window_start <= window_end:
+            slots_created = SlotGenerator(availability).generate_slots(window_start, window_end)
+
+        if watermark and (availability.materialized_until is None or watermark > availability.materialized_until):
+            # update() skips the full_clean() in Availability.save()
+            Availability.objects.filter(id=availability.id).update(materialized_until=watermark)
+            availability.materialized_until = watermark
+        return slots_created
+
+    @classmethod
+    def extend_all(cls, horizon_end, today=None):
+        """Extend every availability that has uncovered days before horizon_end"""
+        pending = Availability.objects.filter(status='available', date__lte=horizon_end).filter(
+            Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon_end)
+        ).exclude(
+            # Fully materialized recurrences and single dates
+            recurrence_end_date__lte=F('materialized_until')
+        ).exclude(
+            is_recurring=False, date__lte=F('materialized_until')
+        ).select_related('provider')
+
+        stats = {'availabilities': 0, 'slots_created': 0}
+        for availability in pending.iterator(chunk_size=500):
+            stats['availabilities'] += 1
+            stats['slots_created'] += cls.extend(availability, horizon_end, today)
+
+        logger.info(
+            f"Extended slot horizon to {horizon_end}: {stats['slots_created']} slots "
+            f"for {stats['availabilities']} availabilities"
+        )
+        return stats
+
+    @classmethod
+    def trim_expired(cls, before):
+        """Delete slots that ended unbooked before the cutoff; returns rows deleted"""
+        expired = AppointmentSlot.objects.filter(
+            status='available',
+            slot_end_time__lt=before,
+            appointments__isnull=True
+        )
+
+        deleted = 0
+        while True:
+            slots = list(expired.select_related('availability').only(
+                'id', 'provider_id', 'availability_id', 'slot_start_time', 'status', 'availability__timezone'
+            )[:cls.trim_batch_size])
+            if not slots:
+                break
+            # Queryset deletes skip the per-slot receivers, so the batch is recorded at once
+            with transaction.atomic():
+                _, deleted_by_model = AppointmentSlot.objects.filter(id__in=[slot.id for slot in slots]).delete()
+                SlotStatusService.record_deletes(slots)
+            deleted += deleted_by_model.get(AppointmentSlot._meta.label, 0)
+        return deleted
@@ -0,0 +1,46 @@
+"""
+Derived data upkeep for slot status changes made with queryset update()
+
+update() sends no model signals, so code that changes slot statuses with a
+conditional or bulk UPDATE reports the changed slots here. This does for
+them what the post_save receivers do for slot.save(): move the daily
+availability counts, sync the search index, expire cached searches and bump
+the providers' schedule versions. Queryset deletes of slots, which the
+post_delete receivers leave alone, are reported here the same way.
+"""
+from .daily_availability_service import DailyAvailabilityService
+from .schedule_version_service import ScheduleVersionService
+from .search_cache_service import AvailabilitySearchCache
+from .search_index_service import SearchIndexService
+
+
+class SlotStatusService:
+    @staticmethod
+    def record_updates(slots, old_status):
+        """Apply the side effects of moving slots from old_status to their current, in-memory status"""
+        slots = [slot for slot in slots if slot.status != old_status]
+        if not slots:
+            return
+        DailyAvailabilityService.record_transitions(slots, old_status)
+        SearchIndexService.refresh_statuses(slots)
+        AvailabilitySearchCache.invalidate_slots(slots)
+        ScheduleVersionService.bump(slot.provider_id for slot in slots)
+        for slot in slots:
+            slot._loaded_status = slot.status
+
+    @staticmethod
+    def record_capacity_changes(slots):
+        """Apply the side effects of a booking or cancellation that left the slots' status unchanged"""
+        if not slots:
+            return
+        AvailabilitySearchCache.invalidate_slots(slots)
+        ScheduleVersionService.bump(slot.provider_id for slot in slots)
+
+    @staticmethod
+    def record_deletes(slots):
+        """Apply the side effects of deleting slots; search entries go with them by cascade"""
+        if not slots:
+            return
+        DailyAvailabilityService.record_deleted(slots)
+        AvailabilitySearchCache.invalidate_slots(slots)
+        ScheduleVersionService.bump(slot.provider_id for slot in slots)
@@ -0,0 +1,138 @@
+"""
+Keep the search indexes, the search result cache, the daily availability
+rollup and the schedule versions in step with model writes
+
+Bulk inserts and queryset deletes of slots bypass these receivers and
+update each of them explicitly; an availability's slots are rolled up
+together when it is deleted. Deletions cascade to the search entries and
+tokens.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .availability_models import Availability, AppointmentSlot
+from .models import Provider
+from .patient_models import Patient
+from .services.daily_availability_service import DailyAvailabilityService
+from .services.dropdown_search_service import (
+    PATIENT_FIELDS, PROVIDER_FIELDS, patient_search_index, provider_search_index
+)
+from .services.schedule_version_service import ScheduleVersionService
+from .services.search_cache_service import AvailabilitySearchCache
+from .services.search_index_service import SearchIndexService
+from .services.slot_status_service import SlotStatusService
+
+# Provider fields copied into search entries
+INDEXED_PROVIDER_FIELDS = {'specialization', 'clinic_address'}
+
+# Provider fields shown in public search results
+SEARCHED_PROVIDER_FIELDS = INDEXED_PROVIDER_FIELDS | {'first_name', 'last_name', 'years_of_experience'}
+
+
+def _touches(update_fields, fields):
+    """Whether a save with these update_fields may have changed any of fields"""
+    return update_fields is None or bool(set(fields) & set(update_fields))
+
+
+def _cascades_from_provider(origin):
+    """Whether a delete is part of deleting providers, whose rollup and version rows go too"""
+    return isinstance(origin, Provider) or getattr(origin, 'model', None) is Provider
+
+
+def _deleted_alone(instance, origin):
+    """Whether a delete is of this instance itself rather than a cascade or queryset delete"""
+    return origin is None or origin is instance
+
+
+@receiver(pre_save, sender=AppointmentSlot)
+def remember_slot_status(sender, instance, raw=False, **kwargs):
+    # Slots not loaded through the ORM, e.g. built with a known id, look their status up
+    if not raw and not instance._state.adding and not hasattr(instance, '_loaded_status'):
+        instance._loaded_status = AppointmentSlot.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=AppointmentSlot)
+def roll_up_saved_slot(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    old_status = getattr(instance, '_loaded_status', None)
+    if created or old_status is None:
+        DailyAvailabilityService.record_created([instance])
+    else:
+        DailyAvailabilityService.record_transition(instance, old_status, instance.status)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=AppointmentSlot)
+def roll_up_deleted_slot(sender, instance, origin=None, **kwargs):
+    # Availability deletes and queryset deletes record their slots in one pass
+    if _deleted_alone(instance, origin):
+        SlotStatusService.record_deletes([instance])
+
+
+@receiver(pre_delete, sender=Availability)
+def roll_up_availability_slots(sender, instance, origin=None, **kwargs):
+    if _cascades_from_provider(origin):
+        return
+    slots = list(instance.slots.only('id', 'provider_id', 'availability_id', 'slot_start_time', 'status'))
+    for slot in slots:
+        slot.availability = instance
+    # Cached searches and the schedule version follow from the availability's own receivers
+    DailyAvailabilityService.record_deleted(slots)
+
+
+@receiver(post_save, sender=AppointmentSlot)
+def index_saved_slot(sender, instance, raw=False, **kwargs):
+    if not raw:
+        SearchIndexService.refresh_slot(instance)
+        AvailabilitySearchCache.invalidate_slots([instance])
+
+
+@receiver(post_save, sender=Availability)
+def index_saved_availability(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    # A new availability has no slots yet
+    if not created:
+        SearchIndexService.refresh_availability(instance)
+    # Virtual slots appear as soon as the rules are saved
+    AvailabilitySearchCache.invalidate_availability(instance)
+
+
+@receiver(post_delete, sender=Availability)
+def expire_deleted_availability(sender, instance, **kwargs):
+    AvailabilitySearchCache.invalidate_availability(instance)
+
+
+@receiver(post_save, sender=AppointmentSlot)
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def bump_schedule_version(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not _cascades_from_provider(origin):
+        ScheduleVersionService.bump([instance.provider_id])
+
+
+@receiver(post_save, sender=Provider)
+def index_saved_provider(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if _touches(update_fields, INDEXED_PROVIDER_FIELDS):
+        SearchIndexService.refresh_provider(instance)
+    if _touches(update_fields, SEARCHED_PROVIDER_FIELDS):
+        AvailabilitySearchCache.invalidate_all()
+        # Slot listings show the provider's name and specialization
+        ScheduleVersionService.bump([instance.id])
+
+
+@receiver(post_save, sender=Provider)
+def index_provider_tokens(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _touches(update_fields, [field for field, _ in PROVIDER_FIELDS]):
+        provider_search_index.index(instance)
+
+
+@receiver(post_save, sender=Patient)
+def index_patient_tokens(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _touches(update_fields, [field for field, _ in PATIENT_FIELDS]):
+        patient_search_index.index(instance)
@@ -1,6 +1,7 @@
 from django.urls import path
 from .slot_debug_views import (
     AvailableSlotIdsView,
+    SearchCacheStatsView,
     SlotValidationView
 )
 
@@ -8,4 +9,5 @@ urlpatterns = [
     # Debug endpoints for slot troubleshooting
     path('debug/available-slot-ids', AvailableSlotIdsView.as_view(), name='debug-available-slot-ids'),
     path('debug/validate-slot', SlotValidationView.as_view(), name='debug-validate-slot'),
+    path('debug/search-cache', SearchCacheStatsView.as_view(), name='debug-search-cache'),
 ]
@@ -5,6 +5,7 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .availability_models import AppointmentSlot
 from .models import Provider
+from .services.search_cache_service import AvailabilitySearchCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -235,3 +236,42 @@ class SlotValidationView(APIView):
                 'message': 'Failed to validate slot ID',
                 'errors': {'general': [str(e)]}
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SearchCacheStatsView(APIView):
+    """
+    Debug API to show availability search cache hit/miss counters
+    """
+    
+    @swagger_auto_schema(
+        operation_description="Get hit and miss counters of the public availability search cache",
+        operation_summary="Debug - Search Cache Stats",
+        responses={
+            200: openapi.Response(
+                description="Search cache counters",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'success': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        'message': openapi.Schema(type=openapi.TYPE_STRING),
+                        'data': openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'enabled': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                                'hits': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'misses': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'hit_rate': openapi.Schema(type=openapi.TYPE_NUMBER)
+                            }
+                        )
+                    }
+                )
+            )
+        },
+        tags=['Debug']
+    )
+    def get(self, request):
+        return Response({
+            'success': True,
+            'message': 'Search cache statistics retrieved',
+            'data': dict(AvailabilitySearchCache.stats(), enabled=AvailabilitySearchCache.enabled())
+        }, status=status.HTTP_200_OK)
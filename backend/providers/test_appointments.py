@@ -0,0 +1,513 @@
+"""
+Unit tests for appointment booking
+"""
+import re
+from datetime import date, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .appointment_models import (
+    Appointment, AppointmentHistory, AppointmentNumberCounter, IdempotencyKey, SlotHold
+)
+from .availability_models import (
+    AppointmentSlot, Availability, AvailabilitySearchEntry, ProviderDailyAvailability
+)
+from .availability_utils import SlotGenerator
+from .models import Provider
+from .patient_models import Patient
+from .services.appointment_number_service import (
+    SUFFIX_SPACE, appointment_number_allocator, format_appointment_number
+)
+from .services.booking_service import BookingService, SlotUnavailable
+from .services.idempotency_service import IdempotencyService
+from .services.schedule_version_service import ScheduleVersionService
+from .services.slot_hold_service import MAX_ACTIVE_HOLDS_PER_PATIENT, SlotHoldService
+
+
+class BookingTestBase(APITestCase):
+    """Provider, slots and patient shared by the booking tests"""
+
+    url = '/api/v1/provider/appointments/'
+
+    def setUp(self):
+        """Set up a provider with two slots next week and a patient"""
+        self.provider = Provider.objects.create(
+            first_name='Booking',
+            last_name='Provider',
+            email='booking.provider@example.com',
+            phone_number='+1234567814',
+            password_hash='hashed_password',
+            specialization='Cardiology',
+            license_number='LIC123470',
+            years_of_experience=7,
+            clinic_address={'address': '6 Booking Blvd, Austin, TX'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date.today() + timedelta(days=7),
+            start_time=time(9, 0),
+            end_time=time(11, 0),
+            timezone='UTC',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '6 Booking Blvd, Austin, TX'}
+        )
+        SlotGenerator(self.availability).generate_slots()
+        self.slot = AppointmentSlot.objects.filter(availability=self.availability).first()
+        self.patient = Patient.objects.create(
+            first_name='Pat',
+            last_name='Booker',
+            email='pat.booker@example.com',
+            phone_number='+13125550177',
+            password_hash='hashed_password'
+        )
+
+    def booking(self, **overrides):
+        return {
+            'patient_id': str(self.patient.id),
+            'provider_id': str(self.provider.id),
+            'appointment_slot_id': str(self.slot.id),
+            'appointment_date': str(self.slot.slot_start_time.date()),
+            'appointment_time': '09:00:00',
+            'appointment_mode': 'in_person',
+            'location_details': {'address': '6 Booking Blvd, Austin, TX'},
+            'reason_for_visit': 'Annual checkup',
+            **overrides
+        }
+
+
+class BookingServiceTestCase(BookingTestBase):
+    """Test cases for the contention-safe booking path"""
+
+    def test_booking_claims_slot_with_few_statements(self):
+        """Test that a booking updates the slot and its derived data in a handful of statements"""
+        version = ScheduleVersionService.current(self.provider.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.booking(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Lookups, claim, time check, number, inserts and derived data; the response serializer adds a few reads
+        # Savepoints and the search cache table, which holds the cache shared by all workers, are left out
+        statements = [
+            query for query in queries.captured_queries
+            if 'availability_search_cache' not in query['sql'] and 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertLessEqual(len(statements), 13)
+
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, 'booked')
+        self.assertEqual(self.slot.patient_id, self.patient.id)
+        self.assertTrue(self.slot.booking_reference.startswith('BOOK-'))
+        appointment = Appointment.objects.get(appointment_slot=self.slot)
+        self.assertEqual(appointment.appointment_time, time(9, 0))
+        self.assertTrue(AppointmentHistory.objects.filter(appointment=appointment, action='created').exists())
+
+        rollup = ProviderDailyAvailability.objects.get(provider=self.provider)
+        self.assertEqual((rollup.available_slots, rollup.booked_slots), (1, 1))
+        self.assertEqual(AvailabilitySearchEntry.objects.get(slot=self.slot).status, 'booked')
+        self.assertEqual(ScheduleVersionService.current(self.provider.id), version + 1)
+
+    def test_stale_slot_loses_to_earlier_booking(self):
+        """Test that a slot loaded before a concurrent booking cannot be booked again"""
+        stale_slot = AppointmentSlot.objects.select_related('availability').get(id=self.slot.id)
+        self.assertEqual(self.client.post(self.url, self.booking(), format='json').status_code, status.HTTP_201_CREATED)
+
+        with self.assertRaises(SlotUnavailable):
+            BookingService.book(
+                self.patient, self.provider, stale_slot,
+                appointment_mode='in_person',
+                location_details={'address': '6 Booking Blvd, Austin, TX'},
+                reason_for_visit='Second booking',
+                appointment_date=stale_slot.slot_start_time.date(),
+                appointment_time=stale_slot.slot_start_time.time()
+            )
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(ProviderDailyAvailability.objects.get(provider=self.provider).booked_slots, 1)
+
+        response = self.client.post(self.url, self.booking(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_taken_time_without_slot_returns_conflict(self):
+        """Test that the provider time constraint turns a double booking into 409"""
+        self.client.post(self.url, self.booking(), format='json')
+
+        response = self.client.post(self.url, self.booking(appointment_slot_id=None), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+class SlotHoldTestCase(BookingTestBase):
+    """Test cases for holding a slot and confirming the hold"""
+
+    holds_url = '/api/v1/provider/appointments/holds/'
+
+    def hold(self, **overrides):
+        response = self.client.post(self.holds_url, {
+            'patient_id': str(self.patient.id),
+            'appointment_slot_id': str(self.slot.id),
+            **overrides
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return SlotHold.objects.get(id=response.data['data']['hold_id'])
+
+    def confirm(self, hold):
+        return self.client.post(f'{self.holds_url}{hold.id}/confirm/', {
+            'appointment_mode': 'in_person',
+            'location_details': {'address': '6 Booking Blvd, Austin, TX'},
+            'reason_for_visit': 'Held checkup',
+        }, format='json')
+
+    def search(self):
+        day = str(self.slot.slot_start_time.date())
+        response = self.client.get(
+            '/api/v1/provider/appointments/slots/search/', {'provider_id': str(self.provider.id), 'date_from': day}
+        )
+        return {str(slot['id']) for slot in response.data['data']}
+
+    def test_held_slot_is_hidden_and_cannot_be_booked(self):
+        """Test that a held slot leaves availability reads and direct bookings"""
+        self.assertIn(str(self.slot.id), self.search())
+        self.hold(hold_minutes=5)
+
+        self.assertNotIn(str(self.slot.id), self.search())
+        self.assertEqual(ProviderDailyAvailability.objects.get(provider=self.provider).available_slots, 1)
+        self.assertEqual(AvailabilitySearchEntry.objects.get(slot=self.slot).status, 'held')
+        response = self.client.post(self.holds_url, {
+            'patient_id': str(self.patient.id), 'appointment_slot_id': str(self.slot.id)
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.post(self.url, self.booking(), format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_books_held_slot(self):
+        """Test that confirming a hold books its slot and removes the hold"""
+        hold = self.hold()
+        response = self.confirm(hold)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.patient_id), ('booked', self.patient.id))
+        self.assertEqual(Appointment.objects.get(appointment_slot=self.slot).reason_for_visit, 'Held checkup')
+        self.assertFalse(SlotHold.objects.exists())
+        rollup = ProviderDailyAvailability.objects.get(provider=self.provider)
+        self.assertEqual((rollup.available_slots, rollup.booked_slots), (1, 1))
+
+    def test_expired_hold_is_swept_and_cannot_be_confirmed(self):
+        """Test that an expired hold is refused and the sweeper returns its slot"""
+        hold = self.hold()
+        SlotHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.confirm(hold).status_code, status.HTTP_409_CONFLICT)
+
+        hold.refresh_from_db()
+        with self.assertRaises(SlotUnavailable):
+            BookingService.book(
+                self.patient, self.provider, AppointmentSlot.objects.get(id=self.slot.id), hold=hold,
+                appointment_mode='in_person',
+                location_details={'address': '6 Booking Blvd, Austin, TX'},
+                reason_for_visit='Held checkup',
+                appointment_date=self.slot.slot_start_time.date(),
+                appointment_time=self.slot.slot_start_time.time()
+            )
+
+        self.assertEqual(SlotHoldService.expire(), 1)
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.patient_id), ('available', None))
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertEqual(ProviderDailyAvailability.objects.get(provider=self.provider).available_slots, 2)
+        self.assertIn(str(self.slot.id), self.search())
+
+    def test_release_and_patient_hold_limit(self):
+        """Test that a released hold frees its slot and a patient's active holds are capped"""
+        hold = self.hold()
+        response = self.client.delete(f'{self.holds_url}{hold.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, 'available')
+
+        availability = Availability.objects.create(
+            provider=self.provider,
+            date=date.today() + timedelta(days=8),
+            start_time=time(9, 0),
+            end_time=time(13, 0),
+            timezone='UTC',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '6 Booking Blvd, Austin, TX'}
+        )
+        SlotGenerator(availability).generate_slots()
+        slots = AppointmentSlot.objects.filter(availability=availability)
+        for slot in slots[:MAX_ACTIVE_HOLDS_PER_PATIENT]:
+            SlotHoldService.hold(slot.id, self.patient)
+        with self.assertRaises(ValidationError):
+            SlotHoldService.hold(slots[MAX_ACTIVE_HOLDS_PER_PATIENT].id, self.patient)
+
+
+class SlotCapacityTestCase(BookingTestBase):
+    """Test cases for slots that take several appointments"""
+
+    def setUp(self):
+        """Add a three-place group slot and more patients"""
+        super().setUp()
+        availability = Availability.objects.create(
+            provider=self.provider,
+            date=date.today() + timedelta(days=9),
+            start_time=time(14, 0),
+            end_time=time(15, 0),
+            timezone='UTC',
+            slot_duration=60,
+            max_appointments_per_slot=3,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '6 Booking Blvd, Austin, TX'}
+        )
+        SlotGenerator(availability).generate_slots()
+        self.slot = AppointmentSlot.objects.get(availability=availability)
+        self.patients = [self.patient] + [
+            Patient.objects.create(
+                first_name='Group',
+                last_name=f'Member{index}',
+                email=f'group.member{index}@example.com',
+                phone_number=f'+1312555018{index}',
+                password_hash='hashed_password'
+            )
+            for index in range(3)
+        ]
+
+    def book(self, patient):
+        return self.client.post(
+            self.url, self.booking(patient_id=str(patient.id), appointment_time='14:00:00'), format='json'
+        )
+
+    def listed_slot(self):
+        day = str(self.slot.slot_start_time.date())
+        response = self.client.get(
+            f'/api/v1/provider/{self.provider.id}/availability', {'start_date': day, 'end_date': day}
+        )
+        data = response.data['data']
+        return data['availability'][0]['slots'][0], data['availability_summary']['remaining_capacity']
+
+    def test_slot_fills_after_its_capacity(self):
+        """Test that a group slot stays available until its last place is booked"""
+        self.assertEqual(self.slot.capacity, 3)
+        for booked, patient in enumerate(self.patients[:2], start=1):
+            self.assertEqual(self.book(patient).status_code, status.HTTP_201_CREATED)
+            self.slot.refresh_from_db()
+            self.assertEqual(
+                (self.slot.status, self.slot.booked_count, self.slot.patient_id), ('available', booked, None)
+            )
+        slot_data, remaining = self.listed_slot()
+        self.assertEqual((slot_data['status'], slot_data['remaining_capacity'], remaining), ('available', 1, 1))
+        self.assertEqual(AvailabilitySearchEntry.objects.get(slot=self.slot).status, 'available')
+
+        self.assertEqual(self.book(self.patients[2]).status_code, status.HTTP_201_CREATED)
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.booked_count), ('booked', 3))
+        self.assertEqual(self.slot.appointments.count(), 3)
+        self.assertEqual(self.listed_slot()[0]['remaining_capacity'], 0)
+        self.assertEqual(ProviderDailyAvailability.objects.get(date=self.slot.slot_start_time.date()).booked_slots, 1)
+
+        self.assertEqual(self.book(self.patients[3]).status_code, status.HTTP_400_BAD_REQUEST)
+        stale_slot = AppointmentSlot.objects.select_related('availability').get(id=self.slot.id)
+        stale_slot.status = 'available'
+        with self.assertRaises(SlotUnavailable):
+            BookingService.book(
+                self.patients[3], self.provider, stale_slot,
+                appointment_mode='in_person',
+                location_details={'address': '6 Booking Blvd, Austin, TX'},
+                reason_for_visit='Late arrival',
+                appointment_date=stale_slot.slot_start_time.date(),
+                appointment_time=stale_slot.slot_start_time.time()
+            )
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.booked_count, 3)
+
+    def test_patient_takes_one_place_per_slot(self):
+        """Test that a patient cannot book the same group slot twice"""
+        self.assertEqual(self.book(self.patient).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book(self.patient).status_code, status.HTTP_409_CONFLICT)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.booked_count, 1)
+
+    def test_cancellation_frees_a_place(self):
+        """Test that cancelling an appointment in a full slot reopens one place"""
+        appointment_ids = [self.book(patient).data['data']['id'] for patient in self.patients[:3]]
+        version = ScheduleVersionService.current(self.provider.id)
+
+        response = self.client.post(
+            f'{self.url}{appointment_ids[0]}/cancel/', {'cancellation_reason': 'Sick'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.booked_count, self.slot.remaining_capacity), ('available', 2, 1))
+        self.assertEqual(ScheduleVersionService.current(self.provider.id), version + 1)
+
+        # A repeated cancel without an Idempotency-Key must not free a second place
+        response = self.client.post(
+            f'{self.url}{appointment_ids[0]}/cancel/', {'cancellation_reason': 'Sick'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.booked_count, 2)
+
+        self.assertEqual(self.book(self.patients[3]).status_code, status.HTTP_201_CREATED)
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.booked_count), ('booked', 3))
+
+    def test_model_save_claims_places_atomically(self):
+        """Test that appointments saved directly take places with the conditional update, even from stale slots"""
+        stale_slots = [AppointmentSlot.objects.get(id=self.slot.id) for _ in self.patients]
+        for patient, slot in zip(self.patients[:3], stale_slots):
+            Appointment.objects.create(
+                patient=patient,
+                provider=self.provider,
+                appointment_slot=slot,
+                appointment_mode='in_person',
+                location_details={'address': '6 Booking Blvd, Austin, TX'},
+                reason_for_visit='Group session',
+                appointment_date=slot.slot_start_time.date(),
+                appointment_time=slot.slot_start_time.time()
+            )
+        with self.assertRaises(SlotUnavailable):
+            Appointment.objects.create(
+                patient=self.patients[3],
+                provider=self.provider,
+                appointment_slot=stale_slots[3],
+                appointment_mode='in_person',
+                location_details={'address': '6 Booking Blvd, Austin, TX'},
+                reason_for_visit='Group session',
+                appointment_date=self.slot.slot_start_time.date(),
+                appointment_time=self.slot.slot_start_time.time()
+            )
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.booked_count), ('booked', 3))
+        self.assertEqual(self.slot.appointments.count(), 3)
+
+    def test_slot_status_changes_follow_its_appointments(self):
+        """Test that a full slot cannot be freed by hand and a slot booked by hand is freed completely"""
+        slot_url = f'/api/v1/provider/{self.provider.id}/availability/{self.slot.id}'
+        for patient in self.patients[:3]:
+            self.assertEqual(self.book(patient).status_code, status.HTTP_201_CREATED)
+        response = self.client.put(slot_url, {'status': 'available', 'force_update': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.slot.refresh_from_db()
+        self.assertEqual((self.slot.status, self.slot.booked_count), ('booked', 3))
+
+        other_slot = AppointmentSlot.objects.filter(availability=self.availability).last()
+        other_url = f'/api/v1/provider/{self.provider.id}/availability/{other_slot.id}'
+        self.assertEqual(self.client.put(other_url, {'status': 'booked'}, format='json').status_code, status.HTTP_200_OK)
+        other_slot.refresh_from_db()
+        self.assertEqual(other_slot.booked_count, other_slot.capacity)
+        response = self.client.put(other_url, {'status': 'available', 'force_update': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other_slot.refresh_from_db()
+        self.assertEqual((other_slot.status, other_slot.booked_count), ('available', 0))
+        self.assertEqual(AvailabilitySearchEntry.objects.get(slot=other_slot).status, 'available')
+
+    def test_slot_bookings_block_other_appointments_at_that_time(self):
+        """Test that an appointment without a slot cannot take the time of a booked group slot"""
+        self.assertEqual(self.book(self.patient).status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.url, self.booking(
+            patient_id=str(self.patients[1].id), appointment_slot_id=None, appointment_time='14:00:00',
+            appointment_date=str(self.slot.slot_start_time.date())
+        ), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+class IdempotencyKeyTestCase(BookingTestBase):
+    """Test cases for Idempotency-Key replays of appointment writes"""
+
+    def post(self, url, data, key):
+        return self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_booking_replays_stored_response(self):
+        """Test that a retry gets the first response without touching appointment tables"""
+        first = self.post(self.url, self.booking(), 'retry-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post(self.url, self.booking(), 'retry-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['data']['id'], str(first.data['data']['id']))
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if re.search(r'providers_appointment(slot|history)?\b', query['sql'])
+        ])
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(AppointmentHistory.objects.count(), 1)
+
+        # Another key is another request, which finds the slot taken
+        self.assertEqual(self.post(self.url, self.booking(), 'retry-2').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retried_cancellation_is_not_repeated(self):
+        """Test that a retried cancellation replays its response instead of failing or adding history"""
+        booked = self.client.post(self.url, self.booking(appointment_slot_id=None), format='json')
+        cancel_url = f"{self.url}{booked.data['data']['id']}/cancel/"
+
+        first = self.post(cancel_url, {'cancellation_reason': 'Travelling'}, 'cancel-1')
+        retry = self.post(cancel_url, {'cancellation_reason': 'Travelling'}, 'cancel-1')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual((retry.status_code, retry.json()), (first.status_code, first.json()))
+        self.assertEqual(AppointmentHistory.objects.filter(action='cancelled').count(), 1)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        """Test that a key sent with a different body is refused"""
+        self.post(self.url, self.booking(), 'reused')
+        response = self.post(self.url, self.booking(reason_for_visit='Something else'), 'reused')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_expired_keys_are_purged(self):
+        """Test that keys past their replay window are deleted and run again"""
+        self.post(self.url, self.booking(), 'old')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(IdempotencyService.purge(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.post(self.url, self.booking(), 'old')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class AppointmentNumberAllocatorTestCase(TestCase):
+    """Test cases for the per-day appointment number allocator"""
+
+    def setUp(self):
+        appointment_number_allocator.reset()
+        self.addCleanup(appointment_number_allocator.reset)
+
+    def test_numbers_are_unique_and_well_formed(self):
+        """Test that sequence values map to distinct numbers in the APT-YYYYMMDD-XXXX format"""
+        day = date(2025, 8, 7)
+        numbers = [format_appointment_number(day, value) for value in range(1, 5000)]
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertTrue(all(re.fullmatch(r'APT-20250807-[0-9A-Z]{4}', number) for number in numbers))
+        # Beyond the four-character space the suffix widens instead of wrapping
+        self.assertEqual(len(format_appointment_number(day, SUFFIX_SPACE).split('-')[2]), 5)
+
+    @override_settings(APPOINTMENT_NUMBER_BLOCK_SIZE=3)
+    def test_committed_blocks_are_served_from_memory(self):
+        """Test that a leased block is used after commit without querying the counter"""
+        day = date(2025, 8, 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = appointment_number_allocator.allocate(day)
+        self.assertEqual(AppointmentNumberCounter.objects.get(date=day).last_value, 3)
+
+        with self.assertNumQueries(0):
+            rest = [appointment_number_allocator.allocate(day) for _ in range(2)]
+        fourth = appointment_number_allocator.allocate(day)
+
+        self.assertEqual(
+            [first, *rest, fourth], [format_appointment_number(day, value) for value in range(1, 5)]
+        )
+        self.assertEqual(AppointmentNumberCounter.objects.get(date=day).last_value, 6)
+
+    @override_settings(APPOINTMENT_NUMBER_BLOCK_SIZE=3)
+    def test_uncommitted_blocks_are_not_reused(self):
+        """Test that values of a lease whose transaction did not commit are not handed out from memory"""
+        day = date(2025, 8, 7)
+        appointment_number_allocator.allocate(day)
+        appointment_number_allocator.allocate(day)
+        self.assertEqual(AppointmentNumberCounter.objects.get(date=day).last_value, 6)
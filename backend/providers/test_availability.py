@@ -1,25 +1,55 @@
 """
 Unit tests for Provider Availability Management
 """
+import json
 import pytest
-from django.test import TestCase
+import uuid
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import datetime, date, time, timedelta
+from decimal import Decimal
 import pytz
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from unittest.mock import patch
+from io import StringIO
+from django.core.management import call_command
 
 from .models import Provider
-from .availability_models import Availability, AppointmentSlot
+from .availability_models import (
+    Availability, AppointmentSlot, AvailabilitySearchEntry, AvailabilityTemplate, ProviderDailyAvailability,
+    ProviderScheduleVersion, SlotGenerationJob
+)
 from .availability_utils import (
     AvailabilityManager, SlotGenerator, AvailabilityValidator,
     handle_daylight_saving_transition, calculate_slot_statistics
 )
+from .availability_recurrence import RecurrenceRule
+from .availability_virtual import VirtualSlotResolver, virtual_slot_id
+from .utils.timezone_utils import TimezoneConverter
+from .utils.interval_index import SlotIntervalIndex
+from .services.slot_generation_service import SlotGenerationService
+from .services.search_cache_service import AvailabilitySearchCache
+from .services.slot_horizon_service import SlotHorizonService
+from .services.availability_template_service import AvailabilityTemplateService
+from .services.daily_availability_service import DailyAvailabilityService
+from .services.schedule_version_service import ScheduleVersionService
 from .availability_serializers import AvailabilityCreateSerializer
 
 
+def database_queries(queries):
+    """Captured statements other than those of the shared search cache and its savepoints"""
+    return [
+        query for query in queries.captured_queries
+        if 'availability_search_cache' not in query['sql'] and 'SAVEPOINT' not in query['sql']
+    ]
+
+
 class AvailabilityManagerTestCase(TestCase):
     """Test cases for AvailabilityManager utility class"""
     
@@ -112,6 +142,68 @@ class AvailabilityManagerTestCase(TestCase):
         self.assertEqual(dates, expected_dates)
 
 
+class RecurrenceRuleTestCase(TestCase):
+    """Test cases for the RecurrenceRule engine"""
+    
+    def test_monthly_keeps_anchor_day_after_short_month(self):
+        """Test that a month-end anchor is clamped per month, not permanently"""
+        rule = RecurrenceRule(date(2024, 1, 31), 'monthly', until=date(2024, 4, 30))
+        
+        self.assertEqual(list(rule.occurrences()), [
+            date(2024, 1, 31),
+            date(2024, 2, 29),
+            date(2024, 3, 31),
+            date(2024, 4, 30)
+        ])
+    
+    def test_weekly_weekdays_with_interval(self):
+        """Test by-weekday expansion every other week"""
+        # 2024-02-14 is a Wednesday
+        rule = RecurrenceRule(
+            date(2024, 2, 14), 'weekly', interval=2, weekdays=[0, 2, 4],
+            until=date(2024, 3, 1)
+        )
+        
+        self.assertEqual(list(rule.occurrences()), [
+            date(2024, 2, 14),
+            date(2024, 2, 16),
+            date(2024, 2, 26),
+            date(2024, 2, 28),
+            date(2024, 3, 1)
+        ])
+    
+    def test_count_and_exceptions(self):
+        """Test that exceptions are removed without extending the count"""
+        rule = RecurrenceRule(
+            date(2024, 2, 15), 'daily', count=5, exceptions=['2024-02-17']
+        )
+        
+        self.assertEqual(rule.last_date, date(2024, 2, 19))
+        self.assertEqual(list(rule.occurrences()), [
+            date(2024, 2, 15),
+            date(2024, 2, 16),
+            date(2024, 2, 18),
+            date(2024, 2, 19)
+        ])
+    
+    def test_window_matches_full_expansion(self):
+        """Test that jumping into a window yields the same dates as walking"""
+        rules = [
+            RecurrenceRule(date(2024, 1, 3), 'daily', interval=3, until=date(2026, 1, 1)),
+            RecurrenceRule(date(2024, 1, 3), 'weekly', interval=3, weekdays=[1, 5], count=200),
+            RecurrenceRule(date(2024, 1, 31), 'monthly', interval=5, count=30),
+        ]
+        window_start, window_end = date(2025, 3, 10), date(2025, 9, 20)
+        
+        for rule in rules:
+            expected = [
+                day for day in rule.occurrences()
+                if window_start <= day <= window_end
+            ]
+            self.assertTrue(expected)
+            self.assertEqual(list(rule.occurrences(window_start, window_end)), expected)
+
+
 class AvailabilityValidatorTestCase(TestCase):
     """Test cases for AvailabilityValidator utility class"""
     
@@ -351,6 +443,1212 @@ class SlotGeneratorTestCase(TestCase):
         slots = AppointmentSlot.objects.filter(availability=self.availability)
         self.assertEqual(slots.count(), 12)
 
+    def test_slot_generation_skips_conflicts(self):
+        """Test that candidates overlapping existing slots are skipped"""
+        # Occupies 9:15-9:50 EST, overlapping the first two generated slots
+        AppointmentSlot.objects.create(
+            availability=self.availability,
+            provider=self.provider,
+            slot_start_time=datetime(2024, 2, 15, 14, 15, tzinfo=pytz.UTC),
+            slot_end_time=datetime(2024, 2, 15, 14, 50, tzinfo=pytz.UTC),
+            appointment_type='consultation',
+            status='booked'
+        )
+        # Cancelled slots don't block the window but still hold their start time
+        AppointmentSlot.objects.create(
+            availability=self.availability,
+            provider=self.provider,
+            slot_start_time=datetime(2024, 2, 15, 15, 30, tzinfo=pytz.UTC),
+            slot_end_time=datetime(2024, 2, 15, 16, 0, tzinfo=pytz.UTC),
+            appointment_type='consultation',
+            status='cancelled'
+        )
+
+        slots_created = SlotGenerator(self.availability).generate_slots()
+
+        self.assertEqual(slots_created, 1)
+        self.assertEqual(AppointmentSlot.objects.filter(provider=self.provider).count(), 3)
+
+    @override_settings(AVAILABILITY_SEARCH_INDEX=False)
+    def test_slot_generation_query_count_is_constant(self):
+        """Test that a long recurrence is written with a fixed number of queries"""
+        self.availability.is_recurring = True
+        self.availability.recurrence_pattern = 'daily'
+        self.availability.recurrence_end_date = date(2024, 8, 14)  # ~6 months
+        self.availability.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            slots_created = SlotGenerator(self.availability).generate_slots()
+
+        # One lookup of existing slots, then chunked INSERTs only
+        selects = [q for q in database_queries(queries) if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertLess(len(database_queries(queries)), 20)
+        self.assertEqual(slots_created, 4 * 182)
+
+
+class SlotIntervalIndexTestCase(APITestCase):
+    """Test cases for the slot interval index"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.provider = Provider.objects.create(
+            first_name='Interval',
+            last_name='Index',
+            email='interval.index@example.com',
+            phone_number='+1234567897',
+            password_hash='hashed_password',
+            specialization='General Medicine',
+            license_number='LIC123463',
+            years_of_experience=5,
+            clinic_address={'address': '8 Sweep Lane, Austin, TX'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            timezone='UTC',
+            slot_duration=30,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '8 Sweep Lane'}
+        )
+
+    def _utc(self, hour, minute=0):
+        return datetime(2024, 2, 15, hour, minute, tzinfo=pytz.UTC)
+
+    def _slot(self, start, end, slot_status='available'):
+        return AppointmentSlot.objects.create(
+            availability=self.availability,
+            provider=self.provider,
+            slot_start_time=start,
+            slot_end_time=end,
+            appointment_type='consultation',
+            status=slot_status
+        )
+
+    def test_overlapping_finds_nested_and_long_slots(self):
+        """Test that overlap queries see slots that started long before the interval"""
+        index = SlotIntervalIndex([
+            (self._utc(8), self._utc(12), 'booked', 'long'),
+            (self._utc(9), self._utc(9, 30), 'available', 'short'),
+            (self._utc(10), self._utc(10, 30), 'cancelled', 'cancelled'),
+            (self._utc(11), self._utc(11, 30), 'available', 'late'),
+        ])
+
+        self.assertEqual([slot.id for slot in index.overlapping(self._utc(9, 15), self._utc(10, 15))], ['long', 'short'])
+        self.assertEqual([slot.id for slot in index.overlapping(self._utc(12), self._utc(13))], [])
+        self.assertFalse(index.has_overlap(self._utc(12), self._utc(13)))
+        # Inactive slots only hold their start time
+        self.assertTrue(index.is_start_taken(self._utc(10)))
+        self.assertEqual(index.filter_candidates([(self._utc(12), self._utc(12, 30)), (self._utc(12, 15), self._utc(12, 45))]),
+                         [(self._utc(12), self._utc(12, 30))])
+
+    def test_find_slot_conflicts_uses_one_query(self):
+        """Test that many intervals are checked against a single range query"""
+        booked = self._slot(self._utc(9), self._utc(9, 30), 'booked')
+        self._slot(self._utc(10), self._utc(10, 30), 'cancelled')
+        intervals = [(self._utc(hour, 15), self._utc(hour, 45)) for hour in range(8, 12)]
+
+        with self.assertNumQueries(1):
+            results = AvailabilityManager.find_slot_conflicts(self.provider, intervals)
+
+        self.assertEqual([len(overlapping) for _, overlapping in results], [0, 1, 0, 0])
+        self.assertEqual(results[1][1][0].id, booked.id)
+        self.assertFalse(AvailabilityManager.check_slot_conflicts(
+            self.provider, self._utc(9), self._utc(9, 30), exclude_slot_id=booked.id
+        ))
+
+    def test_reactivating_overlapping_slot_is_rejected(self):
+        """Test that a cancelled slot cannot be reopened over a newer active slot"""
+        cancelled = self._slot(self._utc(9), self._utc(9, 30), 'cancelled')
+        self._slot(self._utc(9, 15), self._utc(9, 45), 'available')
+        self.client.force_authenticate(user=self.provider)
+
+        response = self.client.put(
+            f'/api/v1/provider/{self.provider.id}/availability/{cancelled.id}',
+            {'status': 'available'},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'cancelled')
+
+
+class ConflictPreviewTestCase(APITestCase):
+    """Test cases for the multi-day conflict preview"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.provider = Provider.objects.create(
+            first_name='Conflict',
+            last_name='Preview',
+            email='conflict.preview@example.com',
+            phone_number='+1234567898',
+            password_hash='hashed_password',
+            specialization='General Medicine',
+            license_number='LIC123464',
+            years_of_experience=5,
+            clinic_address={'address': '21 Overlap Road, Seattle, WA'}
+        )
+        self.start = timezone.now().date() + timedelta(days=7)
+        existing = Availability.objects.create(
+            provider=self.provider,
+            date=self.start,
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            timezone='UTC',
+            slot_duration=30,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '21 Overlap Road'}
+        )
+        # Booked slots on the first and fourth day of the new recurrence
+        for offset in (0, 3):
+            slot_start = pytz.UTC.localize(datetime.combine(self.start + timedelta(days=offset), time(10, 0)))
+            AppointmentSlot.objects.create(
+                availability=existing,
+                provider=self.provider,
+                slot_start_time=slot_start,
+                slot_end_time=slot_start + timedelta(minutes=30),
+                appointment_type='consultation',
+                status='booked'
+            )
+        self.data = {
+            'date': self.start.isoformat(),
+            'start_time': '09:00',
+            'end_time': '12:00',
+            'timezone': 'UTC',
+            'slot_duration': 30,
+            'break_duration': 0,
+            'appointment_type': 'consultation',
+            'is_recurring': True,
+            'recurrence_pattern': 'daily',
+            'recurrence_end_date': (self.start + timedelta(days=4)).isoformat(),
+            'location': {'type': 'clinic', 'address': '21 Overlap Road'}
+        }
+        self.client.force_authenticate(user=self.provider)
+
+    def test_preview_groups_conflicts_by_date(self):
+        """Test that every occurrence is checked with a single slot query"""
+        preview = Availability(
+            provider=self.provider,
+            date=self.start,
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            timezone='UTC',
+            is_recurring=True,
+            recurrence_pattern='daily',
+            recurrence_end_date=self.start + timedelta(days=4)
+        )
+
+        with self.assertNumQueries(1):
+            report = AvailabilityManager.preview_conflicts(preview)
+
+        self.assertEqual(list(report), [self.start.isoformat(), (self.start + timedelta(days=3)).isoformat()])
+        self.assertEqual(report[self.start.isoformat()][0]['status'], 'booked')
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a dry run reports conflicts and planned slots without saving"""
+        response = self.client.post(f'/api/v1/provider/{self.provider.id}/availability?dry_run=true', self.data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['success'])
+        self.assertEqual(response.data['data']['occurrences'], 5)
+        self.assertEqual(response.data['data']['slots_planned'], 6 * 5)
+        self.assertEqual(len(response.data['data']['conflicts_by_date']), 2)
+        self.assertEqual(Availability.objects.filter(provider=self.provider).count(), 1)
+
+    def test_conflict_on_later_day_rejects_create(self):
+        """Test that a conflict on any occurrence rejects the whole availability"""
+        self.data['date'] = (self.start + timedelta(days=1)).isoformat()
+
+        response = self.client.post(f'/api/v1/provider/{self.provider.id}/availability', self.data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['conflicts_by_date']), [(self.start + timedelta(days=3)).isoformat()])
+        self.assertEqual(Availability.objects.filter(provider=self.provider).count(), 1)
+
+
+class AvailabilityBatchCreateTestCase(APITestCase):
+    """Test cases for batch availability creation"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.providers = [
+            Provider.objects.create(
+                first_name='Batch',
+                last_name=f'Provider{number}',
+                email=f'batch.provider{number}@example.com',
+                phone_number=f'+12345679{number:02d}',
+                password_hash='hashed_password',
+                specialization='General Medicine',
+                license_number=f'LIC2234{number:02d}',
+                years_of_experience=5,
+                clinic_address={'address': '5 Import Street, Miami, FL'}
+            )
+            for number in range(2)
+        ]
+        self.start = timezone.now().date() + timedelta(days=7)
+        self.client.force_authenticate(user=self.providers[0])
+
+    def _item(self, provider, start_time='09:00', end_time='12:00', **extra):
+        item = {
+            'provider_id': str(provider.id),
+            'date': self.start.isoformat(),
+            'start_time': start_time,
+            'end_time': end_time,
+            'timezone': 'UTC',
+            'slot_duration': 30,
+            'break_duration': 0,
+            'appointment_type': 'consultation',
+            'is_recurring': True,
+            'recurrence_pattern': 'daily',
+            'recurrence_end_date': (self.start + timedelta(days=9)).isoformat(),
+            'location': {'type': 'clinic', 'address': '5 Import Street'}
+        }
+        item.update(extra)
+        return item
+
+    def test_batch_reports_per_item_results(self):
+        """Test that valid items are written and failures are reported per item"""
+        items = [
+            self._item(self.providers[0]),
+            self._item(self.providers[1]),
+            self._item(self.providers[0], '11:00', '13:00'),  # Overlaps the first item
+            self._item(self.providers[0], '14:00', '15:00', provider_id=str(uuid.uuid4())),
+            self._item(self.providers[0], '15:00', '14:00'),
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/provider/availability/batch', {'items': items}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['data']['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'conflict', 'invalid', 'invalid'])
+        self.assertEqual(results[2]['conflicts_by_date'][self.start.isoformat()][0]['batch_index'], 0)
+        self.assertEqual(response.data['data']['slots_created'], 2 * 6 * 10)
+        self.assertEqual(AppointmentSlot.objects.count(), 2 * 6 * 10)
+        # Providers, existing slots, then bulk inserts; nothing per item or per slot
+        selects = [q for q in database_queries(queries) if q['sql'].startswith('SELECT')]
+        self.assertLessEqual(len(selects), 3)
+
+    def test_existing_slot_conflict(self):
+        """Test that items overlapping existing active slots are rejected"""
+        existing = self.client.post('/api/v1/provider/availability/batch', {'items': [self._item(self.providers[0])]}, format='json')
+        self.assertEqual(existing.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(
+            '/api/v1/provider/availability/batch',
+            {'items': [self._item(self.providers[0], '11:30', '12:30', date=(self.start + timedelta(days=9)).isoformat(),
+                                  recurrence_end_date=(self.start + timedelta(days=10)).isoformat())]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        report = response.data['data']['results'][0]['conflicts_by_date']
+        self.assertEqual(list(report), [(self.start + timedelta(days=9)).isoformat()])
+
+    def test_all_or_nothing(self):
+        """Test that one failure rejects the whole batch when requested"""
+        items = [self._item(self.providers[0]), self._item(self.providers[1], '12:00', '11:00')]
+
+        response = self.client.post(
+            '/api/v1/provider/availability/batch', {'items': items, 'all_or_nothing': True}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['data']['results']], ['skipped', 'invalid'])
+        self.assertFalse(Availability.objects.exists())
+
+        # A string 'false' is not a request for all-or-nothing
+        response = self.client.post(
+            '/api/v1/provider/availability/batch', {'items': items, 'all_or_nothing': 'false'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+
+    def test_non_object_items_are_invalid(self):
+        """Test that items which are not objects are reported per item instead of failing the request"""
+        items = [self._item(self.providers[0]), 'not an item', 7]
+
+        response = self.client.post('/api/v1/provider/availability/batch', {'items': items}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data['data']['results']], ['created', 'invalid', 'invalid'])
+
+
+class AvailabilityTemplateTestCase(APITestCase):
+    """Test cases for applying availability templates"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.providers = [
+            Provider.objects.create(
+                first_name='Template',
+                last_name=f'Provider{number}',
+                email=f'template.provider{number}@example.com',
+                phone_number=f'+12345680{number:02d}',
+                password_hash='hashed_password',
+                specialization='General Medicine',
+                license_number=f'LIC3234{number:02d}',
+                years_of_experience=5,
+                clinic_address={'address': '9 Rollout Avenue, Portland, OR'}
+            )
+            for number in range(3)
+        ]
+        self.template = AvailabilityTemplate.objects.create(
+            provider=self.providers[0],
+            template_name='Clinic weekdays',
+            schedule=[
+                {'weekdays': [0, 1, 2, 3, 4], 'start_time': '09:00', 'end_time': '12:00'},
+                {'weekdays': [5], 'start_time': '10:00', 'end_time': '11:00', 'appointment_type': 'follow_up'},
+            ],
+            default_settings={
+                'timezone': 'America/Los_Angeles',
+                'slot_duration': 30,
+                'break_duration': 0,
+                'appointment_type': 'consultation',
+                'location': {'type': 'clinic', 'address': '9 Rollout Avenue'}
+            }
+        )
+        # Two full weeks starting on a Monday
+        today = timezone.now().date()
+        self.start = today + timedelta(days=7 - today.weekday())
+        self.end = self.start + timedelta(days=13)
+
+    def test_parse_schedule_groups_weekday_mapping(self):
+        """Test that weekday-keyed schedules with identical blocks are merged"""
+        self.template.schedule = {
+            'monday': [{'start_time': '09:00', 'end_time': '12:00'}],
+            'Wednesday': [{'start_time': '09:00', 'end_time': '12:00'}],
+        }
+
+        self.assertEqual(
+            AvailabilityTemplateService.parse_schedule(self.template),
+            [([0, 2], {'start_time': '09:00', 'end_time': '12:00'})]
+        )
+
+    def test_apply_to_many_providers(self):
+        """Test that the template is rolled out to every provider in one batch"""
+        provider_ids = [provider.id for provider in self.providers]
+
+        results, stats = AvailabilityTemplateService.apply(self.template, provider_ids, self.start, self.end, workers=1)
+
+        self.assertEqual(stats['created'], 2 * 3)
+        # Weekdays: 10 days x 6 slots, Saturdays: 2 days x 2 slots
+        self.assertEqual(stats['slots_created'], 3 * (10 * 6 + 2 * 2))
+        self.assertEqual(AppointmentSlot.objects.filter(appointment_type='follow_up').count(), 3 * 2 * 2)
+        self.assertIn('generate', stats['timings'])
+
+    def test_process_pool_matches_inline_generation(self):
+        """Test that fanning out slot generation to processes writes the same slots"""
+        provider_ids = [provider.id for provider in self.providers]
+
+        results, stats = AvailabilityTemplateService.apply(self.template, provider_ids, self.start, self.end, workers=2)
+
+        self.assertEqual(stats['workers'], 2)
+        self.assertEqual(stats['slots_created'], 3 * (10 * 6 + 2 * 2))
+        self.assertEqual(AppointmentSlot.objects.count(), 3 * (10 * 6 + 2 * 2))
+
+    def test_apply_endpoint_and_command(self):
+        """Test the apply endpoint and the management command"""
+        response = self.client.post(
+            f'/api/v1/provider/availability/templates/{self.template.id}/apply',
+            {'start_date': self.start.isoformat(), 'end_date': self.end.isoformat()},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['stats']['slots_created'], 10 * 6 + 2 * 2)
+
+        # Applying again only conflicts with what already exists
+        out, err = StringIO(), StringIO()
+        call_command(
+            'apply_availability_template', str(self.template.id),
+            '--start-date', self.start.isoformat(), '--end-date', self.end.isoformat(),
+            '--provider', str(self.providers[0].id), '--provider', str(self.providers[1].id),
+            stdout=out, stderr=err
+        )
+        self.assertIn('Created 2 of 4 availabilities', out.getvalue())
+        self.assertIn('conflict', err.getvalue())
+
+    def test_apply_endpoint_rejects_malformed_weekdays(self):
+        """Test that a block whose weekdays is not a list is a validation error, not a server error"""
+        self.template.schedule = [{'weekdays': 1, 'start_time': '09:00', 'end_time': '12:00'}]
+        self.template.save()
+
+        response = self.client.post(
+            f'/api/v1/provider/availability/templates/{self.template.id}/apply',
+            {'start_date': self.start.isoformat(), 'end_date': self.end.isoformat()},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('template', response.data['errors'])
+
+
+class SlotGenerationJobTestCase(APITestCase):
+    """Test cases for background slot generation jobs"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.provider = Provider.objects.create(
+            first_name='Job',
+            last_name='Runner',
+            email='job.runner@example.com',
+            phone_number='+1234567895',
+            password_hash='hashed_password',
+            specialization='General Medicine',
+            license_number='LIC123461',
+            years_of_experience=5,
+            clinic_address={'address': '12 Queue Street, Chicago, IL'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            timezone='America/New_York',
+            slot_duration=30,
+            break_duration=15,
+            appointment_type='consultation',
+            is_recurring=True,
+            recurrence_pattern='daily',
+            recurrence_end_date=date(2024, 4, 14),  # 60 days
+            location={'type': 'clinic', 'address': '12 Queue Street'}
+        )
+
+    def test_job_runs_in_batches(self):
+        """Test that a queued job materializes every slot and records progress"""
+        job = SlotGenerationService.enqueue(self.availability)
+
+        with patch.object(SlotGenerationService, 'dates_per_batch', 7):
+            self.assertEqual(SlotGenerationService.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.dates_total, 60)
+        self.assertEqual(job.dates_processed, 60)
+        self.assertEqual(job.progress_percent, 100)
+        self.assertEqual(job.slots_created, 4 * 60)
+        self.assertEqual(AppointmentSlot.objects.filter(availability=self.availability).count(), 4 * 60)
+
+    def test_claim_is_exclusive(self):
+        """Test that a claimed job cannot be claimed again while it runs"""
+        job = SlotGenerationService.enqueue(self.availability)
+
+        claimed = SlotGenerationService.claim_next()
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertIsNone(SlotGenerationService.claim_next())
+
+        # Abandoned jobs become claimable again
+        SlotGenerationJob.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - SlotGenerationService.stale_after - timedelta(seconds=1)
+        )
+        self.assertEqual(SlotGenerationService.claim_next().attempts, 2)
+
+        # A job abandoned on its last attempt is failed instead of claimed again
+        SlotGenerationJob.objects.filter(id=job.id).update(
+            attempts=job.max_attempts,
+            locked_at=timezone.now() - SlotGenerationService.stale_after - timedelta(seconds=1)
+        )
+        self.assertIsNone(SlotGenerationService.claim_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_at), ('failed', job.max_attempts, None))
+        self.assertTrue(job.error_message)
+
+    def test_failed_job_retries_then_fails(self):
+        """Test that a failing job is retried up to max_attempts and resumes its progress"""
+        job = SlotGenerationService.enqueue(self.availability)
+        original = SlotGenerator.generate_slots
+        calls = {'count': 0}
+
+        def flaky_generate(generator, window_start=None, window_end=None):
+            calls['count'] += 1
+            if calls['count'] == 2:
+                raise RuntimeError('database unavailable')
+            return original(generator, window_start, window_end)
+
+        with patch.object(SlotGenerator, 'generate_slots', flaky_generate):
+            SlotGenerationService.run(SlotGenerationService.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.dates_processed, SlotGenerationService.dates_per_batch)
+        self.assertEqual(job.error_message, 'database unavailable')
+
+        # The retry resumes after the committed batch
+        SlotGenerationService.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(AppointmentSlot.objects.filter(availability=self.availability).count(), 4 * 60)
+
+        job = SlotGenerationService.enqueue(self.availability)
+        with patch.object(SlotGenerator, 'generate_slots', side_effect=RuntimeError('boom')):
+            SlotGenerationService.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, job.max_attempts)
+
+    def test_async_create_returns_job(self):
+        """Test that ?async=true queues generation and exposes the job status"""
+        self.client.force_authenticate(user=self.provider)
+        data = {
+            'date': (timezone.now().date() + timedelta(days=7)).isoformat(),
+            'start_time': '09:00',
+            'end_time': '12:00',
+            'timezone': 'America/Chicago',
+            'slot_duration': 30,
+            'break_duration': 15,
+            'appointment_type': 'consultation',
+            'location': {'type': 'clinic', 'address': '12 Queue Street'}
+        }
+
+        response = self.client.post(f'/api/v1/provider/{self.provider.id}/availability?async=true', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        availability_id = response.data['data']['availability_id']
+        self.assertFalse(AppointmentSlot.objects.filter(availability_id=availability_id).exists())
+
+        call_command('run_slot_generation_worker', once=True, stdout=StringIO())
+
+        response = self.client.get(response.data['data']['status_url'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['status'], 'completed')
+        self.assertEqual(response.data['data']['slots_created'], 4)
+
+
+class SlotHorizonTestCase(TestCase):
+    """Test cases for rolling-horizon slot materialization"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.provider = Provider.objects.create(
+            first_name='Rolling',
+            last_name='Horizon',
+            email='rolling.horizon@example.com',
+            phone_number='+1234567896',
+            password_hash='hashed_password',
+            specialization='General Medicine',
+            license_number='LIC123462',
+            years_of_experience=5,
+            clinic_address={'address': '3 Horizon Way, Denver, CO'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            timezone='America/New_York',
+            slot_duration=30,
+            break_duration=15,
+            appointment_type='consultation',
+            is_recurring=True,
+            recurrence_pattern='daily',
+            recurrence_end_date=date(2024, 4, 14),  # 60 days
+            location={'type': 'clinic', 'address': '3 Horizon Way'}
+        )
+        self.today = date(2024, 2, 15)
+
+    def test_extend_is_incremental(self):
+        """Test that each extension only materializes the newly uncovered days"""
+        horizon_end = SlotHorizonService.horizon_end(14, self.today)
+        self.assertEqual(SlotHorizonService.extend(self.availability, horizon_end, self.today), 4 * 15)
+        self.assertEqual(self.availability.materialized_until, date(2024, 2, 29))
+
+        horizon_end = SlotHorizonService.horizon_end(14, date(2024, 2, 22))
+        self.assertEqual(SlotHorizonService.extend(self.availability, horizon_end, self.today), 4 * 7)
+        self.availability.refresh_from_db()
+        self.assertEqual(self.availability.materialized_until, date(2024, 3, 7))
+        self.assertEqual(AppointmentSlot.objects.filter(availability=self.availability).count(), 4 * 22)
+
+    def test_extend_all_stops_at_recurrence_end(self):
+        """Test that finished recurrences are no longer selected"""
+        stats = SlotHorizonService.extend_all(date(2024, 12, 31), self.today)
+        self.assertEqual(stats, {'availabilities': 1, 'slots_created': 4 * 60})
+
+        stats = SlotHorizonService.extend_all(date(2025, 1, 31), self.today)
+        self.assertEqual(stats, {'availabilities': 0, 'slots_created': 0})
+
+    def test_trim_expired_keeps_booked_slots(self):
+        """Test that only expired unbooked slots are trimmed"""
+        SlotHorizonService.extend(self.availability, date(2024, 2, 16), self.today)
+        booked = AppointmentSlot.objects.filter(availability=self.availability).first()
+        booked.status = 'booked'
+        booked.save()
+
+        deleted = SlotHorizonService.trim_expired(datetime(2024, 2, 16, 0, 0, tzinfo=pytz.UTC))
+
+        self.assertEqual(deleted, 3)
+        remaining = AppointmentSlot.objects.filter(availability=self.availability)
+        self.assertEqual(remaining.count(), 5)
+        self.assertTrue(remaining.filter(id=booked.id).exists())
+
+    @override_settings(AVAILABILITY_SLOT_HORIZON_DAYS=7)
+    def test_create_materializes_horizon_only(self):
+        """Test that new availabilities only get slots within the horizon"""
+        start = timezone.now().date() + timedelta(days=1)
+        serializer = AvailabilityCreateSerializer(
+            data={
+                'date': start.isoformat(),
+                'start_time': '09:00',
+                'end_time': '12:00',
+                'timezone': 'America/New_York',
+                'slot_duration': 30,
+                'break_duration': 15,
+                'appointment_type': 'consultation',
+                'is_recurring': True,
+                'recurrence_pattern': 'daily',
+                'recurrence_end_date': (start + timedelta(days=89)).isoformat(),
+                'location': {'type': 'clinic', 'address': '3 Horizon Way'}
+            },
+            context={'provider': self.provider}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        availability = serializer.save()
+
+        # Tomorrow through today + 7 days
+        self.assertEqual(availability._slots_created, 4 * 7)
+        self.assertEqual(availability.materialized_until, timezone.now().date() + timedelta(days=7))
+
+
+class AvailabilitySearchIndexTestCase(APITestCase):
+    """Test cases for the denormalized availability search index"""
+
+    def setUp(self):
+        """Set up a provider with generated slots"""
+        self.provider = Provider.objects.create(
+            first_name='Search',
+            last_name='Index',
+            email='search.index@example.com',
+            phone_number='+1234567899',
+            password_hash='hashed_password',
+            specialization='Internal  Medicine',
+            license_number='LIC123465',
+            years_of_experience=9,
+            clinic_address={'address': '40 Lake Shore Dr, Chicago, IL'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(15, 0),
+            end_time=time(17, 0),
+            timezone='UTC',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '40 Lake Shore Dr, Chicago, IL'},
+            pricing={'base_fee': '150.00', 'insurance_accepted': True, 'currency': 'USD'}
+        )
+        SlotGenerator(self.availability).generate_slots()
+
+    def search(self, **params):
+        response = APIClient().get('/api/v1/availability/search', dict({'date': '2024-02-15'}, **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [slot['slot_id'] for result in response.data['data']['results'] for slot in result['available_slots']]
+
+    def test_generated_slots_are_indexed(self):
+        """Test that bulk slot generation writes typed entries"""
+        entry = AvailabilitySearchEntry.objects.order_by('slot_start_time').first()
+        self.assertEqual(AvailabilitySearchEntry.objects.count(), 2)
+        self.assertEqual(entry.specialization, 'internal medicine')
+        self.assertEqual(entry.location_type, 'clinic')
+        self.assertIn(' chicago ', entry.location_tokens)
+        self.assertEqual(entry.base_fee, Decimal('150.00'))
+        self.assertTrue(entry.insurance_accepted)
+
+    def test_search_filters_on_index_columns(self):
+        """Test that public search answers from the index"""
+        self.assertEqual(len(self.search(specialization='internal medicine')), 2)
+        self.assertEqual(len(self.search(location='chic')), 2)
+        self.assertEqual(self.search(location='Denver'), [])
+        self.assertEqual(len(self.search(max_price='150')), 2)
+        self.assertEqual(self.search(max_price='149.99'), [])
+        self.assertEqual(self.search(insurance_accepted='false'), [])
+        self.assertEqual(self.search(location_type='hospital'), [])
+        self.assertEqual(len(self.search(max_price='1e999')), 2)
+        for max_price in ('inf', 'nan', '-Infinity', 'cheap'):
+            response = APIClient().get('/api/v1/availability/search', {'date': '2024-02-15', 'max_price': max_price})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_keep_index_in_sync(self):
+        """Test that slot, availability and provider saves update the entries"""
+        slot = AppointmentSlot.objects.order_by('slot_start_time').first()
+        slot.status = 'blocked'
+        slot.save()
+        self.assertEqual(self.search(), [str(AppointmentSlot.objects.order_by('slot_start_time').last().id)])
+
+        self.availability.pricing = {'base_fee': 90, 'insurance_accepted': False}
+        self.availability.save()
+        self.assertEqual(len(self.search(max_price='100', insurance_accepted='false')), 1)
+
+        self.provider.specialization = 'Cardiology'
+        self.provider.save()
+        self.assertEqual(len(self.search(specialization='cardio')), 1)
+
+        slot.delete()
+        self.assertEqual(AvailabilitySearchEntry.objects.count(), 1)
+
+    def test_rebuild_command_recreates_entries(self):
+        """Test that the rebuild command restores missing entries"""
+        AvailabilitySearchEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_availability_search_index', batch_size=1, stdout=out)
+
+        self.assertIn('2 entries', out.getvalue())
+        self.assertEqual(len(self.search()), 2)
+
+
+class AvailabilitySearchCacheTestCase(APITestCase):
+    """Test cases for the public availability search cache"""
+
+    def setUp(self):
+        """Set up slots on two dates and an empty cache"""
+        self.cache = AvailabilitySearchCache.cache()
+        self.cache.clear()
+        self.provider = Provider.objects.create(
+            first_name='Cached',
+            last_name='Search',
+            email='cached.search@example.com',
+            phone_number='+1234567810',
+            password_hash='hashed_password',
+            specialization='Neurology',
+            license_number='LIC123466',
+            years_of_experience=12,
+            clinic_address={'address': '8 Cache Lane, Boston, MA'}
+        )
+        self.slots = {}
+        for day in (date(2024, 2, 15), date(2024, 3, 20)):
+            availability = Availability.objects.create(
+                provider=self.provider,
+                date=day,
+                start_time=time(15, 0),
+                end_time=time(16, 0),
+                timezone='UTC',
+                slot_duration=60,
+                appointment_type='consultation',
+                location={'type': 'clinic', 'address': '8 Cache Lane, Boston, MA'}
+            )
+            SlotGenerator(availability).generate_slots()
+            self.slots[day] = AppointmentSlot.objects.get(availability=availability)
+
+    def search(self, specialization='Neurology'):
+        return APIClient().get('/api/v1/availability/search', {'date': '2024-02-15', 'specialization': specialization})
+
+    def test_repeated_search_is_served_from_cache(self):
+        """Test that normalized repeats of a search skip the slot, availability and provider tables"""
+        first = self.search()
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.search('  neurology ')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        # Only the cache table, which is shared by every worker process
+        self.assertEqual(database_queries(queries), [])
+        self.assertEqual(second.data['data']['results'], first.data['data']['results'])
+        self.assertEqual(second.data['data']['search_criteria']['specialization'], '  neurology ')
+
+        stats = APIClient().get('/api/v1/slot/debug/search-cache').data['data']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_writes_expire_only_affected_searches(self):
+        """Test that slot changes expire searches over their date only"""
+        self.search()
+
+        other_slot = self.slots[date(2024, 3, 20)]
+        other_slot.status = 'blocked'
+        other_slot.save()
+        self.assertEqual(self.search()['X-Cache'], 'HIT')
+
+        slot = self.slots[date(2024, 2, 15)]
+        slot.status = 'blocked'
+        slot.save()
+        response = self.search()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['data']['total_results'], 0)
+
+    def test_provider_changes_expire_searches(self):
+        """Test that displayed provider fields expire cached searches but login bookkeeping does not"""
+        self.search()
+
+        self.provider.login_count = 1
+        self.provider.save(update_fields=['login_count'])
+        self.assertEqual(self.search()['X-Cache'], 'HIT')
+
+        self.provider.last_name = 'Renamed'
+        self.provider.save()
+        response = self.search()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['data']['results'][0]['provider']['name'], 'Dr. Cached Renamed')
+
+    def test_process_local_cache_is_not_used(self):
+        """Test that a LocMemCache alias, which other workers cannot invalidate, leaves searches uncached"""
+        with override_settings(AVAILABILITY_SEARCH_CACHE_ALIAS='default'):
+            self.search()
+            self.assertNotIn('X-Cache', self.search())
+
+    def test_wide_ranges_are_not_cached(self):
+        """Test that searches spanning more days than can be invalidated skip the cache entirely"""
+        response = APIClient().get(
+            '/api/v1/availability/search', {'start_date': '2000-01-01', 'end_date': '2029-12-31'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', response)
+        self.assertIsNone(self.cache.get('availability_search:generation:2010-06-01'))
+
+
+class DailyAvailabilityRollupTestCase(TestCase):
+    """Test cases for the per-provider daily availability rollup"""
+
+    def setUp(self):
+        """Set up an evening availability in New York, which spills into the next UTC date"""
+        self.provider = Provider.objects.create(
+            first_name='Rollup',
+            last_name='Provider',
+            email='rollup.provider@example.com',
+            phone_number='+1234567811',
+            password_hash='hashed_password',
+            specialization='Pediatrics',
+            license_number='LIC123467',
+            years_of_experience=6,
+            clinic_address={'address': '3 Rollup Road, New York, NY'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(18, 0),
+            end_time=time(22, 0),
+            timezone='America/New_York',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '3 Rollup Road, New York, NY'}
+        )
+        SlotGenerator(self.availability).generate_slots()
+
+    def rollup(self, day=date(2024, 2, 15)):
+        return ProviderDailyAvailability.objects.get(provider=self.provider, date=day)
+
+    def test_generation_counts_slots_on_local_date(self):
+        """Test that bulk generation counts every slot under the availability's local date"""
+        self.assertEqual(ProviderDailyAvailability.objects.filter(provider=self.provider).count(), 1)
+        rollup = self.rollup()
+        self.assertEqual((rollup.available_slots, rollup.total_slots), (4, 4))
+        self.assertTrue(DailyAvailabilityService.has_availability(self.provider, date(2024, 2, 15)))
+        self.assertFalse(DailyAvailabilityService.has_availability(self.provider, date(2024, 2, 16)))
+
+    def test_status_changes_and_deletes_move_counts(self):
+        """Test that slot saves and deletes keep the rollup in step"""
+        slots = list(AppointmentSlot.objects.filter(availability=self.availability).order_by('slot_start_time'))
+        slots[0].status = 'booked'
+        slots[0].save()
+        # Reloaded slots remember their status without an extra query
+        blocked = AppointmentSlot.objects.get(id=slots[1].id)
+        blocked.status = 'blocked'
+        blocked.save()
+        slots[2].delete()
+
+        rollup = self.rollup()
+        self.assertEqual(
+            (rollup.available_slots, rollup.booked_slots, rollup.blocked_slots, rollup.total_slots),
+            (1, 1, 1, 3)
+        )
+        stats = calculate_slot_statistics(self.provider, date(2024, 2, 15), date(2024, 2, 15))
+        self.assertEqual(stats['total_slots'], 3)
+        self.assertAlmostEqual(stats['utilization_rate'], 100 / 3)
+
+    def test_deleting_availabilities_and_expired_slots_costs_no_per_slot_queries(self):
+        """Test that cascade and queryset deletes roll up their slots in one pass"""
+        wide = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 20),
+            start_time=time(6, 0),
+            end_time=time(21, 0),
+            timezone='UTC',
+            slot_duration=15,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '3 Rollup Road, New York, NY'}
+        )
+        SlotGenerator(wide).generate_slots()
+        self.assertEqual(self.rollup(date(2024, 2, 20)).available_slots, 60)
+
+        with CaptureQueriesContext(connection) as queries:
+            wide.delete()
+        self.assertLess(len(queries), 30)
+        self.assertEqual(self.rollup(date(2024, 2, 20)).total_slots, 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            trimmed = SlotHorizonService.trim_expired(datetime(2024, 3, 1, tzinfo=pytz.UTC))
+        self.assertEqual(trimmed, 4)
+        self.assertLess(len(queries), 30)
+        self.assertEqual(self.rollup().total_slots, 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test that the rebuild command recounts rows from the slot table"""
+        ProviderDailyAvailability.objects.filter(provider=self.provider).update(available_slots=40, booked_slots=2)
+        ProviderDailyAvailability.objects.create(provider=self.provider, date=date(2024, 2, 20), booked_slots=5)
+        AppointmentSlot.objects.filter(availability=self.availability).update(status='cancelled')
+
+        out = StringIO()
+        call_command('rebuild_daily_availability', provider_ids=[str(self.provider.id)], stdout=out)
+        self.assertIn('Rebuilt 1 provider daily availability rows', out.getvalue())
+        rollup = self.rollup()
+        self.assertEqual((rollup.available_slots, rollup.booked_slots, rollup.cancelled_slots), (0, 0, 4))
+        self.assertFalse(ProviderDailyAvailability.objects.filter(date=date(2024, 2, 20)).exists())
+
+
+class AvailabilityCalendarTestCase(APITestCase):
+    """Test cases for the calendar heatmap endpoint"""
+
+    def setUp(self):
+        """Set up evening slots in New York, one of them booked after UTC midnight"""
+        self.provider = Provider.objects.create(
+            first_name='Calendar',
+            last_name='Provider',
+            email='calendar.provider@example.com',
+            phone_number='+1234567812',
+            password_hash='hashed_password',
+            specialization='Oncology',
+            license_number='LIC123468',
+            years_of_experience=9,
+            clinic_address={'address': '4 Heatmap Street, New York, NY'}
+        )
+        availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(18, 0),
+            end_time=time(22, 0),
+            timezone='America/New_York',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '4 Heatmap Street, New York, NY'}
+        )
+        SlotGenerator(availability).generate_slots()
+        slot = AppointmentSlot.objects.get(slot_start_time=datetime(2024, 2, 16, 1, 0, tzinfo=pytz.UTC))
+        slot.status = 'booked'
+        slot.save()
+        self.url = f'/api/v1/provider/{self.provider.id}/availability/calendar'
+
+    def calendar(self, **params):
+        return self.client.get(self.url, {'start_date': '2024-02-01', 'end_date': '2024-02-29', **params})
+
+    def test_day_buckets_use_provider_timezone(self):
+        """Test that month views get one bucket per local day from the rollup"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.calendar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(queries), 4)
+        data = response.data['data']
+        self.assertEqual(data['timezone'], 'America/New_York')
+        self.assertEqual(data['statuses'], ['available', 'booked', 'blocked'])
+        self.assertEqual(data['buckets'], {'2024-02-15': [3, 1, 0]})
+
+        with override_settings(AVAILABILITY_VIRTUAL_SLOTS=True):
+            self.assertEqual(self.calendar().data['data']['buckets'], data['buckets'])
+
+    def test_hour_and_explicit_timezone_buckets(self):
+        """Test that hour buckets and other timezones are grouped by the database"""
+        response = self.calendar(granularity='hour')
+        self.assertEqual(response.data['data']['buckets'], {
+            '2024-02-15T18:00': [1, 0, 0],
+            '2024-02-15T19:00': [1, 0, 0],
+            '2024-02-15T20:00': [0, 1, 0],
+            '2024-02-15T21:00': [1, 0, 0],
+        })
+
+        response = self.calendar(timezone='UTC')
+        self.assertEqual(response.data['data']['buckets'], {'2024-02-15': [1, 0, 0], '2024-02-16': [2, 1, 0]})
+
+    def test_day_buckets_follow_reported_timezone_across_timezones(self):
+        """Test that a provider with availabilities in several timezones gets days in the reported one"""
+        availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 20),
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            timezone='Asia/Tokyo',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '4 Heatmap Street, New York, NY'}
+        )
+        SlotGenerator(availability).generate_slots()
+
+        data = self.calendar().data['data']
+        self.assertEqual(data['timezone'], 'Asia/Tokyo')
+        self.assertEqual(data['buckets'], {'2024-02-16': [3, 1, 0], '2024-02-20': [1, 0, 0]})
+
+    def test_invalid_parameters(self):
+        """Test that unknown granularities and oversized ranges are rejected"""
+        self.assertEqual(self.calendar(granularity='week').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.calendar(timezone='Mars/Base').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'start_date': '2024-01-01', 'end_date': '2024-03-01', 'granularity': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ScheduleVersionTestCase(APITestCase):
+    """Test cases for schedule versions and conditional listing requests"""
+
+    def setUp(self):
+        """Set up a provider with generated slots"""
+        self.provider = Provider.objects.create(
+            first_name='Version',
+            last_name='Provider',
+            email='version.provider@example.com',
+            phone_number='+1234567813',
+            password_hash='hashed_password',
+            specialization='Urology',
+            license_number='LIC123469',
+            years_of_experience=4,
+            clinic_address={'address': '5 Etag Avenue, Denver, CO'}
+        )
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(11, 0),
+            timezone='UTC',
+            slot_duration=60,
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '5 Etag Avenue, Denver, CO'}
+        )
+        SlotGenerator(self.availability).generate_slots()
+        self.url = f'/api/v1/provider/{self.provider.id}/availability'
+        self.params = {'start_date': '2024-02-15', 'end_date': '2024-02-15'}
+
+    def test_writes_bump_the_version(self):
+        """Test that availability saves, bulk generation and slot writes each advance the version"""
+        # The availability save and the slot generation
+        self.assertEqual(ScheduleVersionService.current(self.provider.id), 2)
+
+        slot = AppointmentSlot.objects.filter(availability=self.availability).first()
+        slot.status = 'blocked'
+        slot.save()
+        slot.delete()
+        self.assertEqual(ScheduleVersionService.current(self.provider.id), 4)
+
+        self.provider.login_count = 1
+        self.provider.save(update_fields=['login_count'])
+        self.assertEqual(ScheduleVersionService.current(self.provider.id), 4)
+
+    def test_unchanged_schedule_returns_not_modified(self):
+        """Test that a matching If-None-Match skips the listing queries"""
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        slots_url = f'/api/v1/provider/availability/{self.availability.id}/slots'
+        slots_etag = self.client.get(slots_url)['ETag']
+        self.assertEqual(slots_etag, etag)
+
+        slot = AppointmentSlot.objects.filter(availability=self.availability).first()
+        slot.status = 'booked'
+        slot.save()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(slots_url, HTTP_IF_NONE_MATCH=slots_etag).status_code, status.HTTP_200_OK)
+
+    def test_provider_delete_cascades_cleanly(self):
+        """Test that deleting a provider does not recreate its rollup or version rows"""
+        self.provider.delete()
+        self.assertFalse(ProviderScheduleVersion.objects.exists())
+        self.assertFalse(ProviderDailyAvailability.objects.exists())
+
+
+@override_settings(AVAILABILITY_VIRTUAL_SLOTS=True)
+class VirtualSlotTestCase(APITestCase):
+    """Test cases for computed-on-read (virtual) slots"""
+    
+    def setUp(self):
+        """Set up a recurring availability without materialized slots"""
+        self.provider = Provider.objects.create(
+            first_name='Virtual',
+            last_name='Provider',
+            email='virtual.provider@example.com',
+            phone_number='+1234567895',
+            password_hash='hashed_password',
+            specialization='Pediatrics',
+            license_number='LIC123461',
+            years_of_experience=6,
+            clinic_address={'address': '12 Virtual Way, Denver, CO'}
+        )
+        
+        self.availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            timezone='UTC',
+            slot_duration=60,
+            is_recurring=True,
+            recurrence_pattern='daily',
+            recurrence_end_date=date(2024, 2, 20),
+            appointment_type='consultation',
+            location={'type': 'clinic', 'address': '12 Virtual Way, Denver, CO'}
+        )
+    
+    def test_slots_computed_without_rows(self):
+        """Test that free slots are computed from the rule"""
+        slots = VirtualSlotResolver.slots_for([self.availability], date(2024, 2, 16), date(2024, 2, 17))
+        
+        self.assertEqual(len(slots), 6)
+        self.assertTrue(all(slot.is_virtual for slot in slots))
+        self.assertEqual(AppointmentSlot.objects.count(), 0)
+        self.assertEqual(
+            slots[0].id,
+            virtual_slot_id(self.availability.id, datetime(2024, 2, 16, 9, 0, tzinfo=pytz.UTC))
+        )
+    
+    def test_materialized_rows_shadow_computed_slots(self):
+        """Test that a written row replaces the computed slot at the same time"""
+        slot_start = datetime(2024, 2, 16, 10, 0, tzinfo=pytz.UTC)
+        slot = VirtualSlotResolver.materialize(self.availability, slot_start)
+        slot.status = 'blocked'
+        slot.save()
+        
+        slots = VirtualSlotResolver.slots_for([self.availability], date(2024, 2, 16), date(2024, 2, 16))
+        
+        self.assertEqual(slot.id, virtual_slot_id(self.availability.id, slot_start))
+        self.assertEqual([s.status for s in slots], ['available', 'blocked', 'available'])
+        self.assertEqual(slots[1].id, slot.id)
+    
+    def test_resolve_rejects_off_schedule_time(self):
+        """Test that a start time outside the schedule is rejected"""
+        with self.assertRaises(ValidationError):
+            VirtualSlotResolver.resolve(self.availability, datetime(2024, 2, 16, 9, 30, tzinfo=pytz.UTC))
+    
+    def test_block_computed_slot_writes_row(self):
+        """Test that blocking a computed slot writes its row"""
+        slot_start = datetime(2024, 2, 18, 11, 0, tzinfo=pytz.UTC)
+        slot_id = virtual_slot_id(self.availability.id, slot_start)
+        
+        response = self.client.put(
+            f'/api/v1/provider/{self.provider.id}/availability/{slot_id}',
+            {
+                'status': 'blocked',
+                'availability_id': str(self.availability.id),
+                'slot_start_time': slot_start.isoformat()
+            },
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AppointmentSlot.objects.get(id=slot_id).status, 'blocked')
+        self.assertEqual(AppointmentSlot.objects.count(), 1)
+    
+    def test_public_search_returns_computed_slots(self):
+        """Test the public search in virtual slot mode"""
+        response = self.client.get('/api/v1/availability/search', {
+            'date': '2024-02-19',
+            'specialization': 'Pediatrics'
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']['results'][0]['available_slots']), 3)
+
 
 class ProviderAvailabilityAPITestCase(APITestCase):
     """Test cases for Provider Availability API endpoints"""
@@ -476,6 +1774,161 @@ class ProviderAvailabilityAPITestCase(APITestCase):
         self.assertTrue(response.data['success'])
         self.assertEqual(len(response.data['data']['availability']), 1)
     
+    def test_provider_availability_listing_is_aggregated(self):
+        """Test that listing cost stays constant and shared details are emitted once"""
+        availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(17, 0),
+            timezone='America/Chicago',
+            slot_duration=30,
+            appointment_type='consultation',
+            is_recurring=True,
+            recurrence_pattern='daily',
+            recurrence_end_date=date(2024, 2, 21),
+            location={'type': 'clinic', 'address': '789 Care Center'},
+            pricing={'base_fee': '125.00', 'currency': 'USD'}
+        )
+        SlotGenerator(availability).generate_slots()
+        first = AppointmentSlot.objects.filter(provider=self.provider).order_by('slot_start_time').first()
+        first.status = 'booked'
+        first.save()
+
+        # Schedule version, provider, summary, slots, availability details
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                f'/api/v1/provider/{self.provider.id}/availability',
+                {'start_date': '2024-02-15', 'end_date': '2024-02-21'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertEqual(data['availability_summary'], {
+            'total_slots': 7 * 16, 'available_slots': 7 * 16 - 1, 'booked_slots': 1, 'cancelled_slots': 0,
+            'remaining_capacity': 7 * 16 - 1
+        })
+        self.assertEqual(len(data['availability']), 7)
+        first_slot = data['availability'][0]['slots'][0]
+        self.assertEqual((first_slot['start_time'], first_slot['status']), ('09:00', 'booked'))
+        self.assertEqual(first_slot['remaining_capacity'], 0)
+        self.assertNotIn('location', first_slot)
+        self.assertEqual(data['availabilities'][first_slot['availability_id']]['location']['address'], '789 Care Center')
+
+    def test_streamed_listings_match_buffered_responses(self):
+        """Test that ?stream=true renders the same document incrementally"""
+        availability = Availability.objects.create(
+            provider=self.provider,
+            date=date(2024, 2, 15),
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            timezone='America/Chicago',
+            slot_duration=30,
+            appointment_type='consultation',
+            is_recurring=True,
+            recurrence_pattern='daily',
+            recurrence_end_date=date(2024, 2, 18),
+            location={'type': 'clinic', 'address': '789 Care Center'}
+        )
+        SlotGenerator(availability).generate_slots()
+        url = f'/api/v1/provider/{self.provider.id}/availability'
+        params = {'start_date': '2024-02-15', 'end_date': '2024-02-18'}
+
+        buffered = self.client.get(url, params)
+        streamed = self.client.get(url, dict(params, stream='true'))
+
+        self.assertTrue(streamed.streaming)
+        streamed_data = json.loads(b''.join(streamed.streaming_content))
+        self.assertEqual(streamed_data, json.loads(json.dumps(buffered.data, cls=DjangoJSONEncoder)))
+
+        ndjson = self.client.get(url, dict(params, stream='ndjson'))
+        lines = b''.join(ndjson.streaming_content).decode().splitlines()
+        self.assertEqual(ndjson['Content-Type'], 'application/x-ndjson')
+        self.assertIsNone(json.loads(lines[0])['data']['availability'])
+        self.assertEqual([json.loads(line)['date'] for line in lines[1:]], ['2024-02-15', '2024-02-16', '2024-02-17', '2024-02-18'])
+
+        records = self.client.get('/api/v1/provider/availability/all', {'stream': 'true'})
+        records_data = json.loads(b''.join(records.streaming_content))
+        self.assertEqual(records_data['data']['filtered_count'], 1)
+        self.assertEqual(records_data['data']['availability_records'][0]['id'], str(availability.id))
+
+    def test_cursor_pagination_walks_every_record_once(self):
+        """Test that keyset cursors page through ties without gaps or duplicates"""
+        created = set()
+        for day in (15, 15, 16, 16, 17):
+            hour = 8 + len(created)
+            created.add(str(Availability.objects.create(
+                provider=self.provider,
+                date=date(2024, 2, day),
+                start_time=time(hour, 0),
+                end_time=time(hour, 30),
+                timezone='America/Chicago',
+                slot_duration=30,
+                appointment_type='consultation',
+                location={'type': 'clinic', 'address': '789 Care Center'}
+            ).id))
+
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get('/api/v1/provider/availability/all', {'cursor': cursor, 'limit': 2})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.data['data']
+            self.assertIsNone(data['total_count'])
+            seen.extend(record['id'] for record in data['availability_records'])
+            cursor = data['next_cursor']
+            self.assertEqual(data['has_next'], cursor is not None)
+
+        self.assertEqual(len(seen), len(created))
+        self.assertEqual(set(seen), created)
+
+        first_page = self.client.get('/api/v1/provider/availability/all', {'cursor': '', 'limit': 2})
+        next_cursor = first_page.data['data']['next_cursor']
+        mismatched = self.client.get(
+            '/api/v1/provider/availability/all', {'cursor': next_cursor, 'sort_by': 'created_at'}
+        )
+        self.assertEqual(mismatched.status_code, status.HTTP_400_BAD_REQUEST)
+        invalid = self.client.get('/api/v1/provider/availability/all', {'cursor': 'not-a-cursor'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        zero_limit = self.client.get('/api/v1/provider/availability/all', {'cursor': '', 'limit': 0})
+        self.assertEqual(zero_limit.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(zero_limit.data['data']['availability_records']), 1)
+
+        # Offset pagination keeps working, with counts unless they are declined
+        offset_page = self.client.get('/api/v1/provider/availability/all', {'limit': 2, 'offset': 4})
+        self.assertEqual(offset_page.data['data']['filtered_count'], 5)
+        self.assertFalse(offset_page.data['data']['has_next'])
+        uncounted = self.client.get('/api/v1/provider/availability/all', {'limit': 2, 'include_count': 'false'})
+        self.assertIsNone(uncounted.data['data']['filtered_count'])
+        self.assertTrue(uncounted.data['data']['has_next'])
+
+    def test_availability_records_count_slots_without_per_row_queries(self):
+        """Test that slot counts come from annotations rather than a query per record"""
+        for day in (15, 16, 17):
+            availability = Availability.objects.create(
+                provider=self.provider,
+                date=date(2024, 2, day),
+                start_time=time(9, 0),
+                end_time=time(11, 0),
+                timezone='America/Chicago',
+                slot_duration=30,
+                appointment_type='consultation',
+                location={'type': 'clinic', 'address': '789 Care Center'}
+            )
+            SlotGenerator(availability).generate_slots()
+        first_slot = AppointmentSlot.objects.filter(availability=availability).order_by('slot_start_time').first()
+        AppointmentSlot.objects.filter(id=first_slot.id).update(status='booked')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/provider/availability/all', {'include_count': 'false'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        records = response.data['data']['availability_records']
+        self.assertEqual([record['slots_count'] for record in records], [4, 4, 4])
+        self.assertEqual([record['booked_slots_count'] for record in records], [0, 0, 1])
+        self.assertEqual([record['available_slots_count'] for record in records], [4, 4, 3])
+
     def test_availability_search_public(self):
         """Test public availability search endpoint"""
         # Create availability and slots
@@ -541,6 +1994,47 @@ class DaylightSavingTestCase(TestCase):
         self.assertFalse(result.dst())
 
 
+class TimezoneConverterTestCase(TestCase):
+    """Test cases for the cached timezone conversion service"""
+    
+    def test_to_utc_matches_pytz_around_transitions(self):
+        """Test local to UTC conversion on and around DST transition dates"""
+        tz = pytz.timezone('America/New_York')
+        local_times = [time(hour, minute) for hour in range(24) for minute in (0, 30)]
+        
+        for local_date in [date(2024, 3, 9), date(2024, 3, 10), date(2024, 11, 3), date(2024, 11, 4)]:
+            expected = [
+                tz.localize(datetime.combine(local_date, local_time)).astimezone(pytz.UTC)
+                for local_time in local_times
+            ]
+            self.assertEqual(
+                TimezoneConverter.to_utc_many(local_date, local_times, 'America/New_York'),
+                expected
+            )
+    
+    def test_from_utc_matches_pytz_around_transitions(self):
+        """Test UTC to local conversion across DST transition instants"""
+        tz = pytz.timezone('Europe/London')
+        start = datetime(2024, 3, 30, 0, 0, tzinfo=pytz.UTC)
+        utc_datetimes = [start + timedelta(minutes=30 * i) for i in range(144)]
+        
+        converted = TimezoneConverter.from_utc_many(utc_datetimes, 'Europe/London')
+        
+        for utc_datetime, local_datetime in zip(utc_datetimes, converted):
+            expected = utc_datetime.astimezone(tz)
+            self.assertEqual(local_datetime, expected)
+            self.assertEqual(local_datetime.strftime('%H:%M %Z'), expected.strftime('%H:%M %Z'))
+    
+    def test_day_offsets_record_transition(self):
+        """Test that transition dates expose their UTC transition instant"""
+        regular = TimezoneConverter.day_offsets('America/New_York', date(2024, 3, 9))
+        transition = TimezoneConverter.day_offsets('America/New_York', date(2024, 3, 10))
+        
+        self.assertEqual(regular.utc_offset, timedelta(hours=-5))
+        self.assertIsNone(regular.transition_utc)
+        self.assertEqual(transition.transition_utc, datetime(2024, 3, 10, 7, 0))
+
+
 class StatisticsTestCase(TestCase):
     """Test cases for availability statistics"""
     
@@ -0,0 +1,108 @@
+"""
+Unit tests for the dropdown search endpoints
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Provider, ProviderSearchToken
+from .patient_models import Patient, PatientSearchToken
+from .services.dropdown_search_service import patient_search_index, query_terms
+
+
+class DropdownSearchIndexTestCase(APITestCase):
+    """Test cases for the provider and patient prefix search index"""
+
+    def setUp(self):
+        """Set up providers and patients"""
+        for number, (first_name, last_name, specialization) in enumerate([
+            ('Alice', 'Martin', 'Cardiology'),
+            ('Martina', 'Lopez', 'Dermatology'),
+            ('Bob', 'Carter', 'Cardiology'),
+        ]):
+            Provider.objects.create(
+                first_name=first_name,
+                last_name=last_name,
+                email=f'{first_name.lower()}.{last_name.lower()}@example.com',
+                phone_number=f'+1312555010{number}',
+                password_hash='hashed_password',
+                specialization=specialization,
+                license_number=f'LIC4234{number:02d}',
+                years_of_experience=5,
+                clinic_address={'address': '1 Dropdown Way, Chicago, IL'},
+                verification_status='verified'
+            )
+
+        self.patient = Patient.objects.create(
+            first_name='Jonathan',
+            last_name="O'Brien",
+            preferred_name='Jon',
+            email='jon.obrien@example.com',
+            phone_number='+13125550199',
+            password_hash='hashed_password'
+        )
+        Patient.objects.create(
+            first_name='Joanna',
+            last_name='Smith',
+            email='joanna.smith@example.com',
+            phone_number='+13125550188',
+            password_hash='hashed_password'
+        )
+
+    def test_saves_write_tokens(self):
+        """Test that saves index names, email parts and phone digits"""
+        tokens = set(PatientSearchToken.objects.filter(owner=self.patient).values_list('token', flat=True))
+        self.assertTrue({'jonathan', 'o', 'brien', 'jon', 'jon.obrien@example.com', '13125550199', '3125550199'} <= tokens)
+
+        self.patient.first_name = 'Nathan'
+        self.patient.save()
+        tokens = set(PatientSearchToken.objects.filter(owner=self.patient).values_list('token', flat=True))
+        self.assertIn('nathan', tokens)
+        self.assertNotIn('jonathan', tokens)
+
+        self.patient.delete()
+        self.assertFalse(PatientSearchToken.objects.filter(owner_id=self.patient.id).exists())
+
+    def test_query_terms_normalization(self):
+        """Test that search strings split into prefix terms"""
+        self.assertEqual(query_terms("O'Bri  Jon"), ['o', 'bri', 'jon'])
+        self.assertEqual(query_terms('+1 (312) 555'), ['1', '312', '555'])
+        self.assertEqual(query_terms('Jon.O@Example'), ['jon.o@example'])
+
+    def test_search_matches_every_term_as_prefix(self):
+        """Test that the index-backed search requires each word to prefix a token"""
+        response = self.client.get('/api/v1/dropdown/providers', {'search': 'mart'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([provider['first_name'] for provider in response.data['data']], ['Alice', 'Martina'])
+
+        response = self.client.get('/api/v1/dropdown/providers', {'search': 'mart cardio'})
+        self.assertEqual([provider['first_name'] for provider in response.data['data']], ['Alice'])
+
+        response = self.client.get('/api/v1/dropdown/patients', {'search': '3125550199'})
+        self.assertEqual([patient['id'] for patient in response.data['data']], [str(self.patient.id)])
+
+    def test_autocomplete_is_ranked_and_limited(self):
+        """Test that autocomplete ranks name matches first and caps the limit"""
+        response = self.client.get('/api/v1/dropdown/providers', {'search': 'martin', 'autocomplete': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The exact last-name match outranks the first-name prefix match
+        self.assertEqual([provider['first_name'] for provider in response.data['data']], ['Alice', 'Martina'])
+
+        response = self.client.get('/api/v1/dropdown/patients', {'search': 'jo', 'autocomplete': 'true', 'limit': 1})
+        self.assertEqual(response.data['count'], 1)
+
+        self.assertEqual(len(patient_search_index.ranked('jo', limit=100)), 2)
+
+    def test_rebuild_command_restores_tokens(self):
+        """Test that the rebuild command recreates every token"""
+        ProviderSearchToken.objects.all().delete()
+        PatientSearchToken.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_dropdown_search_index', batch_size=2, stdout=out)
+
+        self.assertIn('Indexed 3 providers', out.getvalue())
+        self.assertIn('Indexed 2 patients', out.getvalue())
+        response = self.client.get('/api/v1/dropdown/patients', {'search': 'brien'})
+        self.assertEqual(response.data['count'], 1)
@@ -1,8 +1,7 @@
 from django.urls import path, include
 from .views import ProviderRegisterView, ProviderLoginView
 from .availability_views import (
-    ProviderAvailabilityCreateView,
-    ProviderAvailabilityListView,
+    ProviderAvailabilityView,
     AvailabilitySlotUpdateView
 )
 
@@ -12,8 +11,7 @@ urlpatterns = [
     path('login', ProviderLoginView.as_view(), name='provider-login'),  # /api/v1/provider/login
     
     # Availability management endpoints (individual provider)
-    path('<uuid:provider_id>/availability', ProviderAvailabilityCreateView.as_view(), name='provider-availability-create'),  # /api/v1/provider/{id}/availability
-    path('<uuid:provider_id>/availability', ProviderAvailabilityListView.as_view(), name='provider-availability-list'),  # /api/v1/provider/{id}/availability
+    path('<uuid:provider_id>/availability', ProviderAvailabilityView.as_view(), name='provider-availability'),  # /api/v1/provider/{id}/availability (GET lists, POST creates)
     path('<uuid:provider_id>/availability/<uuid:slot_id>', AvailabilitySlotUpdateView.as_view(), name='availability-slot-update'),  # /api/v1/provider/{id}/availability/{slot_id}
     
     # All availability management endpoints (includes display/get all)
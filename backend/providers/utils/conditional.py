@@ -0,0 +1,38 @@
+"""
+Conditional GET support for provider schedule listings
+"""
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+
+from ..services.schedule_version_service import ScheduleVersionService
+
+
+def schedule_etag(get_provider_id):
+    """
+    Send the provider's schedule version as the ETag of a view's GET and
+    answer a matching If-None-Match with 304 before the view runs.
+
+    get_provider_id(**view_kwargs) returns the provider of the request, or
+    None to serve the view unconditionally.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            provider_id = get_provider_id(**kwargs)
+            if provider_id is None:
+                return view_method(self, request, *args, **kwargs)
+            
+            # Read before the view's queries, so a concurrent write can only make the ETag older than the body
+            etag = ScheduleVersionService.etag(provider_id, ScheduleVersionService.current(provider_id))
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+            
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,65 @@
+"""
+Idempotency-Key support for appointment write endpoints
+"""
+from functools import wraps
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..services.idempotency_service import (
+    MAX_KEY_LENGTH, IdempotencyKeyInUse, IdempotencyKeyReused, IdempotencyService
+)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def idempotent(view_method):
+    """
+    Replay the stored response of a view's earlier request with the same
+    Idempotency-Key header instead of running the view again.
+
+    Requests without the header run normally. Keys are scoped to the method
+    and path, so the same key on another appointment is a different key.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'success': False,
+                'message': 'Invalid Idempotency-Key',
+                'errors': {'idempotency_key': [f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        key_hash = IdempotencyService.key_hash(request.method, request.path, key)
+        try:
+            record = IdempotencyService.begin(key_hash, IdempotencyService.request_hash(request.data))
+        except IdempotencyKeyInUse as e:
+            return Response({
+                'success': False,
+                'message': 'Request already in progress',
+                'errors': {'idempotency_key': e.messages}
+            }, status=status.HTTP_409_CONFLICT)
+        except IdempotencyKeyReused as e:
+            return Response({
+                'success': False,
+                'message': 'Idempotency-Key reused',
+                'errors': {'idempotency_key': e.messages}
+            }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        if record is not None:
+            response = Response(record.response_body, status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            IdempotencyService.release(key_hash)
+            raise
+        IdempotencyService.complete(key_hash, response.status_code, response.data)
+        return response
+    return wrapper
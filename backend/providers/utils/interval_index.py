@@ -0,0 +1,147 @@
+"""
+Sorted interval index for appointment slot conflict detection
+
+Built from a single range query, the index answers overlap checks for any
+number of new intervals with a bisect each, so checking m intervals against
+n existing slots costs O((n + m) log n) instead of a query or a scan per slot.
+"""
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from ..availability_models import AppointmentSlot
+
+# Slots in these statuses occupy their time window; every status occupies its
+# start time because of the unique (provider, slot_start_time) constraint
+ACTIVE_SLOT_STATUSES = ('available', 'booked', 'held')
+
+IndexedSlot = namedtuple('IndexedSlot', ['start', 'end', 'status', 'id'], defaults=(None,))
+
+
+class SlotIntervalIndex:
+    """Existing slots of a provider sorted by start, with a prefix max of end times"""
+
+    def __init__(self, slots=()):
+        self._active = []
+        self._active_starts = []
+        self._active_max_ends = []
+        self._taken_starts = set()
+
+        for slot in sorted((IndexedSlot(*slot) for slot in slots), key=lambda s: (s.start, s.end)):
+            self.add(slot)
+
+    @classmethod
+    def for_provider(cls, provider, range_start, range_end, exclude_slot_id=None):
+        """Index the provider's slots overlapping [range_start, range_end) with one query"""
+        slots = AppointmentSlot.objects.filter(
+            provider=provider,
+            slot_start_time__lt=range_end,
+            slot_end_time__gt=range_start
+        )
+        if exclude_slot_id:
+            slots = slots.exclude(id=exclude_slot_id)
+        return cls(slots.values_list('slot_start_time', 'slot_end_time', 'status', 'id'))
+
+    @classmethod
+    def for_providers(cls, provider_ids, range_start, range_end):
+        """Index the slots of several providers overlapping [range_start, range_end) with one query"""
+        slots_by_provider = defaultdict(list)
+        rows = AppointmentSlot.objects.filter(
+            provider_id__in=provider_ids,
+            slot_start_time__lt=range_end,
+            slot_end_time__gt=range_start
+        ).values_list('provider_id', 'slot_start_time', 'slot_end_time', 'status', 'id')
+        for provider_id, *slot in rows:
+            slots_by_provider[provider_id].append(slot)
+        return {provider_id: cls(slots_by_provider[provider_id]) for provider_id in provider_ids}
+
+    def add(self, slot):
+        """Add a slot; slots must be added in start order"""
+        slot = IndexedSlot(*slot)
+        self._taken_starts.add(slot.start)
+        if slot.status not in ACTIVE_SLOT_STATUSES:
+            return
+        if self._active_starts and slot.start < self._active_starts[-1]:
+            raise ValueError('Slots must be added to the index in start order')
+
+        self._active.append(slot)
+        self._active_starts.append(slot.start)
+        self._active_max_ends.append(
+            max(self._active_max_ends[-1], slot.end) if self._active_max_ends else slot.end
+        )
+
+    def is_start_taken(self, start):
+        """Check whether any slot, whatever its status, starts at this instant"""
+        return start in self._taken_starts
+
+    def has_overlap(self, start, end):
+        """Check whether an active slot overlaps [start, end)"""
+        idx = bisect_left(self._active_starts, end)
+        return bool(idx) and self._active_max_ends[idx - 1] > start
+
+    def overlapping(self, start, end):
+        """Active slots overlapping [start, end), in start order"""
+        idx = bisect_left(self._active_starts, end)
+        matches = []
+        # Walk back only while some earlier slot can still reach past start
+        while idx and self._active_max_ends[idx - 1] > start:
+            idx -= 1
+            if self._active[idx].end > start:
+                matches.append(self._active[idx])
+        matches.reverse()
+        return matches
+
+    def find_conflicts(self, intervals):
+        """Map each (start, end) interval to the active slots it overlaps"""
+        return [(interval, self.overlapping(interval[0], interval[1])) for interval in intervals]
+
+    def filter_candidates(self, candidates):
+        """
+        Drop candidates that overlap an active slot or reuse an occupied start time.
+
+        Candidates are tuples starting with (slot_start, slot_end), sorted by
+        start; any extra elements are carried through untouched. Candidates
+        accepted earlier in the pass block later ones, and their start times
+        are recorded in the index.
+        """
+        accepted = []
+        accepted_max_end = None
+        for candidate in candidates:
+            slot_start, slot_end = candidate[0], candidate[1]
+            if self.is_start_taken(slot_start) or self.has_overlap(slot_start, slot_end):
+                continue
+            if accepted_max_end is not None and accepted_max_end > slot_start:
+                continue
+
+            accepted.append(candidate)
+            self._taken_starts.add(slot_start)
+            accepted_max_end = slot_end if accepted_max_end is None else max(accepted_max_end, slot_end)
+
+        return accepted
+
+
+class DisjointIntervalSet:
+    """
+    Growing set of non-overlapping intervals, each carrying a payload.
+
+    Because the intervals never overlap, sorting by start also sorts them by
+    end, and only the interval just before a new end can overlap it.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._payloads = []
+
+    def find(self, start, end):
+        """Payload of the interval overlapping [start, end), or None"""
+        idx = bisect_left(self._starts, end)
+        if idx and self._ends[idx - 1] > start:
+            return self._payloads[idx - 1]
+        return None
+
+    def add(self, start, end, payload=None):
+        """Insert an interval that overlaps none already in the set"""
+        idx = bisect_left(self._starts, start)
+        self._starts.insert(idx, start)
+        self._ends.insert(idx, end)
+        self._payloads.insert(idx, payload)
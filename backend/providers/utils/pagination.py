@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination for large listings
+
+A cursor records the sort-column values of the last row of a page plus its
+primary key, so the next page is a range condition on those columns instead
+of an OFFSET the database has to walk past. Cursors are opaque base64 JSON
+and are tied to the ordering they were issued for.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from functools import reduce
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for a different ordering"""
+
+
+class KeysetPaginator:
+    """Pages through a queryset ordered by the given fields, with id as the final tiebreaker"""
+
+    def __init__(self, ordering):
+        self.ordering = [field for field in ordering if field.lstrip('-') not in ('id', 'pk')] + ['id']
+
+    def paginate(self, queryset, cursor, limit):
+        """Get (rows, next_cursor) for the page after cursor; next_cursor is None on the last page"""
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode(cursor)))
+
+        rows = list(queryset[:limit + 1])
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode(rows[-1])
+
+    def encode(self, row):
+        """Cursor pointing just after row"""
+        payload = {
+            'o': self.ordering,
+            'v': [self._value(row, field.lstrip('-')) for field in self.ordering]
+        }
+        raw = json.dumps(payload, default=self._encode_value, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """Sort values stored in a cursor; raises InvalidCursor"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            values = payload['v']
+            ordering = payload['o']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise InvalidCursor('Invalid cursor')
+
+        if ordering != self.ordering or len(values) != len(self.ordering):
+            raise InvalidCursor('Cursor does not match the requested sort order')
+        return values
+
+    def _after(self, values):
+        """Rows sorting strictly after the given values"""
+        clauses = []
+        for position, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            # Equal on every earlier column, past the value on this one
+            equal = {
+                earlier.lstrip('-'): value
+                for earlier, value in zip(self.ordering[:position], values[:position])
+            }
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[position]}))
+        return reduce(lambda combined, clause: combined | clause, clauses)
+
+    @staticmethod
+    def _encode_value(value):
+        # Full precision: DjangoJSONEncoder would truncate microseconds
+        if isinstance(value, (datetime, date, time)):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _value(row, path):
+        value = row
+        for attribute in path.split('__'):
+            value = getattr(value, attribute)
+        return value
@@ -0,0 +1,77 @@
+"""
+Incremental JSON rendering for wide listings
+
+Listing views build their response envelope as usual but put STREAMED_ITEMS
+where the (potentially huge) list belongs; the items are then rendered one
+at a time from an iterator, so memory stays flat whatever the range.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Rows fetched per database round trip while streaming
+STREAM_CHUNK_SIZE = 500
+
+# Bytes buffered before a chunk is handed to the server
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Marks the position of the streamed list inside a response envelope
+STREAMED_ITEMS = '__streamed_items__'
+
+
+def stream_mode(request):
+    """'json' or 'ndjson' when ?stream= asks for a streamed response, otherwise None"""
+    value = request.query_params.get('stream', '').lower()
+    if value in ('true', '1', 'json'):
+        return 'json'
+    if value == 'ndjson':
+        return 'ndjson'
+    return None
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def _buffered(parts):
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _json_parts(envelope, items):
+    prefix, suffix = _dumps(envelope).split(_dumps(STREAMED_ITEMS), 1)
+    yield prefix + '['
+    for position, item in enumerate(items):
+        yield (',' if position else '') + _dumps(item)
+    yield ']' + suffix
+
+
+def _ndjson_parts(envelope, items):
+    # The envelope goes first, with null where the items would be
+    yield _dumps(envelope).replace(_dumps(STREAMED_ITEMS), 'null', 1) + '\n'
+    for item in items:
+        yield _dumps(item) + '\n'
+
+
+def streaming_json_response(envelope, items, mode='json'):
+    """
+    Stream a response envelope with items rendered lazily in place of STREAMED_ITEMS.
+
+    In ndjson mode the envelope is the first line and every item follows on
+    its own line.
+    """
+    if mode == 'ndjson':
+        return StreamingHttpResponse(
+            _buffered(_ndjson_parts(envelope, items)), content_type='application/x-ndjson'
+        )
+    return StreamingHttpResponse(_buffered(_json_parts(envelope, items)), content_type='application/json')
@@ -0,0 +1,112 @@
+"""
+Cached timezone conversion for slot generation and availability listing
+
+Resolved zones and per-(zone, date) UTC offsets are cached for the life of
+the process. On dates without a DST transition a conversion is a single
+offset addition; only dates containing a transition fall back to pytz.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+import pytz
+
+# utc_offset applies to the whole date when transition_utc is None; otherwise
+# the date contains a DST transition at the given UTC instant
+DayOffsets = namedtuple('DayOffsets', ['utc_offset', 'transition_utc'])
+
+# Local (tzinfo, utc_offset) pairs before and after the (optional) DST
+# transition within a UTC date
+UtcDayOffsets = namedtuple('UtcDayOffsets', ['before', 'after', 'transition_utc'])
+
+
+@lru_cache(maxsize=None)
+def get_timezone(timezone_str):
+    """Resolve a timezone name; raises pytz.UnknownTimeZoneError if invalid"""
+    return pytz.timezone(timezone_str)
+
+
+def _naive_utc(aware_dt):
+    return aware_dt.astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def _find_transition(tz, start_utc, end_utc):
+    """First DST transition instant in [start_utc, end_utc), as a naive UTC datetime"""
+    transitions = getattr(tz, '_utc_transition_times', None)
+    if not transitions:
+        return None
+    idx = bisect_right(transitions, start_utc)
+    if idx < len(transitions) and transitions[idx] < end_utc:
+        return transitions[idx]
+    return None
+
+
+class TimezoneConverter:
+    """Shared, cached local <-> UTC conversion"""
+
+    @staticmethod
+    @lru_cache(maxsize=16384)
+    def day_offsets(timezone_str, local_date):
+        """UTC offset of a local date in a zone, with its DST transition instant if any"""
+        tz = get_timezone(timezone_str)
+        start = tz.localize(datetime.combine(local_date, time.min))
+        end = tz.localize(datetime.combine(local_date + timedelta(days=1), time.min))
+
+        if start.utcoffset() == end.utcoffset():
+            return DayOffsets(start.utcoffset(), None)
+        return DayOffsets(None, _find_transition(tz, _naive_utc(start), _naive_utc(end)))
+
+    @staticmethod
+    @lru_cache(maxsize=16384)
+    def utc_day_offsets(timezone_str, utc_date):
+        """Local tzinfo for a UTC date in a zone, split at its DST transition if any"""
+        tz = get_timezone(timezone_str)
+        start = datetime.combine(utc_date, time.min)
+        transition = _find_transition(tz, start, start + timedelta(days=1))
+
+        before = pytz.UTC.localize(start).astimezone(tz)
+        before = (before.tzinfo, before.utcoffset())
+        if transition is None:
+            return UtcDayOffsets(before, before, None)
+        after = pytz.UTC.localize(transition).astimezone(tz)
+        return UtcDayOffsets(before, (after.tzinfo, after.utcoffset()), transition)
+
+    @classmethod
+    def to_utc(cls, local_date, local_time, timezone_str):
+        """Convert a local date and time to an aware UTC datetime"""
+        return cls.to_utc_many(local_date, [local_time], timezone_str)[0]
+
+    @classmethod
+    def to_utc_many(cls, local_date, local_times, timezone_str):
+        """Convert an array of local times on one date to aware UTC datetimes"""
+        offsets = cls.day_offsets(timezone_str, local_date)
+
+        if offsets.utc_offset is not None:
+            return [
+                (datetime.combine(local_date, local_time) - offsets.utc_offset).replace(tzinfo=pytz.UTC)
+                for local_time in local_times
+            ]
+
+        # Transition days keep pytz semantics for ambiguous and skipped times
+        tz = get_timezone(timezone_str)
+        return [
+            tz.localize(datetime.combine(local_date, local_time)).astimezone(pytz.UTC)
+            for local_time in local_times
+        ]
+
+    @classmethod
+    def from_utc(cls, utc_datetime, timezone_str):
+        """Convert an aware datetime to the zone's local time"""
+        naive_utc = _naive_utc(utc_datetime)
+        offsets = cls.utc_day_offsets(timezone_str, naive_utc.date())
+
+        tzinfo, utc_offset = offsets.before
+        if offsets.transition_utc is not None and naive_utc >= offsets.transition_utc:
+            tzinfo, utc_offset = offsets.after
+        return (naive_utc + utc_offset).replace(tzinfo=tzinfo)
+
+    @classmethod
+    def from_utc_many(cls, utc_datetimes, timezone_str):
+        """Convert an array of aware datetimes to the zone's local time"""
+        return [cls.from_utc(utc_datetime, timezone_str) for utc_datetime in utc_datetimes]